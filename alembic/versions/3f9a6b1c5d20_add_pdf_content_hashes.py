@@ -0,0 +1,30 @@
+"""add_pdf_content_hashes
+
+Revision ID: 3f9a6b1c5d20
+Revises: 8c41d2e7a9b3
+Create Date: 2026-10-19 11:03:17.284650
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a6b1c5d20'
+down_revision: Union[str, Sequence[str], None] = '8c41d2e7a9b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add SHA-256 columns used as ETags for contract PDFs."""
+    op.add_column('contracts', sa.Column('unsigned_pdf_sha256', sa.String(length=64), nullable=True))
+    op.add_column('contracts', sa.Column('signed_pdf_sha256', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    """Drop PDF hash columns."""
+    op.drop_column('contracts', 'signed_pdf_sha256')
+    op.drop_column('contracts', 'unsigned_pdf_sha256')
@@ -0,0 +1,39 @@
+"""add_webhook_subscriptions
+
+Revision ID: 8c41d2e7a9b3
+Revises: 252808427278
+Create Date: 2026-10-19 09:12:41.503218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c41d2e7a9b3'
+down_revision: Union[str, Sequence[str], None] = '252808427278'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create webhook_subscriptions table."""
+    op.create_table('webhook_subscriptions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('url', sa.String(), nullable=False),
+        sa.Column('secret', sa.String(), nullable=False),
+        sa.Column('events', sa.String(), nullable=False),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('active', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_webhook_subscriptions_id'), 'webhook_subscriptions', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop webhook_subscriptions table."""
+    op.drop_index(op.f('ix_webhook_subscriptions_id'), table_name='webhook_subscriptions')
+    op.drop_table('webhook_subscriptions')
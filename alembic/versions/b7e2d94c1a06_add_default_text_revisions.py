@@ -0,0 +1,115 @@
+"""add_default_text_revisions
+
+Revision ID: b7e2d94c1a06
+Revises: 3f9a6b1c5d20
+Create Date: 2026-10-19 14:26:08.917342
+
+"""
+import hashlib
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2d94c1a06'
+down_revision: Union[str, Sequence[str], None] = '3f9a6b1c5d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _sha256(content: str) -> str:
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def upgrade() -> None:
+    """Create default_text_revisions and point contracts at them instead of copying the policy text."""
+    op.create_table('default_text_revisions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('default_text_id', sa.Integer(), nullable=True),
+        sa.Column('revision', sa.Integer(), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('content_sha256', sa.String(length=64), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['default_text_id'], ['default_texts.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_default_text_revisions_id'), 'default_text_revisions', ['id'], unique=False)
+    op.create_index(op.f('ix_default_text_revisions_default_text_id'), 'default_text_revisions', ['default_text_id'], unique=False)
+    op.create_index(op.f('ix_default_text_revisions_content_sha256'), 'default_text_revisions', ['content_sha256'], unique=False)
+
+    with op.batch_alter_table('contracts') as batch_op:
+        batch_op.add_column(sa.Column('politica_revision_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_contracts_politica_revision_id'), ['politica_revision_id'], unique=False)
+        batch_op.create_foreign_key('fk_contracts_politica_revision_id', 'default_text_revisions', ['politica_revision_id'], ['id'])
+
+    connection = op.get_bind()
+    revisions = sa.Table('default_text_revisions', sa.MetaData(),
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('default_text_id', sa.Integer()),
+        sa.Column('revision', sa.Integer()),
+        sa.Column('content', sa.Text()),
+        sa.Column('content_sha256', sa.String()),
+        sa.Column('created_at', sa.DateTime()),
+    )
+    now = datetime.utcnow()
+
+    def add_revision(default_text_id, content):
+        result = connection.execute(revisions.insert().values(
+            default_text_id=default_text_id,
+            revision=1,
+            content=content,
+            content_sha256=_sha256(content),
+            created_at=now
+        ))
+        return result.inserted_primary_key[0]
+
+    # Revision 1 of every current default text
+    revision_by_content = {}
+    for default_text_id, content in connection.execute(sa.text(
+        "SELECT id, content FROM default_texts WHERE content IS NOT NULL ORDER BY id"
+    )):
+        revision_by_content.setdefault(content, add_revision(default_text_id, content))
+
+    # Deduplicate the policy texts already copied into contracts: texts equal to a
+    # default text, or shared by several contracts (older versions of a default
+    # text), become revisions; texts used by a single contract stay inline
+    usages = connection.execute(sa.text(
+        "SELECT politica_confirmacion, COUNT(*) FROM contracts "
+        "WHERE politica_confirmacion IS NOT NULL AND politica_confirmacion <> '' "
+        "GROUP BY politica_confirmacion"
+    )).fetchall()
+    for content, count in usages:
+        revision_id = revision_by_content.get(content)
+        if revision_id is None:
+            if count < 2:
+                continue
+            revision_id = add_revision(None, content)
+            revision_by_content[content] = revision_id
+        connection.execute(
+            sa.text(
+                "UPDATE contracts SET politica_revision_id = :revision_id, politica_confirmacion = NULL "
+                "WHERE politica_confirmacion = :content"
+            ),
+            {"revision_id": revision_id, "content": content}
+        )
+
+
+def downgrade() -> None:
+    """Copy referenced policy texts back into contracts and drop default_text_revisions."""
+    op.execute(
+        "UPDATE contracts SET politica_confirmacion = "
+        "(SELECT content FROM default_text_revisions WHERE default_text_revisions.id = contracts.politica_revision_id) "
+        "WHERE politica_revision_id IS NOT NULL"
+    )
+    with op.batch_alter_table('contracts') as batch_op:
+        batch_op.drop_constraint('fk_contracts_politica_revision_id', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_contracts_politica_revision_id'))
+        batch_op.drop_column('politica_revision_id')
+
+    op.drop_index(op.f('ix_default_text_revisions_content_sha256'), table_name='default_text_revisions')
+    op.drop_index(op.f('ix_default_text_revisions_default_text_id'), table_name='default_text_revisions')
+    op.drop_index(op.f('ix_default_text_revisions_id'), table_name='default_text_revisions')
+    op.drop_table('default_text_revisions')
@@ -0,0 +1,39 @@
+"""add_blobs
+
+Revision ID: d41c8a7f6e25
+Revises: b7e2d94c1a06
+Create Date: 2026-10-19 16:48:52.370615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41c8a7f6e25'
+down_revision: Union[str, Sequence[str], None] = 'b7e2d94c1a06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create the content-addressed blobs table and store the signature image of each contract."""
+    op.create_table('blobs',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('path', sa.String(), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('content_type', sa.String(), nullable=True),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('sha256')
+    )
+    op.add_column('contracts', sa.Column('signature_image_path', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Drop blobs table and signature_image_path."""
+    op.drop_column('contracts', 'signature_image_path')
+    op.drop_table('blobs')
@@ -0,0 +1,30 @@
+"""add_design_derivatives
+
+Revision ID: e5a9c3f81b47
+Revises: d41c8a7f6e25
+Create Date: 2026-10-19 18:05:31.204417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a9c3f81b47'
+down_revision: Union[str, Sequence[str], None] = 'd41c8a7f6e25'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add paths of the design thumbnail and preview renditions."""
+    op.add_column('contracts', sa.Column('design_thumbnail_path', sa.String(), nullable=True))
+    op.add_column('contracts', sa.Column('design_preview_path', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Drop design rendition paths."""
+    op.drop_column('contracts', 'design_preview_path')
+    op.drop_column('contracts', 'design_thumbnail_path')
@@ -4,7 +4,10 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
 from typing import Optional
+from sqlalchemy.orm import Session
 from .config import settings
+from .database import get_db
+from . import models
 
 # Password Hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -48,3 +51,10 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     if user is None:
         raise credentials_exception
     return user
+
+async def get_current_admin(current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
+    """The authenticated user, if it is the administrator (the account whose email is ADMIN_EMAIL)"""
+    user = db.query(models.DBUser).filter(models.DBUser.username == current_user["username"]).first()
+    if not user or user.disabled or (user.email or "").lower() != settings.ADMIN_EMAIL.lower():
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Administrator access required")
+    return current_user
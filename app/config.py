@@ -2,6 +2,8 @@ from pydantic_settings import BaseSettings
 from typing import List, Union
 from pydantic import field_validator
 
+FILE_SERVING_MODES = ("direct", "x-accel-redirect", "x-sendfile", "signed-url")
+
 class Settings(BaseSettings):
     DATABASE_URL: str
     SECRET_KEY: str
@@ -34,13 +36,130 @@ class Settings(BaseSettings):
     SMTP_USE_SSL: bool = True
     SMTP_FROM_EMAIL: str = "system@delarueda.es"
     SMTP_FROM_NAME: str = "Sistema de Contratos - De La Rueda"
+    EMAIL_ATTACHMENT_CACHE_SIZE: int = 8  # Encoded PDF attachments kept in memory, keyed by PDF hash
+    EMAIL_ATTACHMENT_CACHE_TTL_SECONDS: int = 600
+    EMAIL_TEMPLATE_CACHE_DIR: str = ""  # Jinja bytecode cache directory, empty uses the system temp dir
+    
+    # PDF generation
+    PDF_LAYOUT_CACHE_SIZE: int = 64  # Wrapped policy texts kept per worker (one per text/font/size)
+    RENDER_POOL_WORKERS: int = 2  # Threads rendering PDFs off the event loop
+    RENDER_POOL_MAX_PENDING: int = 8  # Queued renders beyond this get a 503
+    PDF_IMAGE_DPI: int = 300  # Images are decoded and embedded at this resolution for their printed size
+    IMAGE_DECODE_PIXEL_BUDGET: int = 6_000_000  # Upper bound on the decoded size of one image
+    IMAGE_MAX_PIXELS: int = 50_000_000  # Larger images are rejected (decompression bomb limit)
+    DESIGN_THUMBNAIL_SIZE: int = 320  # Longest side of the design thumbnail shown in listings
+    DESIGN_PREVIEW_SIZE: int = 1280  # Longest side of the medium design preview
+    DESIGN_DERIVATIVE_FORMAT: str = "webp"  # webp or jpeg (JPEG if Pillow was built without WebP)
+    DESIGN_DERIVATIVE_QUALITY: int = 80
+    DESIGN_DERIVATIVE_WORKERS: int = 1  # Own threads, so derivatives never take render pool slots
+    DESIGN_DERIVATIVE_MAX_PENDING: int = 32  # Queued derivative jobs; beyond this they wait and retry
+    DESIGN_DERIVATIVE_MAX_RETRIES: int = 5
+    DESIGN_DERIVATIVE_RETRY_BACKOFF_SECONDS: float = 2.0  # Doubled after each retry
+    DRAFT_PREVIEW_MAX_IMAGE_BYTES: int = 10 * 1024 * 1024
+    DRAFT_PREVIEW_CACHE_SIZE: int = 16  # Rendered previews kept by input hash, 0 disables
+    DRAFT_PREVIEW_CACHE_TTL_SECONDS: int = 120
     
     # Admin settings
     ADMIN_EMAIL: str  # Will be set from environment
+    ADMIN_NOTIFICATION_MODE: str = "immediate"  # immediate, digest
+    ADMIN_DIGEST_WINDOW_SECONDS: int = 900  # Time window covered by each digest email
+    ADMIN_DIGEST_MAX_EVENTS: int = 200  # Send the digest early once this many events are buffered
+    ADMIN_DIGEST_RETRY_MAX_SECONDS: int = 6 * 3600  # Failed digests wait one more window per failure, up to this
+    
+    # Webhook delivery
+    WEBHOOK_TIMEOUT_SECONDS: float = 10.0
+    WEBHOOK_MAX_RETRIES: int = 3
+    WEBHOOK_RETRY_BACKOFF_SECONDS: float = 2.0  # Doubled after each failed attempt
+    WEBHOOK_BATCH_WINDOW_SECONDS: float = 2.0  # Events for the same endpoint within this window go in one request
+    WEBHOOK_BATCH_MAX_EVENTS: int = 50
+    WEBHOOK_MAX_CONNECTIONS: int = 20
+    
+    # File serving: "direct" streams PDFs from Python, "x-accel-redirect" (nginx) and
+    # "x-sendfile" (Apache/lighttpd) hand the file to the proxy, "signed-url" redirects
+    # to a short-lived HMAC-signed URL that the proxy validates on its own
+    FILE_SERVING_MODE: str = "direct"
+    STORAGE_ROOT: str = "storage"  # Local directory mounted at /storage
+    X_ACCEL_REDIRECT_PREFIX: str = "/protected-storage/"  # Internal nginx location aliased to STORAGE_ROOT
+    SIGNED_URL_BASE: str = ""  # Public URL the proxy serves STORAGE_ROOT under, e.g. https://files.example.com/storage/
+    SIGNED_URL_TTL_SECONDS: int = 300
+    SIGNED_URL_SECRET: str = ""  # Shared with the proxy; defaults to SECRET_KEY
+    
+    # Storage backend: "local" keeps files under STORAGE_ROOT on a shared volume,
+    # "s3" stores them in an S3-compatible bucket (requires boto3)
+    STORAGE_BACKEND: str = "local"
+    STORAGE_CACHE_DIR: str = ""  # Local read-through cache for files kept in S3, defaults to STORAGE_ROOT/cache
+    STORAGE_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    S3_BUCKET: str = ""
+    S3_PREFIX: str = ""  # Prepended to every object key
+    S3_ENDPOINT_URL: str = ""  # e.g. http://minio:9000, empty for AWS
+    S3_REGION: str = ""
+    S3_ACCESS_KEY_ID: str = ""  # Empty uses the default AWS credential chain
+    S3_SECRET_ACCESS_KEY: str = ""
+    S3_MULTIPART_THRESHOLD: int = 16 * 1024 * 1024  # Larger files are uploaded in parts
+    S3_MULTIPART_CHUNK_SIZE: int = 8 * 1024 * 1024  # S3 requires at least 5 MB per part
+    
+    FILE_DELETE_MAX_RETRIES: int = 3  # Background deletes of a deleted contract's files
+    FILE_DELETE_RETRY_BACKOFF_SECONDS: float = 1.0  # Doubled after each failed attempt
+    
+    # Storage garbage collection (gc_storage.py, or periodic inside the app)
+    STORAGE_GC_INTERVAL_SECONDS: int = 0  # Run the GC in the app this often, 0 disables it
+    STORAGE_GC_GRACE_SECONDS: int = 24 * 3600  # Never delete files younger than this
+    STORAGE_GC_MAX_DELETES_PER_SECOND: float = 50.0  # 0 for no limit
+    
+    # Contract retention (purge_contracts.py)
+    RETENTION_DELETED_DAYS: int = 90  # Hard-delete contracts soft-deleted longer ago than this, 0 keeps them
+    RETENTION_UNSIGNED_DAYS: int = 0  # Expire (soft-delete) unsigned contracts older than this, 0 disables
+    RETENTION_BATCH_SIZE: int = 200  # Contracts per transaction
+    RETENTION_BATCH_SLEEP_SECONDS: float = 0.5  # Pause between batches to keep locks short
+    
+    # Uploads
+    UPLOAD_MAX_BYTES: int = 15 * 1024 * 1024  # Per uploaded file
+    REQUEST_MAX_BODY_BYTES: int = 20 * 1024 * 1024  # Whole request body, checked before reading it
+    
+    # Default texts cache (per worker; invalidated across workers via Postgres NOTIFY)
+    DEFAULT_TEXT_CACHE_SIZE: int = 256
+    DEFAULT_TEXT_CACHE_TTL_SECONDS: int = 300  # Upper bound on staleness if a notification is lost
+    DEFAULT_TEXT_CACHE_MISSING_SIZE: int = 64  # Unknown keys remembered, kept apart so they never evict real texts
+    
+    # Response compression (brotli/zstd are used only if the packages are installed)
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MINIMUM_SIZE: int = 1024  # Smaller bodies are sent as is
+    COMPRESSION_ENCODINGS: str = "zstd,br,gzip"  # Order of preference
+    COMPRESSION_GZIP_LEVEL: int = 6  # 1-9
+    COMPRESSION_BROTLI_QUALITY: int = 5  # 0-11
+    COMPRESSION_ZSTD_LEVEL: int = 3  # 1-22
     
     # Frontend URL for links
     FRONTEND_URL: str  # Will be set from environment
 
+    @field_validator('ADMIN_NOTIFICATION_MODE')
+    @classmethod
+    def validate_admin_notification_mode(cls, v):
+        if v not in ("immediate", "digest"):
+            raise ValueError("ADMIN_NOTIFICATION_MODE must be immediate or digest")
+        return v
+
+    @field_validator('FILE_SERVING_MODE')
+    @classmethod
+    def validate_file_serving_mode(cls, v):
+        if v not in FILE_SERVING_MODES:
+            raise ValueError(f"FILE_SERVING_MODE must be one of {', '.join(FILE_SERVING_MODES)}")
+        return v
+
+    @field_validator('STORAGE_BACKEND')
+    @classmethod
+    def validate_storage_backend(cls, v):
+        if v not in ("local", "s3"):
+            raise ValueError("STORAGE_BACKEND must be local or s3")
+        return v
+
+    @field_validator('DESIGN_DERIVATIVE_FORMAT')
+    @classmethod
+    def validate_design_derivative_format(cls, v):
+        if v not in ("webp", "jpeg"):
+            raise ValueError("DESIGN_DERIVATIVE_FORMAT must be webp or jpeg")
+        return v
+
     class Config:
         env_file = ".env"
 
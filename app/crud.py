@@ -1,5 +1,14 @@
+import hashlib
+import threading
+
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import text, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from . import models, auth, schemas
+from .services.default_text_cache import default_text_cache, INVALIDATION_CHANNEL
 
 def get_user_by_username(db: Session, username: str):
     return db.query(models.DBUser).filter(models.DBUser.username == username).first()
@@ -17,37 +26,49 @@ def create_user(db: Session, user: schemas.UserCreate):
     db.refresh(db_user)
     return db_user
 
-def get_contract(db: Session, contract_id: int):
-    return db.query(models.DBContract).filter(models.DBContract.id == contract_id, models.DBContract.deleted_at.is_(None)).first()
+def get_contract(db: Session, contract_id: int, lock: bool = False):
+    query = db.query(models.DBContract).filter(models.DBContract.id == contract_id, models.DBContract.deleted_at.is_(None))
+    if lock:
+        # SELECT ... FOR UPDATE: a concurrent soft delete waits for this transaction
+        query = query.with_for_update()
+    return query.first()
 
-def get_contracts(db: Session, skip: int = 0, limit: int = 100, sort_by: str = 'created_at', sort_order: str = 'desc', search: str = None):
-    query = db.query(models.DBContract).filter(models.DBContract.deleted_at.is_(None))
+def _contracts_query(db: Session, *entities, search: str = None):
+    query = db.query(*entities).filter(models.DBContract.deleted_at.is_(None))
     
     if search:
         query = query.filter(
             models.DBContract.client_name.ilike(f"%{search}%") |
             models.DBContract.client_email.ilike(f"%{search}%")
         )
-    
+    return query
+
+
+def _order_contracts(query, sort_by: str, sort_order: str):
     order_column = getattr(models.DBContract, sort_by, models.DBContract.created_at)
     if sort_order == 'desc':
-        query = query.order_by(order_column.desc())
-    else:
-        query = query.order_by(order_column.asc())
-        
-    return query.offset(skip).limit(limit).all()
+        return query.order_by(order_column.desc())
+    return query.order_by(order_column.asc())
+
+
+def get_contracts(db: Session, skip: int = 0, limit: int = 100, sort_by: str = 'created_at', sort_order: str = 'desc', search: str = None):
+    query = _contracts_query(db, models.DBContract, search=search)
+    return _order_contracts(query, sort_by, sort_order).offset(skip).limit(limit).all()
+
+
+# Columns selected for list pages, named like the fields of schemas.ContractSummary
+# (no policy text: it can be several KB per row and list pages don't show it)
+CONTRACT_LIST_COLUMNS = [getattr(models.DBContract, field) for field in schemas.ContractSummary.model_fields]
+
+
+def get_contract_rows(db: Session, skip: int = 0, limit: int = 100, sort_by: str = 'created_at', sort_order: str = 'desc', search: str = None):
+    """Like get_contracts, but returns plain row tuples with only the schemas.ContractSummary columns"""
+    query = _contracts_query(db, *CONTRACT_LIST_COLUMNS, search=search)
+    return _order_contracts(query, sort_by, sort_order).offset(skip).limit(limit).all()
 
 
 def get_contracts_count(db: Session, search: str = None):
-    query = db.query(models.DBContract).filter(models.DBContract.deleted_at.is_(None))
-    
-    if search:
-        query = query.filter(
-            models.DBContract.client_name.ilike(f"%{search}%") |
-            models.DBContract.client_email.ilike(f"%{search}%")
-        )
-        
-    return query.count()
+    return _contracts_query(db, models.DBContract, search=search).count()
 
 def create_contract(db: Session, contract: schemas.ContractCreate, design_image_path: str):
     db_contract = models.DBContract(
@@ -55,9 +76,9 @@ def create_contract(db: Session, contract: schemas.ContractCreate, design_image_
         client_email=contract.client_data.email,
         design_image_path=design_image_path,
         titulo_diseno=contract.titulo_diseno,
-        puesto_empresa=contract.puesto_empresa,
-        politica_confirmacion=contract.politica_confirmacion
+        puesto_empresa=contract.puesto_empresa
     )
+    set_contract_policy(db, db_contract, contract.politica_confirmacion)
     db.add(db_contract)
     db.commit()
     db.refresh(db_contract)
@@ -69,6 +90,10 @@ def update_contract(db: Session, contract_id: int, contract_update: schemas.Cont
         return None
     
     update_data = contract_update.dict(exclude_unset=True)
+    # Sin texto no se toca la política (no se puede dejar un contrato sin ella)
+    politica_confirmacion = update_data.pop('politica_confirmacion', None)
+    if politica_confirmacion:
+        set_contract_policy(db, db_contract, politica_confirmacion)
     for field, value in update_data.items():
         setattr(db_contract, field, value)
     
@@ -76,9 +101,19 @@ def update_contract(db: Session, contract_id: int, contract_update: schemas.Cont
     db.refresh(db_contract)
     return db_contract
 
+# DBContract columns holding storage keys
+CONTRACT_FILE_FIELDS = ('unsigned_pdf_path', 'signed_pdf_path', 'design_image_path', 'signature_image_path',
+                        'design_thumbnail_path', 'design_preview_path')
+
+
+def get_contract_file_paths(db_contract: models.DBContract):
+    return [getattr(db_contract, field) for field in CONTRACT_FILE_FIELDS if getattr(db_contract, field)]
+
+
 def delete_contract(db: Session, contract_id: int):
     from datetime import datetime
-    db_contract = get_contract(db, contract_id)
+    # Bloqueada: los ficheros que se liberan son los que tenía al borrarse
+    db_contract = get_contract(db, contract_id, lock=True)
     if not db_contract:
         return None
     
@@ -87,6 +122,182 @@ def delete_contract(db: Session, contract_id: int):
     return db_contract
 
 
+# Returned by delete_contracts: the webhook event fields and the files to release
+CONTRACT_DELETE_COLUMNS = ('id', 'client_name', 'client_email', 'titulo_diseno', 'puesto_empresa',
+                           'created_at', 'signed_at', 'deleted_at') + CONTRACT_FILE_FIELDS
+
+
+def delete_contracts(db: Session, contract_ids):
+    """
+    Soft-delete several contracts in a single UPDATE
+
+    Only the rows this UPDATE changed come back (RETURNING), so a contract
+    deleted concurrently by another request is never reported, nor its
+    files released, twice.
+
+    Returns:
+        list: Rows with the CONTRACT_DELETE_COLUMNS of the contracts deleted
+    """
+    rows = db.execute(
+        update(models.DBContract)
+        .where(models.DBContract.id.in_(contract_ids), models.DBContract.deleted_at.is_(None))
+        .values(deleted_at=datetime.utcnow())
+        .returning(*(getattr(models.DBContract, column) for column in CONTRACT_DELETE_COLUMNS))
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    return rows
+
+
+def text_sha256(content: str) -> str:
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def get_default_text_revision(db: Session, revision_id: int):
+    return db.query(models.DBDefaultTextRevision).filter(models.DBDefaultTextRevision.id == revision_id).first()
+
+
+def get_default_text_revisions(db: Session, default_text_id: int):
+    return (
+        db.query(models.DBDefaultTextRevision)
+        .filter(models.DBDefaultTextRevision.default_text_id == default_text_id)
+        .order_by(models.DBDefaultTextRevision.revision.desc())
+        .all()
+    )
+
+
+def find_default_text_revision(db: Session, content: str):
+    """Return the newest revision whose content is exactly content, if any"""
+    candidates = (
+        db.query(models.DBDefaultTextRevision)
+        .filter(models.DBDefaultTextRevision.content_sha256 == text_sha256(content))
+        .order_by(models.DBDefaultTextRevision.id.desc())
+        .all()
+    )
+    return next((revision for revision in candidates if revision.content == content), None)
+
+
+def _add_default_text_revision(db: Session, db_default_text: models.DBDefaultText):
+    last_revision = (
+        db.query(models.DBDefaultTextRevision.revision)
+        .filter(models.DBDefaultTextRevision.default_text_id == db_default_text.id)
+        .order_by(models.DBDefaultTextRevision.revision.desc())
+        .first()
+    )
+    db_revision = models.DBDefaultTextRevision(
+        default_text_id=db_default_text.id,
+        revision=last_revision[0] + 1 if last_revision else 1,
+        content=db_default_text.content,
+        content_sha256=text_sha256(db_default_text.content)
+    )
+    db.add(db_revision)
+    return db_revision
+
+
+def set_contract_policy(db: Session, db_contract: models.DBContract, politica_confirmacion: str):
+    """
+    Point a contract at the revision holding its policy text
+
+    The text is only stored inline when no default text revision has
+    exactly the same content (a custom policy for this contract).
+    """
+    db_revision = find_default_text_revision(db, politica_confirmacion) if politica_confirmacion else None
+    if db_revision:
+        db_contract.politica_revision_id = db_revision.id
+        db_contract.politica_confirmacion = None
+    else:
+        db_contract.politica_revision_id = None
+        db_contract.politica_confirmacion = politica_confirmacion or None
+
+
+def get_contract_policy_text(db_contract: models.DBContract):
+    """Policy text of a contract, whether inline or referenced by revision"""
+    return db_contract.politica_texto
+
+
+def get_blob(db: Session, sha256: str):
+    return db.query(models.DBBlob).filter(models.DBBlob.sha256 == sha256).first()
+
+
+BLOB_LOCK_STRIPES = 64
+_blob_locks = [threading.Lock() for _ in range(BLOB_LOCK_STRIPES)]
+
+
+def _blob_lock_key(sha256: str) -> int:
+    # pg_advisory_xact_lock takes a signed 64-bit key
+    key = int(sha256[:16], 16)
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+@contextmanager
+def blob_lock(db: Session, sha256: str):
+    """
+    Serialize everything done to one blob: its references and its file
+
+    Taking or dropping a reference and writing or deleting the file must
+    happen inside the same block, so an identical upload can never reuse a
+    file that a release or the GC is about to delete. Threads of this
+    process wait on a striped lock; other workers wait on a Postgres
+    advisory lock keyed on the hash, held until the transaction ends.
+    The session is committed when the block exits, rolled back on error,
+    so it should have nothing else pending.
+    """
+    with _blob_locks[int(sha256[:8], 16) % BLOB_LOCK_STRIPES]:
+        try:
+            if db.get_bind().dialect.name == "postgresql":
+                db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _blob_lock_key(sha256)})
+            yield
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+
+
+def acquire_blob(db: Session, sha256: str, path: str, size: int, content_type: str = None):
+    """Add a reference to a blob, creating it on first use (call inside blob_lock)"""
+    db_blob = db.query(models.DBBlob).filter(models.DBBlob.sha256 == sha256).with_for_update().first()
+    if db_blob:
+        db_blob.ref_count += 1
+        db_blob.updated_at = datetime.utcnow()
+        return db_blob
+    try:
+        with db.begin_nested():
+            db_blob = models.DBBlob(sha256=sha256, path=path, size=size, content_type=content_type, ref_count=1)
+            db.add(db_blob)
+    except IntegrityError:
+        # Creado a la vez sin pasar por blob_lock: se añade la referencia al existente
+        db_blob = db.query(models.DBBlob).filter(models.DBBlob.sha256 == sha256).with_for_update().one()
+        db_blob.ref_count += 1
+        db_blob.updated_at = datetime.utcnow()
+    return db_blob
+
+
+def release_blob(db: Session, sha256: str):
+    """
+    Drop a reference to a blob, deleting its row when none are left (call inside blob_lock)
+
+    Returns:
+        int: References left (0 means the file can be removed), None if the blob is unknown
+    """
+    db_blob = db.query(models.DBBlob).filter(models.DBBlob.sha256 == sha256).with_for_update().first()
+    if not db_blob:
+        return None
+    db_blob.ref_count -= 1
+    remaining = db_blob.ref_count
+    if remaining <= 0:
+        db.delete(db_blob)
+    else:
+        db_blob.updated_at = datetime.utcnow()
+    db.flush()
+    return max(remaining, 0)
+
+
+def _notify_default_text_changed(db: Session, key: str):
+    # Sent inside the write transaction: Postgres delivers it to the other workers on commit
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_notify(:channel, :key)"), {"channel": INVALIDATION_CHANNEL, "key": key})
+
+
 def get_default_text(db: Session, key: str):
     return db.query(models.DBDefaultText).filter(models.DBDefaultText.key == key).first()
 
@@ -101,7 +312,11 @@ def create_default_text(db: Session, default_text: schemas.DefaultTextCreate):
         content=default_text.content
     )
     db.add(db_default_text)
+    db.flush()
+    _add_default_text_revision(db, db_default_text)
+    _notify_default_text_changed(db, db_default_text.key)
     db.commit()
+    default_text_cache.invalidate(db_default_text.key)
     db.refresh(db_default_text)
     return db_default_text
 
@@ -112,9 +327,14 @@ def update_default_text(db: Session, key: str, default_text_update: schemas.Defa
     if not db_default_text:
         return None
     
-    db_default_text.content = default_text_update.content
+    if db_default_text.content != default_text_update.content:
+        db_default_text.content = default_text_update.content
+        # Revisions are immutable: contracts keep pointing at the old one
+        _add_default_text_revision(db, db_default_text)
     db_default_text.updated_at = datetime.utcnow()
+    _notify_default_text_changed(db, key)
     db.commit()
+    default_text_cache.invalidate(key)
     db.refresh(db_default_text)
     return db_default_text
 
@@ -124,6 +344,69 @@ def delete_default_text(db: Session, key: str):
     if not db_default_text:
         return None
     
+    # Keep the revisions, contracts may still reference them
+    db.query(models.DBDefaultTextRevision).filter(
+        models.DBDefaultTextRevision.default_text_id == db_default_text.id
+    ).update({models.DBDefaultTextRevision.default_text_id: None}, synchronize_session=False)
     db.delete(db_default_text)
+    _notify_default_text_changed(db, key)
     db.commit()
+    default_text_cache.invalidate(key)
     return db_default_text
+
+
+
+def get_webhook_subscription(db: Session, subscription_id: int):
+    return db.query(models.DBWebhookSubscription).filter(models.DBWebhookSubscription.id == subscription_id).first()
+
+
+def get_webhook_subscriptions(db: Session, skip: int = 0, limit: int = 100):
+    return db.query(models.DBWebhookSubscription).order_by(models.DBWebhookSubscription.id).offset(skip).limit(limit).all()
+
+
+def get_active_webhook_subscriptions(db: Session, event_type: str):
+    subscriptions = db.query(models.DBWebhookSubscription).filter(models.DBWebhookSubscription.active.is_(True)).all()
+    return [
+        subscription for subscription in subscriptions
+        if subscription.events == "*" or event_type in subscription.events.split(',')
+    ]
+
+
+def create_webhook_subscription(db: Session, subscription: schemas.WebhookSubscriptionCreate):
+    import secrets
+    db_subscription = models.DBWebhookSubscription(
+        url=subscription.url,
+        secret=subscription.secret or secrets.token_hex(32),
+        events=",".join(subscription.events),
+        description=subscription.description
+    )
+    db.add(db_subscription)
+    db.commit()
+    db.refresh(db_subscription)
+    return db_subscription
+
+
+def update_webhook_subscription(db: Session, subscription_id: int, subscription_update: schemas.WebhookSubscriptionUpdate):
+    db_subscription = get_webhook_subscription(db, subscription_id)
+    if not db_subscription:
+        return None
+    
+    update_data = subscription_update.model_dump(exclude_unset=True)
+    if "events" in update_data:
+        update_data["events"] = ",".join(update_data["events"])
+    for field, value in update_data.items():
+        setattr(db_subscription, field, value)
+    
+    db.commit()
+    db.refresh(db_subscription)
+    return db_subscription
+
+
+def delete_webhook_subscription(db: Session, subscription_id: int):
+    db_subscription = get_webhook_subscription(db, subscription_id)
+    if not db_subscription:
+        return None
+    
+    db.delete(db_subscription)
+    db.commit()
+    return db_subscription
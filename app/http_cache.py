@@ -0,0 +1,108 @@
+"""
+HTTP caching helpers: strong ETags, conditional requests and Cache-Control
+"""
+
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, Response
+from fastapi.staticfiles import StaticFiles
+
+# Contract PDFs contain client data and can be regenerated: cache privately, always revalidate
+PRIVATE_REVALIDATE = "private, no-cache"
+# Public data that changes rarely: any cache may store it, but must revalidate
+PUBLIC_REVALIDATE = "public, no-cache"
+# Uploads get a unique name per file and never change
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def make_etag(content_hash: str) -> str:
+    """Build a strong ETag from a content hash"""
+    return f'"{content_hash}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison, RFC 9110)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def not_modified_since(if_modified_since: Optional[str], mtime: float) -> bool:
+    """Check an If-Modified-Since header against a file modification time"""
+    if not if_modified_since:
+        return False
+    try:
+        return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+def conditional_file_response(
+    request: Request,
+    file_path: str,
+    content_hash: Optional[str] = None,
+    media_type: str = "application/pdf",
+    cache_control: str = PRIVATE_REVALIDATE
+) -> Response:
+    """
+    Serve a file honouring If-None-Match / If-Modified-Since and Range
+    
+    When content_hash is known the ETag check happens before touching the
+    filesystem, so a revalidation costs no I/O and no body bytes. Range and
+    If-Range requests are answered by FileResponse using the same ETag.
+    
+    Args:
+        request: Incoming request
+        file_path: Path to the file to serve
+        content_hash: SHA-256 of the file contents, used as strong ETag
+        media_type: Content type of the file
+        cache_control: Cache-Control header value
+    
+    Returns:
+        Response: 304 Not Modified or a (partial) FileResponse
+    """
+    headers = {"Cache-Control": cache_control}
+    if content_hash:
+        etag = make_etag(content_hash)
+        headers["ETag"] = etag
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+    
+    try:
+        stat_result = os.stat(file_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    headers["Last-Modified"] = formatdate(stat_result.st_mtime, usegmt=True)
+    if "if-none-match" not in request.headers and not_modified_since(
+        request.headers.get("if-modified-since"), stat_result.st_mtime
+    ):
+        return Response(status_code=304, headers=headers)
+    
+    return FileResponse(file_path, media_type=media_type, headers=headers, stat_result=stat_result)
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles with Cache-Control headers
+    
+    StaticFiles already answers If-None-Match / If-Modified-Since with 304
+    and FileResponse serves Range requests; this only adds caching policy:
+    uploads and design derivatives are immutable, everything else must be
+    revalidated.
+    """
+    
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        path = scope.get("path", "")
+        if "/uploads/" in path or "/derivatives/" in path:
+            response.headers["Cache-Control"] = IMMUTABLE
+        else:
+            response.headers["Cache-Control"] = PRIVATE_REVALIDATE
+        return response
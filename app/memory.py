@@ -0,0 +1,269 @@
+"""
+Process memory readings (resident set size) and tracemalloc profiling
+"""
+
+import gc
+import os
+import sys
+import threading
+import tracemalloc
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+# Allocations are attributed to the innermost frame in one of these groups
+MODULE_GROUPS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("Pillow", (f"{os.sep}PIL{os.sep}",)),
+    ("reportlab", (f"{os.sep}reportlab{os.sep}",)),
+    ("email/MIME", (f"{os.sep}email{os.sep}", f"{os.sep}services{os.sep}email_service.py")),
+    ("SQLAlchemy", (f"{os.sep}sqlalchemy{os.sep}",)),
+    ("FastAPI/Starlette", (f"{os.sep}fastapi{os.sep}", f"{os.sep}starlette{os.sep}",
+                           f"{os.sep}multipart{os.sep}", f"{os.sep}anyio{os.sep}")),
+    ("app", (APP_DIR,)),
+)
+OTHER_GROUP = "other"
+
+# The profiler's own bookkeeping is left out of every snapshot
+_IGNORED_TRACES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Highest resident set size this process has reached, None if unknown"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def current_rss_bytes() -> Optional[int]:
+    """Current resident set size, None where /proc is not available"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def format_bytes(size: Optional[int]) -> str:
+    if size is None:
+        return "n/a"
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+def module_group(traceback: tracemalloc.Traceback) -> str:
+    """Group of the innermost frame of traceback that belongs to a known module"""
+    for frame in reversed(traceback):
+        for group, fragments in MODULE_GROUPS:
+            if any(fragment in frame.filename for fragment in fragments):
+                return group
+    return OTHER_GROUP
+
+
+def take_snapshot() -> tracemalloc.Snapshot:
+    """Collect garbage and snapshot live allocations, without the profiler's own"""
+    gc.collect()
+    return tracemalloc.take_snapshot().filter_traces(_IGNORED_TRACES)
+
+
+def allocations_by_module(snapshot: tracemalloc.Snapshot) -> Dict[str, Dict[str, int]]:
+    """Live bytes and blocks in snapshot per module group"""
+    groups = {group: {'size': 0, 'count': 0} for group, _ in MODULE_GROUPS}
+    groups[OTHER_GROUP] = {'size': 0, 'count': 0}
+    for stat in snapshot.statistics('traceback'):
+        totals = groups[module_group(stat.traceback)]
+        totals['size'] += stat.size
+        totals['count'] += stat.count
+    return groups
+
+
+def subtract_allocations(after: Dict[str, Dict[str, int]],
+                         before: Dict[str, Dict[str, int]]) -> Dict[str, Dict[str, int]]:
+    """Per-group growth from before to after"""
+    return {
+        group: {key: totals[key] - before.get(group, {}).get(key, 0) for key in totals}
+        for group, totals in after.items()
+    }
+
+
+def top_allocations(snapshot: tracemalloc.Snapshot, baseline: Optional[tracemalloc.Snapshot] = None,
+                    limit: int = 10) -> List[Dict[str, object]]:
+    """Source lines holding the most memory (or gaining the most since baseline)"""
+    if baseline is None:
+        stats = [(stat.traceback, stat.size, stat.count) for stat in snapshot.statistics('lineno')]
+    else:
+        stats = [(stat.traceback, stat.size_diff, stat.count_diff)
+                 for stat in snapshot.compare_to(baseline, 'lineno')]
+    stats.sort(key=lambda item: item[1], reverse=True)
+    return [
+        {'location': f"{traceback[0].filename}:{traceback[0].lineno}", 'size': size, 'count': count}
+        for traceback, size, count in stats[:limit] if size > 0
+    ]
+
+
+class AllocationTracker:
+    """
+    Peak and retained allocations of one block of work, per module group
+
+    tracemalloc only reports the peak as a single number. With
+    sample_peaks, a background thread also snapshots the allocations each
+    time the traced size grows by more than growth_step; the last of
+    those snapshots is the composition at (close to) the peak. Sampling
+    resets the tracemalloc peak after each snapshot so the snapshot itself
+    doesn't count, which can hide a short spike that happens while it is
+    being taken: measure peak_bytes with sample_peaks off and use sampled
+    runs for the composition.
+
+    Memory that C extensions allocate with plain malloc (Pillow's pixel
+    buffers) is invisible to tracemalloc; the RSS readings cover it.
+
+    Args:
+        sample_peaks: Fill peak_by_module by sampling
+        interval: Seconds between samples
+        growth_step: Relative growth that triggers a new peak snapshot
+    """
+
+    def __init__(self, sample_peaks: bool = False, interval: float = 0.005, growth_step: float = 0.05):
+        self.sample_peaks = sample_peaks
+        self.interval = interval
+        self.growth_step = growth_step
+        self.peak_bytes = 0
+        self.peak_by_module: Dict[str, Dict[str, int]] = {}
+        self.retained_bytes = 0
+        self.retained_by_module: Dict[str, Dict[str, int]] = {}
+        self.rss_growth_bytes: Optional[int] = None
+        self.peak_rss_growth_bytes: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "AllocationTracker":
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not tracing, call tracemalloc.start() first")
+        self._baseline = allocations_by_module(take_snapshot())
+        self._baseline_bytes = sum(totals['size'] for totals in self._baseline.values())
+        self._start_traced = tracemalloc.get_traced_memory()[0]
+        self._start_rss = current_rss_bytes()
+        self._start_peak_rss = peak_rss_bytes()
+        self._peak_traced = self._start_traced
+        tracemalloc.reset_peak()
+        if self.sample_peaks:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._sample, name="allocation-tracker", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self._peak_traced = max(self._peak_traced, tracemalloc.get_traced_memory()[1])
+        self.peak_bytes = self._peak_traced - self._start_traced
+
+        retained = allocations_by_module(take_snapshot())
+        self.retained_by_module = subtract_allocations(retained, self._baseline)
+        self.retained_bytes = sum(totals['size'] for totals in retained.values()) - self._baseline_bytes
+        if self.sample_peaks and not self.peak_by_module:
+            # Demasiado rápido para que el muestreo lo viera crecer
+            self.peak_by_module = self.retained_by_module
+
+        rss, peak_rss = current_rss_bytes(), peak_rss_bytes()
+        if rss is not None and self._start_rss is not None:
+            self.rss_growth_bytes = rss - self._start_rss
+        if peak_rss is not None and self._start_peak_rss is not None:
+            self.peak_rss_growth_bytes = peak_rss - self._start_peak_rss
+
+    def _sample(self) -> None:
+        threshold = self._start_traced
+        while not self._stop.wait(self.interval):
+            current, peak = tracemalloc.get_traced_memory()
+            self._peak_traced = max(self._peak_traced, peak)
+            if current <= threshold:
+                continue
+            snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED_TRACES)
+            self.peak_by_module = subtract_allocations(allocations_by_module(snapshot), self._baseline)
+            del snapshot
+            threshold = current * (1 + self.growth_step)
+            # Olvida el pico causado por la propia instantánea
+            tracemalloc.reset_peak()
+
+
+class MemoryProfiler:
+    """
+    Process-wide tracemalloc switch with reports relative to when it started
+
+    Tracing slows allocations down noticeably, so it is only on between
+    start() and stop(). Each worker process has its own profiler.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self.frames = 0
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 10) -> None:
+        with self._lock:
+            if tracemalloc.is_tracing():
+                return
+            tracemalloc.start(frames)
+            self.frames = frames
+            self._baseline = take_snapshot()
+
+    def stop(self, limit: int = 10) -> Dict[str, object]:
+        """Stop tracing and return the final report"""
+        with self._lock:
+            report = self._report(limit)
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            self._baseline = None
+            return report
+
+    def report(self, limit: int = 10) -> Dict[str, object]:
+        """
+        Memory retained since start(), per module group and per source line
+
+        Returns:
+            dict: Tracing state, traced and RSS sizes, retained_by_module and top_allocations
+        """
+        with self._lock:
+            return self._report(limit)
+
+    def _report(self, limit: int) -> Dict[str, object]:
+        report = {
+            'tracing': tracemalloc.is_tracing(),
+            'frames': self.frames if tracemalloc.is_tracing() else 0,
+            'traced_bytes': None,
+            'traced_peak_bytes': None,
+            'rss_bytes': current_rss_bytes(),
+            'peak_rss_bytes': peak_rss_bytes(),
+            'retained_by_module': [],
+            'top_allocations': [],
+        }
+        if not tracemalloc.is_tracing():
+            return report
+
+        report['traced_bytes'], report['traced_peak_bytes'] = tracemalloc.get_traced_memory()
+        snapshot = take_snapshot()
+        retained = subtract_allocations(allocations_by_module(snapshot), allocations_by_module(self._baseline))
+        report['retained_by_module'] = [
+            {'module': group, 'size': totals['size'], 'count': totals['count']}
+            for group, totals in sorted(retained.items(), key=lambda item: item[1]['size'], reverse=True)
+        ]
+        report['top_allocations'] = top_allocations(snapshot, self._baseline, limit)
+        return report
+
+
+memory_profiler = MemoryProfiler()
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, ForeignKey, Integer, String, Text
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.orm import relationship
 from pydantic import BaseModel, Field, ConfigDict
@@ -27,17 +27,34 @@ class DBContract(Base):
     client_name = Column(String, index=True)
     client_email = Column(String, index=True)
     design_image_path = Column(String)
+    design_thumbnail_path = Column(String, nullable=True)  # Small rendition for listings
+    design_preview_path = Column(String, nullable=True)  # Medium rendition for previews
     titulo_diseno = Column(String, nullable=True)
     puesto_empresa = Column(String, nullable=True)
-    politica_confirmacion = Column(Text, nullable=True)
+    politica_confirmacion = Column(Text, nullable=True)  # Only for custom texts; otherwise see politica_revision_id
+    politica_revision_id = Column(Integer, ForeignKey("default_text_revisions.id"), nullable=True, index=True)
     unsigned_pdf_path = Column(String, nullable=True)
     signed_pdf_path = Column(String, nullable=True)
+    signature_image_path = Column(String, nullable=True)
+    unsigned_pdf_sha256 = Column(String(64), nullable=True)  # Strong ETag for the unsigned PDF
+    signed_pdf_sha256 = Column(String(64), nullable=True)  # Strong ETag for the signed PDF
     created_at = Column(DateTime, default=datetime.utcnow)
     signed_at = Column(DateTime, nullable=True)
     signer_ip = Column(String, nullable=True)
     signer_user_agent = Column(String, nullable=True)
     deleted_at = Column(DateTime, nullable=True)
 
+    politica_revision = relationship("DBDefaultTextRevision")
+
+    @property
+    def politica_texto(self):
+        """Policy text, whether stored inline or referenced by revision"""
+        if self.politica_confirmacion:
+            return self.politica_confirmacion
+        if self.politica_revision_id:
+            return self.politica_revision.content
+        return None
+
 
 class DBDefaultText(Base):
     __tablename__ = "default_texts"
@@ -49,6 +66,44 @@ class DBDefaultText(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
+# Immutable snapshot of a default text; contracts reference these instead of copying the text
+class DBDefaultTextRevision(Base):
+    __tablename__ = "default_text_revisions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # NULL for historical texts that no longer belong to a default text
+    default_text_id = Column(Integer, ForeignKey("default_texts.id", ondelete="SET NULL"), nullable=True, index=True)
+    revision = Column(Integer, nullable=False, default=1)
+    content = Column(Text, nullable=False)
+    content_sha256 = Column(String(64), nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+# Content-addressed file: the path is derived from the SHA-256, ref_count tracks the contracts using it
+class DBBlob(Base):
+    __tablename__ = "blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    path = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    content_type = Column(String, nullable=True)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class DBWebhookSubscription(Base):
+    __tablename__ = "webhook_subscriptions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    url = Column(String, nullable=False)
+    secret = Column(String, nullable=False)
+    events = Column(String, nullable=False, default="*")  # Comma-separated event types, "*" for all
+    description = Column(String, nullable=True)
+    active = Column(Boolean, default=True, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
 class User(BaseModel):
     id: int
     username: str
@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends, Query
+from starlette.concurrency import run_in_threadpool
+
+from .. import auth, schemas
+from ..logger import get_logger, log_business_event
+from ..memory import memory_profiler
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+logger = get_logger(__name__)
+
+
+@router.get("/memory-profiling", response_model=schemas.MemoryProfilingReport)
+async def get_memory_profile(
+    limit: int = Query(10, ge=1, le=100),
+    current_user = Depends(auth.get_current_admin)
+):
+    """
+    Memory retained since profiling was enabled, grouped by module, plus the
+    source lines that grew the most. Only covers the worker that answers.
+    """
+    return await run_in_threadpool(memory_profiler.report, limit)
+
+
+@router.post("/memory-profiling", response_model=schemas.MemoryProfilingReport)
+async def toggle_memory_profiling(
+    toggle: schemas.MemoryProfilingToggle,
+    limit: int = Query(10, ge=1, le=100),
+    current_user = Depends(auth.get_current_admin)
+):
+    """
+    Turn tracemalloc on or off in this worker. Tracing slows every
+    allocation down, leave it on only while investigating.
+    """
+    if toggle.enabled:
+        await run_in_threadpool(memory_profiler.start, toggle.frames)
+        report = await run_in_threadpool(memory_profiler.report, limit)
+    else:
+        report = await run_in_threadpool(memory_profiler.stop, limit)
+    log_business_event(
+        logger,
+        "memory_profiling",
+        f"Memory profiling {'enabled' if toggle.enabled else 'disabled'} by {current_user['username']}",
+        enabled=toggle.enabled
+    )
+    return report
@@ -1,21 +1,48 @@
-import os
+import io
 import json
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request, Query
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Form, Request, Query
+from fastapi.responses import ORJSONResponse, Response
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from .. import auth, crud, models, schemas
 from ..database import get_db
-from ..services.pdf_service import create_professional_pdf
-from ..services.file_service import save_uploaded_file, delete_file_if_exists, CONTRACTS_DIR
+from ..config import settings
+from ..services.pdf_service import (
+    create_professional_pdf, check_policy_layout, render_pdf_bytes, draft_preview_key, draft_preview_cache,
+    ImageTooLarge
+)
+from ..services.file_service import (
+    store_upload, store_bytes, release_file, release_files_in_background, stored_file_sha256, storage,
+    CONTRACTS_DIR, IMAGE_CONTENT_TYPES
+)
 from ..services.email_service import email_service
+from ..services.download_service import serve_file
+from ..services.webhook_service import webhook_dispatcher, contract_event_data
+from ..services.render_pool import render_pool, RenderPoolBusy
+from ..services.design_derivatives import attach_design_derivatives
 
 router = APIRouter(prefix="/contracts", tags=["contracts"])
 
 
+def _discard_new_contract(db: Session, db_contract: models.DBContract):
+    """
+    Remove a contract whose PDF could not be generated, and release its upload
+
+    Without this a failed render left a live contract pointing at the
+    upload, so the storage GC could never collect it.
+    """
+    db.rollback()
+    design_image_path = db_contract.design_image_path
+    db.delete(db_contract)
+    db.commit()
+    release_file(db, design_image_path)
+
+
 @router.post("/", response_model=schemas.Contract)
 async def create_contract(
+    background_tasks: BackgroundTasks,
     client_data: str = Form(...),
     design_image: UploadFile = File(...),
     titulo_diseno: str = Form(None),
@@ -36,42 +63,56 @@ async def create_contract(
         raise HTTPException(status_code=400, detail="Invalid client_data format")
 
     # Save design image
-    design_image_path = save_uploaded_file(design_image)
+    stored_image = await store_upload(db, design_image, allowed_types=IMAGE_CONTENT_TYPES)
+    design_image_path = stored_image.path
 
     # Create contract in database
     db_contract = crud.create_contract(db=db, contract=contract_create, design_image_path=design_image_path)
 
     # Generate unsigned PDF
-    unsigned_pdf_filename = f"{db_contract.id}_unsigned.pdf"
-    unsigned_pdf_path = os.path.join(CONTRACTS_DIR, unsigned_pdf_filename)
+    pdf_buffer = io.BytesIO()
 
     try:
         create_professional_pdf(
-            pdf_path=unsigned_pdf_path,
+            pdf_path=pdf_buffer,
             client_name=db_contract.client_name,
             client_email=db_contract.client_email,
             design_image_path=design_image_path,
             titulo_diseno=db_contract.titulo_diseno,
             puesto_empresa=db_contract.puesto_empresa,
-            politica_confirmacion=db_contract.politica_confirmacion
+            politica_confirmacion=crud.get_contract_policy_text(db_contract)
         )
     except Exception as e:
+        _discard_new_contract(db, db_contract)
+        if isinstance(e, ImageTooLarge):
+            raise HTTPException(status_code=413, detail=str(e))
         raise HTTPException(status_code=500, detail=f"Could not process design image: {e}")
 
     # Update contract with PDF path
-    db_contract.unsigned_pdf_path = unsigned_pdf_path
+    try:
+        stored_pdf = await store_bytes(db, pdf_buffer.getvalue(), "pdf", "application/pdf", CONTRACTS_DIR)
+    except BaseException:
+        _discard_new_contract(db, db_contract)
+        raise
+    db_contract.unsigned_pdf_path = stored_pdf.path
+    db_contract.unsigned_pdf_sha256 = stored_pdf.sha256
     db.commit()
     db.refresh(db_contract)
+    # Miniatura y vista previa para los listados, en el pool de render tras la respuesta
+    background_tasks.add_task(attach_design_derivatives, db_contract.id)
+    await webhook_dispatcher.publish(db, "contract.created", contract_event_data(db_contract))
     
     # Send automatic invitation email to client
     if db_contract.client_email:
         try:
-            await email_service.send_contract_invitation(
+            invitation_sent = await email_service.send_contract_invitation(
                 to_email=db_contract.client_email,
                 client_name=db_contract.client_name,
                 contract_id=db_contract.id,
                 titulo_diseno=db_contract.titulo_diseno
             )
+            if invitation_sent:
+                await webhook_dispatcher.publish(db, "contract.invitation_sent", contract_event_data(db_contract))
             print(f"✅ Invitation email sent automatically to {db_contract.client_email}")
         except Exception as e:
             # Log the error but don't fail the contract creation
@@ -82,12 +123,98 @@ async def create_contract(
     return db_contract
 
 
+@router.post("/layout-check", response_model=schemas.LayoutCheckResult)
+async def layout_check(
+    layout_request: schemas.LayoutCheckRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """Report whether the policy text fits the page, without rendering a PDF"""
+    politica_confirmacion = layout_request.politica_confirmacion
+    if layout_request.politica_revision_id is not None:
+        db_revision = crud.get_default_text_revision(db, layout_request.politica_revision_id)
+        if not db_revision:
+            raise HTTPException(status_code=404, detail="Default text revision not found")
+        politica_confirmacion = db_revision.content
+
+    # Text typed in the form changes on every call: don't let it evict cached policy layouts
+    use_cache = layout_request.politica_revision_id is not None or not politica_confirmacion
+    return check_policy_layout(
+        layout_request.image_width,
+        layout_request.image_height,
+        politica_confirmacion,
+        use_cache=use_cache
+    )
+
+
+@router.post("/draft-preview")
+async def draft_preview(
+    client_data: str = Form(...),
+    design_image: UploadFile = File(...),
+    titulo_diseno: str = Form(None),
+    puesto_empresa: str = Form(None),
+    politica_confirmacion: str = Form(None),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """Render the PDF a contract would get, without saving anything or sending email"""
+    try:
+        contract_create = schemas.ContractCreate(
+            client_data=json.loads(client_data),
+            titulo_diseno=titulo_diseno,
+            puesto_empresa=puesto_empresa,
+            politica_confirmacion=politica_confirmacion
+        )
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid client_data format")
+
+    max_bytes = settings.DRAFT_PREVIEW_MAX_IMAGE_BYTES
+    image_bytes = await design_image.read(max_bytes + 1)
+    if len(image_bytes) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Design image larger than {max_bytes} bytes")
+
+    pdf_fields = {
+        'client_name': contract_create.client_data.name,
+        'client_email': contract_create.client_data.email,
+        'titulo_diseno': contract_create.titulo_diseno,
+        'puesto_empresa': contract_create.puesto_empresa,
+        'politica_confirmacion': contract_create.politica_confirmacion,
+    }
+    cache_key = draft_preview_key(image_bytes, **pdf_fields)
+    pdf_bytes = draft_preview_cache.get(cache_key)
+    if pdf_bytes is None:
+        try:
+            pdf_bytes = await render_pool.run(render_pdf_bytes, image_bytes, **pdf_fields)
+        except RenderPoolBusy:
+            raise HTTPException(status_code=503, detail="Too many previews in progress, try again shortly")
+        except ImageTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Could not process design image: {e}")
+        draft_preview_cache.set(cache_key, pdf_bytes)
+
+    return Response(
+        content=pdf_bytes,
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": 'inline; filename="borrador.pdf"',
+            "Cache-Control": "no-store",
+        }
+    )
+
+
 @router.get("/{contract_id}/preview")
-async def preview_contract(contract_id: int, db: Session = Depends(get_db)):
+async def preview_contract(request: Request, contract_id: int, db: Session = Depends(get_db)):
     db_contract = crud.get_contract(db, contract_id=contract_id)
     if not db_contract or not db_contract.unsigned_pdf_path:
         raise HTTPException(status_code=404, detail="Contract not found or not yet processed")
-    return FileResponse(db_contract.unsigned_pdf_path)
+    
+    # Contracts created before hashes were stored get theirs on first download
+    if not db_contract.unsigned_pdf_sha256 and await run_in_threadpool(storage.exists, db_contract.unsigned_pdf_path):
+        db_contract.unsigned_pdf_sha256 = await run_in_threadpool(stored_file_sha256, db_contract.unsigned_pdf_path)
+        db.commit()
+    
+    # Con almacenamiento remoto puede descargar el archivo a la caché local
+    return await run_in_threadpool(serve_file, request, db_contract.unsigned_pdf_path, db_contract.unsigned_pdf_sha256)
 
 
 @router.post("/{contract_id}/sign")
@@ -104,36 +231,47 @@ async def sign_contract(
         raise HTTPException(status_code=404, detail="Contract not found or not yet processed")
 
     # Save signature image
-    signature_path = save_uploaded_file(signature_image)
+    stored_signature = await store_upload(db, signature_image, allowed_types=IMAGE_CONTENT_TYPES)
+    signature_path = stored_signature.path
 
     # Generate signed PDF
-    signed_pdf_filename = f"{db_contract.id}_signed.pdf"
-    signed_pdf_path = os.path.join(CONTRACTS_DIR, signed_pdf_filename)
+    pdf_buffer = io.BytesIO()
     signed_at_str = datetime.utcnow().strftime("%d/%m/%Y %H:%M")
     
     try:
         create_professional_pdf(
-            pdf_path=signed_pdf_path,
+            pdf_path=pdf_buffer,
             client_name=db_contract.client_name,
             client_email=db_contract.client_email,
             design_image_path=db_contract.design_image_path,
             titulo_diseno=db_contract.titulo_diseno,
             puesto_empresa=puesto_empresa,  # Usar el valor del formulario, no de la BD
-            politica_confirmacion=db_contract.politica_confirmacion,
+            politica_confirmacion=crud.get_contract_policy_text(db_contract),
             signature_path=signature_path,
             signed_by=signed_by,
             signed_at_str=signed_at_str
         )
     except Exception as e:
+        release_file(db, signature_path)
+        if isinstance(e, ImageTooLarge):
+            raise HTTPException(status_code=413, detail=str(e))
         raise HTTPException(status_code=500, detail=f"Could not process images: {e}")
 
-    # Update contract with signature info
+    # Update contract with signature info (a new signature replaces the previous files)
+    stored_pdf = await store_bytes(db, pdf_buffer.getvalue(), "pdf", "application/pdf", CONTRACTS_DIR)
+    previous_files = [db_contract.signed_pdf_path, db_contract.signature_image_path]
+    signed_pdf_path = stored_pdf.path
     db_contract.signed_pdf_path = signed_pdf_path
+    db_contract.signed_pdf_sha256 = stored_pdf.sha256
+    db_contract.signature_image_path = signature_path
     db_contract.signed_at = datetime.utcnow()
     db_contract.signer_ip = request.client.host
     db_contract.signer_user_agent = request.headers.get("user-agent")
     db.commit()
     db.refresh(db_contract)
+    for file_path in previous_files:
+        release_file(db, file_path)
+    await webhook_dispatcher.publish(db, "contract.signed", contract_event_data(db_contract))
 
     # Send automatic confirmation email to client
     if db_contract.client_email:
@@ -143,7 +281,8 @@ async def sign_contract(
                 client_name=db_contract.client_name,
                 contract_id=db_contract.id,
                 signed_pdf_path=signed_pdf_path,
-                titulo_diseno=db_contract.titulo_diseno
+                titulo_diseno=db_contract.titulo_diseno,
+                signed_pdf_hash=db_contract.signed_pdf_sha256
             )
         except Exception as e:
             # Log the error but don't fail the contract signing
@@ -153,11 +292,17 @@ async def sign_contract(
 
 
 @router.get("/{contract_id}/signed")
-async def download_signed_contract(contract_id: int, db: Session = Depends(get_db)):
+async def download_signed_contract(request: Request, contract_id: int, db: Session = Depends(get_db)):
     db_contract = crud.get_contract(db, contract_id=contract_id)
     if not db_contract or not db_contract.signed_pdf_path:
         raise HTTPException(status_code=404, detail="Signed contract not found")
-    return FileResponse(db_contract.signed_pdf_path)
+    
+    if not db_contract.signed_pdf_sha256 and await run_in_threadpool(storage.exists, db_contract.signed_pdf_path):
+        db_contract.signed_pdf_sha256 = await run_in_threadpool(stored_file_sha256, db_contract.signed_pdf_path)
+        db.commit()
+    
+    # Con almacenamiento remoto puede descargar el archivo a la caché local
+    return await run_in_threadpool(serve_file, request, db_contract.signed_pdf_path, db_contract.signed_pdf_sha256)
 
 
 @router.get("/", response_model=schemas.PaginatedContracts)
@@ -172,8 +317,8 @@ async def list_contracts(
     # Calculate skip based on page
     skip = (page - 1) * page_size
     
-    # Get contracts and total count
-    contracts = crud.get_contracts(db, skip=skip, limit=page_size, sort_by=sort_by, sort_order=sort_order, search=search)
+    # Get contract rows and total count
+    rows = crud.get_contract_rows(db, skip=skip, limit=page_size, sort_by=sort_by, sort_order=sort_order, search=search)
     total = crud.get_contracts_count(db, search=search)
     
     # Calculate pagination info
@@ -181,20 +326,31 @@ async def list_contracts(
     has_next = page < total_pages
     has_prev = page > 1
     
-    # Create paginated response
-    pagination_info = schemas.PaginationInfo(
-        total=total,
-        page=page,
-        page_size=page_size,
-        total_pages=total_pages,
-        has_next=has_next,
-        has_prev=has_prev
-    )
-    
-    return schemas.PaginatedContracts(
-        items=contracts,
-        pagination=pagination_info
-    )
+    # Rows come straight from the DB with the schemas.ContractSummary columns, so they are
+    # serialized as-is instead of being validated into models twice (here and by response_model)
+    return ORJSONResponse({
+        "items": [row._asdict() for row in rows],
+        "pagination": {
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "total_pages": total_pages,
+            "has_next": has_next,
+            "has_prev": has_prev
+        }
+    })
+
+
+@router.get("/{contract_id}", response_model=schemas.Contract)
+async def get_contract(
+    contract_id: int,
+    db: Session = Depends(get_db)
+):
+    """One contract with its policy text, which list pages leave out"""
+    db_contract = crud.get_contract(db, contract_id=contract_id)
+    if not db_contract:
+        raise HTTPException(status_code=404, detail="Contract not found")
+    return db_contract
 
 
 @router.put("/{contract_id}", response_model=schemas.Contract)
@@ -212,18 +368,27 @@ async def update_contract(
     if (contract_update.client_name or contract_update.client_email or 
         contract_update.titulo_diseno or contract_update.puesto_empresa or 
         contract_update.politica_confirmacion):
+        pdf_buffer = io.BytesIO()
         try:
             create_professional_pdf(
-                pdf_path=db_contract.unsigned_pdf_path,
+                pdf_path=pdf_buffer,
                 client_name=db_contract.client_name,
                 client_email=db_contract.client_email,
                 design_image_path=db_contract.design_image_path,
                 titulo_diseno=db_contract.titulo_diseno,
                 puesto_empresa=db_contract.puesto_empresa,
-                politica_confirmacion=db_contract.politica_confirmacion
+                politica_confirmacion=crud.get_contract_policy_text(db_contract)
             )
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Could not regenerate PDF: {e}")
+        
+        stored_pdf = await store_bytes(db, pdf_buffer.getvalue(), "pdf", "application/pdf", CONTRACTS_DIR)
+        previous_pdf_path = db_contract.unsigned_pdf_path
+        db_contract.unsigned_pdf_path = stored_pdf.path
+        db_contract.unsigned_pdf_sha256 = stored_pdf.sha256
+        db.commit()
+        db.refresh(db_contract)
+        release_file(db, previous_pdf_path)
     
     return db_contract
 
@@ -231,6 +396,7 @@ async def update_contract(
 @router.delete("/{contract_id}")
 async def delete_contract(
     contract_id: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
@@ -238,14 +404,39 @@ async def delete_contract(
     if not db_contract:
         raise HTTPException(status_code=404, detail="Contract not found")
     
-    # Delete physical files
-    delete_file_if_exists(db_contract.unsigned_pdf_path)
-    delete_file_if_exists(db_contract.signed_pdf_path)
-    delete_file_if_exists(db_contract.design_image_path)
+    # Files are released after the response; shared blobs stay until their last reference goes
+    background_tasks.add_task(release_files_in_background, crud.get_contract_file_paths(db_contract))
+    
+    await webhook_dispatcher.publish(db, "contract.deleted", contract_event_data(db_contract))
     
     return {"message": "Contract deleted successfully"}
 
 
+@router.post("/bulk-delete", response_model=schemas.BulkDeleteResult)
+async def bulk_delete_contracts(
+    delete_request: schemas.BulkDeleteRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """Soft-delete several contracts at once; their files are released in the background"""
+    deleted_rows = crud.delete_contracts(db, delete_request.ids)
+    
+    file_paths = []
+    for row in deleted_rows:
+        file_paths.extend(crud.get_contract_file_paths(row))
+    background_tasks.add_task(release_files_in_background, file_paths)
+    
+    for row in deleted_rows:
+        await webhook_dispatcher.publish(db, "contract.deleted", contract_event_data(row))
+    
+    deleted = {row.id for row in deleted_rows}
+    return {
+        "deleted": sorted(deleted),
+        "not_found": [contract_id for contract_id in dict.fromkeys(delete_request.ids) if contract_id not in deleted]
+    }
+
+
 @router.post("/{contract_id}/send-invitation")
 async def send_contract_invitation(
     contract_id: int,
@@ -274,6 +465,7 @@ async def send_contract_invitation(
         )
         
         if success:
+            await webhook_dispatcher.publish(db, "contract.invitation_sent", contract_event_data(db_contract))
             return {"message": "Invitation email sent successfully", "email": db_contract.client_email}
         else:
             raise HTTPException(status_code=500, detail="Failed to send invitation email")
@@ -313,6 +505,7 @@ async def resend_contract_invitation(
         )
         
         if success:
+            await webhook_dispatcher.publish(db, "contract.invitation_sent", contract_event_data(db_contract))
             return {"message": "Invitation email resent successfully", "email": db_contract.client_email}
         else:
             raise HTTPException(status_code=500, detail="Failed to resend invitation email")
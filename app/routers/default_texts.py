@@ -1,12 +1,17 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse, Response
 from sqlalchemy.orm import Session
 
 from .. import auth, crud, schemas
 from ..database import get_db
+from ..http_cache import IMMUTABLE, PUBLIC_REVALIDATE, etag_matches, make_etag
+from ..services.default_text_cache import default_text_cache, combined_etag
 
 router = APIRouter(prefix="/default-texts", tags=["default-texts"])
 
+MAX_BATCH_KEYS = 50
+
 
 @router.get("/", response_model=List[schemas.DefaultText])
 async def list_default_texts(
@@ -18,15 +23,76 @@ async def list_default_texts(
     return crud.get_default_texts(db, skip=skip, limit=limit)
 
 
+# Declared before /{key} so "batch" isn't taken as a key
+@router.get("/batch", response_model=schemas.DefaultTextBatch)
+async def get_default_texts_batch(
+    request: Request,
+    keys: str = Query(..., description="Comma-separated list of keys"),
+    db: Session = Depends(get_db)
+):
+    key_list = list(dict.fromkeys(key.strip() for key in keys.split(",") if key.strip()))
+    if not key_list:
+        raise HTTPException(status_code=400, detail="At least one key is required")
+    if len(key_list) > MAX_BATCH_KEYS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_KEYS} keys per request")
+
+    entries = default_text_cache.get_many(db, key_list)
+    etag = combined_etag(entries)
+    headers = {"ETag": etag, "Cache-Control": PUBLIC_REVALIDATE}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    return ORJSONResponse({
+        'items': [entries[key].as_dict() for key in key_list if entries[key]],
+        'missing': [key for key in key_list if not entries[key]],
+    }, headers=headers)
+
+
+@router.get("/revisions/{revision_id}", response_model=schemas.DefaultTextRevision)
+async def get_default_text_revision(
+    revision_id: int,
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    db_revision = crud.get_default_text_revision(db, revision_id)
+    if not db_revision:
+        raise HTTPException(status_code=404, detail="Default text revision not found")
+
+    # Revisions never change once written
+    etag = make_etag(db_revision.content_sha256)
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    revision = schemas.DefaultTextRevision.model_validate(db_revision)
+    return ORJSONResponse(revision.model_dump(mode="json"), headers=headers)
+
+
+@router.get("/{key}/revisions", response_model=List[schemas.DefaultTextRevision])
+async def list_default_text_revisions(
+    key: str,
+    db: Session = Depends(get_db),
+    current_user = Depends(auth.get_current_user)
+):
+    db_default_text = crud.get_default_text(db, key=key)
+    if not db_default_text:
+        raise HTTPException(status_code=404, detail="Default text not found")
+    return crud.get_default_text_revisions(db, db_default_text.id)
+
+
 @router.get("/{key}", response_model=schemas.DefaultText)
 async def get_default_text(
     key: str,
+    request: Request,
     db: Session = Depends(get_db)
 ):
-    db_default_text = crud.get_default_text(db, key=key)
-    if not db_default_text:
+    cached = default_text_cache.get(db, key)
+    if not cached:
         raise HTTPException(status_code=404, detail="Default text not found")
-    return db_default_text
+
+    headers = {"ETag": cached.etag, "Cache-Control": PUBLIC_REVALIDATE}
+    if etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return ORJSONResponse(cached.as_dict(), headers=headers)
 
 
 @router.post("/", response_model=schemas.DefaultText)
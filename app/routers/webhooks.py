@@ -0,0 +1,68 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from .. import auth, crud, schemas
+from ..database import get_db
+
+router = APIRouter(prefix="/webhooks", tags=["webhooks"])
+
+
+@router.get("/", response_model=List[schemas.WebhookSubscription])
+async def list_webhook_subscriptions(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user = Depends(auth.get_current_user)
+):
+    return crud.get_webhook_subscriptions(db, skip=skip, limit=limit)
+
+
+@router.post("/", response_model=schemas.WebhookSubscriptionCreated)
+async def create_webhook_subscription(
+    subscription: schemas.WebhookSubscriptionCreate,
+    db: Session = Depends(get_db),
+    current_user = Depends(auth.get_current_user)
+):
+    """
+    Subscribe an endpoint to contract events. The signing secret is only
+    returned in this response.
+    """
+    return crud.create_webhook_subscription(db=db, subscription=subscription)
+
+
+@router.get("/{subscription_id}", response_model=schemas.WebhookSubscription)
+async def get_webhook_subscription(
+    subscription_id: int,
+    db: Session = Depends(get_db),
+    current_user = Depends(auth.get_current_user)
+):
+    db_subscription = crud.get_webhook_subscription(db, subscription_id)
+    if not db_subscription:
+        raise HTTPException(status_code=404, detail="Webhook subscription not found")
+    return db_subscription
+
+
+@router.put("/{subscription_id}", response_model=schemas.WebhookSubscription)
+async def update_webhook_subscription(
+    subscription_id: int,
+    subscription_update: schemas.WebhookSubscriptionUpdate,
+    db: Session = Depends(get_db),
+    current_user = Depends(auth.get_current_user)
+):
+    db_subscription = crud.update_webhook_subscription(db, subscription_id, subscription_update)
+    if not db_subscription:
+        raise HTTPException(status_code=404, detail="Webhook subscription not found")
+    return db_subscription
+
+
+@router.delete("/{subscription_id}")
+async def delete_webhook_subscription(
+    subscription_id: int,
+    db: Session = Depends(get_db),
+    current_user = Depends(auth.get_current_user)
+):
+    db_subscription = crud.delete_webhook_subscription(db, subscription_id)
+    if not db_subscription:
+        raise HTTPException(status_code=404, detail="Webhook subscription not found")
+    return {"message": "Webhook subscription deleted successfully"}
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, EmailStr, ConfigDict
+from pydantic import AliasChoices, BaseModel, EmailStr, ConfigDict, Field, field_validator
 from typing import Optional, List
+from datetime import datetime
 
 class ClientData(BaseModel):
     name: str
@@ -18,21 +19,80 @@ class ContractUpdate(BaseModel):
     puesto_empresa: Optional[str] = None
     politica_confirmacion: Optional[str] = None
 
-class Contract(BaseModel):
+class ContractSummary(BaseModel):
+    """A contract as listed in GET /contracts/, without the policy text"""
     id: int
     client_name: str
     client_email: EmailStr
     design_image_path: str
+    design_thumbnail_path: Optional[str] = None
+    design_preview_path: Optional[str] = None
     titulo_diseno: Optional[str] = None
     puesto_empresa: Optional[str] = None
-    politica_confirmacion: Optional[str] = None
+    politica_revision_id: Optional[int] = None
     unsigned_pdf_path: Optional[str] = None
     signed_pdf_path: Optional[str] = None
+    signature_image_path: Optional[str] = None
     signer_ip: Optional[str] = None
     signer_user_agent: Optional[str] = None
 
     model_config = ConfigDict(from_attributes=True)
 
+class Contract(ContractSummary):
+    # Resolved text, also when the contract references a revision (DBContract.politica_texto)
+    politica_confirmacion: Optional[str] = Field(
+        None, validation_alias=AliasChoices("politica_texto", "politica_confirmacion")
+    )
+
+class LayoutCheckRequest(BaseModel):
+    image_width: int = Field(..., gt=0)
+    image_height: int = Field(..., gt=0)
+    politica_confirmacion: Optional[str] = None
+    politica_revision_id: Optional[int] = None
+
+class LayoutCheckResult(BaseModel):
+    image_display_height: float
+    available_space: float
+    font_name: str
+    font_size: int
+    line_spacing: float
+    total_lines: int
+    max_lines: int
+    lines_fitted: int
+    truncated_lines: int
+    fits: bool
+
+class BulkDeleteRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=500)
+
+class BulkDeleteResult(BaseModel):
+    deleted: List[int]
+    not_found: List[int]
+
+class MemoryProfilingToggle(BaseModel):
+    enabled: bool
+    frames: int = Field(10, ge=1, le=100)  # Stack frames kept per allocation
+
+class ModuleAllocations(BaseModel):
+    module: str
+    size: int
+    count: int
+
+class AllocationSite(BaseModel):
+    location: str
+    size: int
+    count: int
+
+class MemoryProfilingReport(BaseModel):
+    tracing: bool
+    frames: int
+    traced_bytes: Optional[int] = None
+    traced_peak_bytes: Optional[int] = None
+    rss_bytes: Optional[int] = None
+    peak_rss_bytes: Optional[int] = None
+    retained_by_module: List[ModuleAllocations]
+    top_allocations: List[AllocationSite]
+
 class UserCreate(BaseModel):
     username: str
     email: Optional[str] = None
@@ -48,7 +108,7 @@ class PaginationInfo(BaseModel):
     has_prev: bool
 
 class PaginatedContracts(BaseModel):
-    items: List[Contract]
+    items: List[ContractSummary]
     pagination: PaginationInfo
 
 
@@ -67,3 +127,103 @@ class DefaultText(BaseModel):
     content: str
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class DefaultTextRevision(BaseModel):
+    id: int
+    default_text_id: Optional[int] = None
+    revision: int
+    content: str
+    content_sha256: str
+    created_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class DefaultTextBatch(BaseModel):
+    items: List[DefaultText]
+    missing: List[str]
+
+
+WEBHOOK_EVENT_TYPES = [
+    "contract.created",
+    "contract.invitation_sent",
+    "contract.signed",
+    "contract.deleted",
+]
+
+
+def _split_webhook_events(value):
+    if isinstance(value, str):
+        return [event.strip() for event in value.split(',') if event.strip()]
+    return value
+
+
+def _check_webhook_url(url):
+    if url is not None and not url.startswith(('http://', 'https://')):
+        raise ValueError("Webhook URL must start with http:// or https://")
+    return url
+
+
+def _check_webhook_events(value):
+    events = _split_webhook_events(value)
+    if events is None:
+        return events
+    unknown = [event for event in events if event != "*" and event not in WEBHOOK_EVENT_TYPES]
+    if unknown:
+        raise ValueError(f"Unknown webhook events: {', '.join(unknown)}")
+    return events
+
+
+class WebhookSubscriptionCreate(BaseModel):
+    url: str
+    events: List[str] = ["*"]
+    description: Optional[str] = None
+    secret: Optional[str] = None  # Generated when not provided
+
+    @field_validator('url')
+    @classmethod
+    def validate_url(cls, v):
+        return _check_webhook_url(v)
+
+    @field_validator('events', mode='before')
+    @classmethod
+    def validate_events(cls, v):
+        return _check_webhook_events(v)
+
+
+class WebhookSubscriptionUpdate(BaseModel):
+    url: Optional[str] = None
+    events: Optional[List[str]] = None
+    description: Optional[str] = None
+    active: Optional[bool] = None
+
+    @field_validator('url')
+    @classmethod
+    def validate_url(cls, v):
+        return _check_webhook_url(v)
+
+    @field_validator('events', mode='before')
+    @classmethod
+    def validate_events(cls, v):
+        return _check_webhook_events(v)
+
+
+class WebhookSubscription(BaseModel):
+    id: int
+    url: str
+    events: List[str]
+    description: Optional[str] = None
+    active: bool
+    created_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @field_validator('events', mode='before')
+    @classmethod
+    def split_events(cls, v):
+        return _split_webhook_events(v)
+
+
+class WebhookSubscriptionCreated(WebhookSubscription):
+    secret: str
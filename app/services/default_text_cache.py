@@ -0,0 +1,210 @@
+"""
+Process-local cache for default texts with cross-worker invalidation
+"""
+
+import hashlib
+import logging
+import select
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..cache import TTLCache
+from ..config import settings
+from ..database import engine
+
+logger = logging.getLogger(__name__)
+
+# Postgres channel used to tell every worker a default text changed (payload: key)
+INVALIDATION_CHANNEL = "default_texts_changed"
+LISTENER_RECONNECT_SECONDS = 5
+
+_MISSING = object()
+
+
+class CachedDefaultText(NamedTuple):
+    id: int
+    key: str
+    content: str
+    etag: str
+
+    def as_dict(self) -> dict:
+        return {'id': self.id, 'key': self.key, 'content': self.content}
+
+
+def default_text_etag(default_text_id: int, key: str, content: str) -> str:
+    """Strong ETag for a default text, derived from its contents"""
+    digest = hashlib.sha256(f"{default_text_id}\0{key}\0{content}".encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def combined_etag(entries: Dict[str, Optional[CachedDefaultText]]) -> str:
+    """Strong ETag for a batch of default texts, changing if any of them changes"""
+    parts = [f"{key}={entry.etag if entry else '-'}" for key, entry in sorted(entries.items())]
+    digest = hashlib.sha256("\n".join(parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def cached_entry(db_default_text) -> CachedDefaultText:
+    """Build the cache entry for a DBDefaultText row"""
+    return CachedDefaultText(
+        id=db_default_text.id,
+        key=db_default_text.key,
+        content=db_default_text.content,
+        etag=default_text_etag(db_default_text.id, db_default_text.key, db_default_text.content)
+    )
+
+
+class DefaultTextCache:
+    """
+    TTL/LRU cache of default texts shared by the requests of one worker
+
+    Missing keys are cached too, so unknown keys don't hit the database on
+    every request, but in a separate smaller cache: the key is public
+    input, and a stream of random keys must not evict the real texts.
+    Writes go through crud, which invalidates the local entry
+    and (on Postgres) sends a NOTIFY on INVALIDATION_CHANNEL; a listener
+    thread in every worker drops the entry when it receives it. The TTL
+    bounds staleness if a notification is ever lost.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, max_missing_entries: int = 64):
+        self._cache = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self._missing = TTLCache(max_entries=max_missing_entries, ttl_seconds=ttl_seconds)
+        self._listener: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def get(self, db: Session, key: str) -> Optional[CachedDefaultText]:
+        """
+        Return the default text for key, loading it from the database on a miss
+
+        Returns:
+            CachedDefaultText or None if no default text has that key
+        """
+        entry = self._lookup(key)
+        if entry is not _MISSING:
+            return entry
+
+        db_default_text = db.query(models.DBDefaultText).filter(models.DBDefaultText.key == key).first()
+        entry = cached_entry(db_default_text) if db_default_text else None
+        self._store(key, entry)
+        return entry
+
+    def get_many(self, db: Session, keys: List[str]) -> Dict[str, Optional[CachedDefaultText]]:
+        """
+        Return the default texts for several keys with at most one query
+
+        Keys not in the cache are loaded together with a single IN query.
+
+        Returns:
+            dict: key -> CachedDefaultText, or None if no default text has that key
+        """
+        result = {}
+        misses = []
+        for key in keys:
+            entry = self._lookup(key)
+            if entry is _MISSING:
+                misses.append(key)
+            else:
+                result[key] = entry
+
+        if misses:
+            rows = db.query(models.DBDefaultText).filter(models.DBDefaultText.key.in_(misses)).all()
+            loaded = {row.key: cached_entry(row) for row in rows}
+            for key in misses:
+                entry = loaded.get(key)
+                self._store(key, entry)
+                result[key] = entry
+        return result
+
+    def _lookup(self, key: str):
+        """Cached entry for key (None if known to be missing), _MISSING if not cached"""
+        entry = self._cache.get(key, _MISSING)
+        if entry is _MISSING and self._missing.get(key, _MISSING) is None:
+            return None
+        return entry
+
+    def _store(self, key: str, entry: Optional[CachedDefaultText]) -> None:
+        if entry is None:
+            self._missing.set(key, None)
+        else:
+            self._cache.set(key, entry)
+            self._missing.pop(key)
+
+    def invalidate(self, key: str) -> None:
+        """Drop the cached entry for key in this worker"""
+        self._cache.pop(key)
+        self._missing.pop(key)
+
+    def clear(self) -> None:
+        """Drop every cached entry in this worker"""
+        self._cache.clear()
+        self._missing.clear()
+
+    def start_listener(self) -> bool:
+        """
+        Start the thread that applies invalidations from other workers
+
+        Only Postgres supports LISTEN/NOTIFY; with other databases each
+        worker relies on its own invalidations and the TTL.
+
+        Returns:
+            bool: True if the listener was started
+        """
+        if engine.dialect.name != "postgresql":
+            logger.info("Default text cache: no LISTEN/NOTIFY on this database, relying on TTL")
+            return False
+        if self._listener is not None and self._listener.is_alive():
+            return True
+
+        self._stop.clear()
+        self._listener = threading.Thread(target=self._listen, name="default-text-cache-listener", daemon=True)
+        self._listener.start()
+        return True
+
+    def stop_listener(self) -> None:
+        """Stop the listener thread"""
+        self._stop.set()
+        if self._listener is not None:
+            self._listener.join(timeout=5)
+            self._listener = None
+
+    def _listen(self) -> None:
+        while not self._stop.is_set():
+            connection = None
+            try:
+                connection = engine.raw_connection()
+                dbapi_connection = connection.driver_connection
+                dbapi_connection.autocommit = True
+                with dbapi_connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {INVALIDATION_CHANNEL}")
+                # Notifications sent while we weren't listening are lost
+                self.clear()
+                logger.info(f"Listening for default text invalidations on {INVALIDATION_CHANNEL}")
+
+                while not self._stop.is_set():
+                    if select.select([dbapi_connection], [], [], 1.0) == ([], [], []):
+                        continue
+                    dbapi_connection.poll()
+                    while dbapi_connection.notifies:
+                        notification = dbapi_connection.notifies.pop(0)
+                        self.invalidate(notification.payload)
+            except Exception as e:
+                logger.error(f"Default text cache listener failed, reconnecting: {str(e)}")
+                self._stop.wait(LISTENER_RECONNECT_SECONDS)
+            finally:
+                if connection is not None:
+                    try:
+                        connection.invalidate()
+                    except Exception:
+                        pass
+
+
+# Global default text cache instance
+default_text_cache = DefaultTextCache(
+    max_entries=settings.DEFAULT_TEXT_CACHE_SIZE,
+    ttl_seconds=settings.DEFAULT_TEXT_CACHE_TTL_SECONDS,
+    max_missing_entries=settings.DEFAULT_TEXT_CACHE_MISSING_SIZE
+)
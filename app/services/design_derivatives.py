@@ -0,0 +1,167 @@
+"""
+Thumbnail and preview renditions of design images for listings
+"""
+
+import asyncio
+import io
+import logging
+from typing import Dict, Optional, Tuple
+
+from PIL import Image, features
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .. import crud
+from ..config import settings
+from ..database import SessionLocal
+from .file_service import DERIVATIVES_DIR, StoredFile, release_file, storage, store_bytes
+from .pdf_service import load_print_image
+from .render_pool import RenderPool, RenderPoolBusy
+
+logger = logging.getLogger(__name__)
+
+# Separate from render_pool: interactive previews and PDFs never wait behind
+# (or get a 503 because of) a burst of background derivatives
+derivative_pool = RenderPool(
+    max_workers=settings.DESIGN_DERIVATIVE_WORKERS,
+    max_pending=settings.DESIGN_DERIVATIVE_MAX_PENDING
+)
+
+
+def derivative_format() -> Tuple[str, str, str]:
+    """Pillow format, extension and content type of the derivatives"""
+    if settings.DESIGN_DERIVATIVE_FORMAT == "webp" and features.check("webp"):
+        return "WEBP", "webp", "image/webp"
+    return "JPEG", "jpg", "image/jpeg"
+
+
+def derivative_sizes() -> Dict[str, int]:
+    """Longest side of each derivative, by name"""
+    return {'preview': settings.DESIGN_PREVIEW_SIZE, 'thumbnail': settings.DESIGN_THUMBNAIL_SIZE}
+
+
+def render_design_derivatives(image_file) -> Dict[str, bytes]:
+    """
+    Encode every derivative of a design image, decoding it only once
+
+    The image is decoded straight at the largest derivative size (see
+    load_print_image) and each smaller one is reduced from the previous.
+
+    Args:
+        image_file: Path or file object
+
+    Returns:
+        dict: Encoded bytes by derivative name
+
+    Raises:
+        ImageTooLarge: If the image has more than IMAGE_MAX_PIXELS pixels
+    """
+    image_format, _, _ = derivative_format()
+    sizes = sorted(derivative_sizes().items(), key=lambda item: item[1], reverse=True)
+    with Image.open(image_file) as source:
+        img = load_print_image(source, (sizes[0][1], sizes[0][1]))
+
+    rendered = {}
+    for name, size in sizes:
+        img.thumbnail((size, size), Image.LANCZOS)
+        buffer = io.BytesIO()
+        img.save(buffer, image_format, quality=settings.DESIGN_DERIVATIVE_QUALITY)
+        rendered[name] = buffer.getvalue()
+    return rendered
+
+
+async def store_design_derivatives(db: Session, design_image_path: str) -> Dict[str, StoredFile]:
+    """
+    Render the derivatives of a stored design image in derivative_pool and store them
+
+    If storing one of them fails, the references to those already stored
+    are released before the error propagates.
+
+    Raises:
+        RenderPoolBusy: If derivative_pool is full
+    """
+    # Con almacenamiento remoto puede descargar el original a la caché local
+    local_path = await run_in_threadpool(storage.local_path, design_image_path)
+    rendered = await derivative_pool.run(render_design_derivatives, local_path)
+    _, extension, content_type = derivative_format()
+    stored = {}
+    try:
+        for name, data in rendered.items():
+            stored[name] = await store_bytes(db, data, extension, content_type, DERIVATIVES_DIR)
+    except Exception:
+        db.rollback()
+        for stored_file in stored.values():
+            release_file(db, stored_file.path)
+        raise
+    return stored
+
+
+async def attach_design_derivatives(
+    contract_id: int,
+    max_retries: Optional[int] = None,
+    backoff_seconds: Optional[float] = None
+) -> bool:
+    """
+    Generate a contract's design thumbnail and preview, replacing any previous ones
+
+    Meant to run after the response (BackgroundTasks), with its own session.
+    While derivative_pool is full the job waits with exponential backoff
+    and tries again. A failure only leaves the contract without
+    derivatives; listings then fall back to design_image_path and
+    generate_design_derivatives.py can fill them in later.
+
+    Args:
+        contract_id: Contract to generate the derivatives for
+        max_retries: Retries while the pool is full, defaults to settings.DESIGN_DERIVATIVE_MAX_RETRIES
+        backoff_seconds: First retry delay, doubled after each attempt
+
+    Returns:
+        bool: True if the contract now points at new derivatives
+    """
+    if max_retries is None:
+        max_retries = settings.DESIGN_DERIVATIVE_MAX_RETRIES
+    if backoff_seconds is None:
+        backoff_seconds = settings.DESIGN_DERIVATIVE_RETRY_BACKOFF_SECONDS
+
+    db = SessionLocal()
+    try:
+        db_contract = crud.get_contract(db, contract_id)
+        if not db_contract or not db_contract.design_image_path:
+            return False
+        design_image_path = db_contract.design_image_path
+        # Devuelve la conexión al pool mientras se espera turno
+        db.commit()
+
+        for attempt in range(max_retries + 1):
+            if attempt:
+                await asyncio.sleep(backoff_seconds * 2 ** (attempt - 1))
+            try:
+                stored = await store_design_derivatives(db, design_image_path)
+                break
+            except RenderPoolBusy:
+                continue
+            except Exception as e:
+                logger.error(f"Could not generate design derivatives for contract {contract_id}: {str(e)}")
+                return False
+        else:
+            logger.warning(f"Derivative pool still busy after {max_retries + 1} attempts, "
+                           f"no design derivatives for contract {contract_id}")
+            return False
+
+        # El contrato puede haberse borrado mientras se generaban: comprobarlo
+        # con la fila bloqueada, en la misma transacción que la escritura
+        db_contract = crud.get_contract(db, contract_id, lock=True)
+        if not db_contract:
+            for stored_file in stored.values():
+                release_file(db, stored_file.path)
+            return False
+
+        previous_files = [db_contract.design_thumbnail_path, db_contract.design_preview_path]
+        db_contract.design_thumbnail_path = stored['thumbnail'].path
+        db_contract.design_preview_path = stored['preview'].path
+        db.commit()
+        for file_path in previous_files:
+            release_file(db, file_path)
+        return True
+    finally:
+        db.close()
@@ -0,0 +1,146 @@
+import base64
+import hashlib
+import hmac
+import os
+import posixpath
+import time
+from typing import Optional
+from urllib.parse import quote, urlencode
+
+from fastapi import HTTPException, Request
+from fastapi.responses import RedirectResponse, Response
+
+from ..config import FILE_SERVING_MODES, settings
+from ..http_cache import conditional_file_response, etag_matches, make_etag, PRIVATE_REVALIDATE
+from .file_service import storage
+
+
+def storage_relative_path(file_path: str) -> str:
+    """
+    Path of a stored file relative to STORAGE_ROOT, as the proxy sees it
+    
+    Raises:
+        ValueError: If the file is outside STORAGE_ROOT
+    """
+    root = os.path.abspath(settings.STORAGE_ROOT)
+    full_path = os.path.abspath(file_path)
+    if os.path.commonpath([root, full_path]) != root:
+        raise ValueError(f"{file_path} is outside the storage root")
+    return os.path.relpath(full_path, root).replace(os.sep, "/")
+
+
+def _signed_url_secret() -> bytes:
+    return (settings.SIGNED_URL_SECRET or settings.SECRET_KEY).encode()
+
+
+def sign_storage_path(uri_path: str, issued_at: int, lifetime: int) -> str:
+    """
+    Token for a signed storage URL
+    
+    base64url(HMAC-SHA256(secret, "<uri>|<issued_at>|<lifetime>")) without
+    padding, the format checked by nginx's secure_link_hmac module.
+    """
+    message = f"{uri_path}|{issued_at}|{lifetime}".encode()
+    digest = hmac.new(_signed_url_secret(), message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def build_signed_url(file_path: str, lifetime: Optional[int] = None, now: Optional[int] = None) -> str:
+    """
+    Build a short-lived signed URL for a stored file
+    
+    Args:
+        file_path: Path of the file inside STORAGE_ROOT
+        lifetime: Seconds the URL stays valid (SIGNED_URL_TTL_SECONDS by default)
+        now: Issue timestamp, for tests
+    
+    Returns:
+        str: URL with st (token), ts (issued at) and e (lifetime) query parameters
+    """
+    if not settings.SIGNED_URL_BASE:
+        raise RuntimeError("SIGNED_URL_BASE must be set when FILE_SERVING_MODE is signed-url")
+    lifetime = lifetime or settings.SIGNED_URL_TTL_SECONDS
+    issued_at = int(now if now is not None else time.time())
+    
+    base = settings.SIGNED_URL_BASE.rstrip("/") + "/"
+    url = base + quote(storage_relative_path(file_path))
+    uri_path = "/" + url.split("://", 1)[-1].split("/", 1)[-1]
+    query = urlencode({'st': sign_storage_path(uri_path, issued_at, lifetime), 'ts': issued_at, 'e': lifetime})
+    return f"{url}?{query}"
+
+
+def verify_signed_url(uri_path: str, token: str, issued_at: int, lifetime: int, now: Optional[int] = None) -> bool:
+    """Check a signed storage URL the same way the proxy does"""
+    now = int(now if now is not None else time.time())
+    if now > issued_at + lifetime:
+        return False
+    return hmac.compare_digest(sign_storage_path(uri_path, issued_at, lifetime), token)
+
+
+def serve_file(
+    request: Request,
+    file_path: str,
+    content_hash: Optional[str] = None,
+    media_type: str = "application/pdf",
+    cache_control: str = PRIVATE_REVALIDATE
+) -> Response:
+    """
+    Return a stored file according to FILE_SERVING_MODE
+    
+    The caller has already authorized the request. In every mode a matching
+    If-None-Match is answered with 304 here; otherwise the body is streamed
+    by Python ("direct"), delegated to the front proxy through
+    X-Accel-Redirect / X-Sendfile, or the client is redirected to a signed
+    URL the proxy can validate without calling the app. With a remote
+    storage backend "signed-url" redirects to the backend's presigned URL
+    and the other modes serve the local read-through copy.
+    """
+    mode = settings.FILE_SERVING_MODE
+    if mode == "direct" and storage.is_local:
+        return conditional_file_response(request, file_path, content_hash, media_type, cache_control)
+    
+    headers = {"Cache-Control": cache_control}
+    if content_hash:
+        headers["ETag"] = make_etag(content_hash)
+        if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+    
+    if not storage.exists(file_path):
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    if mode == "signed-url":
+        # The redirect itself must not outlive the signature
+        url = storage.presigned_url(file_path) or build_signed_url(file_path)
+        return RedirectResponse(url, status_code=307, headers={"Cache-Control": "private, no-store"})
+    
+    file_path = storage.local_path(file_path)
+    if mode == "direct":
+        return conditional_file_response(request, file_path, content_hash, media_type, cache_control)
+    if mode == "x-accel-redirect":
+        prefix = settings.X_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/"
+        headers["X-Accel-Redirect"] = prefix + quote(storage_relative_path(file_path))
+        return Response(headers=headers, media_type=media_type)
+    if mode == "x-sendfile":
+        headers["X-Sendfile"] = os.path.abspath(file_path)
+        return Response(headers=headers, media_type=media_type)
+    
+    raise RuntimeError(f"Unknown FILE_SERVING_MODE {mode!r}, expected one of {', '.join(FILE_SERVING_MODES)}")
+
+
+def redirect_to_remote_storage(path: str) -> Response:
+    """
+    Serve /storage/{path} from a remote storage backend
+
+    With STORAGE_BACKEND=s3 there is no local directory to mount at
+    /storage, so the URLs built from paths saved on contracts redirect to
+    a short-lived presigned URL of the object instead.
+    """
+    root = settings.STORAGE_ROOT.strip("/")
+    key = posixpath.normpath(f"{root}/{path}")
+    if not key.startswith(f"{root}/"):
+        raise HTTPException(status_code=404, detail="File not found")
+    url = storage.presigned_url(key)
+    if not url:
+        raise HTTPException(status_code=404, detail="File not found")
+    # The redirect itself must not outlive the signature
+    return RedirectResponse(url, status_code=307, headers={"Cache-Control": "private, no-store"})
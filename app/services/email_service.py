@@ -1,39 +1,141 @@
 import asyncio
+import base64
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
-from email.mime.application import MIMEApplication
 from email import encoders
 import aiosmtplib
-from jinja2 import Environment, BaseLoader
+from jinja2 import Environment, BaseLoader, FileSystemBytecodeCache, TemplateNotFound, select_autoescape
+from markupsafe import escape
+from starlette.concurrency import run_in_threadpool
 import os
+import re
+from datetime import datetime
 from typing import Optional, List
 import logging
 
 from ..config import settings
+from ..cache import TTLCache
+from .file_service import storage, stored_file_sha256
 
 logger = logging.getLogger(__name__)
 
+# base64.encodebytes() writes 76-char lines, each encoding 57 input bytes
+BASE64_LINE_BYTES = 57
+# Read attachments in whole lines so every chunk encodes without padding
+ATTACHMENT_CHUNK_SIZE = BASE64_LINE_BYTES * 1024
+
+# Encoded attachment parts, keyed by (PDF sha256, attachment filename)
+attachment_cache = TTLCache(
+    max_entries=settings.EMAIL_ATTACHMENT_CACHE_SIZE,
+    ttl_seconds=settings.EMAIL_ATTACHMENT_CACHE_TTL_SECONDS
+)
+
+
+def base64_encoded_size(size: int) -> int:
+    """Length of base64.encodebytes() output for size bytes, newlines included"""
+    return 4 * ((size + 2) // 3) + (size + BASE64_LINE_BYTES - 1) // BASE64_LINE_BYTES
+
+
+def encode_file_base64(file_path: str) -> str:
+    """
+    Base64-encode a stored file without reading it fully into memory
+    
+    Each chunk is encoded straight into one buffer allocated at the final
+    encoded size, so no per-chunk strings are kept around until the end.
+    """
+    buffer = bytearray(base64_encoded_size(storage.size(file_path)))
+    offset = 0
+    pending = b""
+    with memoryview(buffer) as view:
+        for chunk in storage.iter_chunks(file_path, ATTACHMENT_CHUNK_SIZE):
+            pending += chunk
+            # Codificar solo líneas completas: el relleno solo puede ir al final
+            whole = len(pending) - len(pending) % BASE64_LINE_BYTES
+            encoded = base64.encodebytes(pending[:whole])
+            view[offset:offset + len(encoded)] = encoded
+            offset += len(encoded)
+            pending = pending[whole:]
+        encoded = base64.encodebytes(pending)
+        view[offset:offset + len(encoded)] = encoded
+        offset += len(encoded)
+    if offset != len(buffer):
+        raise ValueError(f"{file_path} changed while it was being encoded")
+    return buffer.decode("ascii")
+
+# Branding shared by every email; inlined into the templates when they are loaded
+COMPANY_NAME = "De La Rueda"
+
+
 class TemplateLoader(BaseLoader):
-    """Custom template loader for Jinja2"""
+    """
+    Custom template loader for Jinja2
     
-    def __init__(self, templates_dir: str):
+    Variables listed in static_context (e.g. company_name) are replaced by
+    their escaped value when the source is loaded, so they are compiled into
+    the template as constant text instead of being looked up on every render.
+    """
+    
+    def __init__(self, templates_dir: str, static_context: Optional[dict] = None):
         self.templates_dir = templates_dir
+        self.static_context = static_context or {}
+        self._static_pattern = re.compile(
+            r"\{\{\s*(" + "|".join(map(re.escape, self.static_context)) + r")\s*\}\}"
+        ) if self.static_context else None
     
     def get_source(self, environment, template):
         path = os.path.join(self.templates_dir, template)
         if not os.path.exists(path):
-            raise FileNotFoundError(f"Template {template} not found")
+            raise TemplateNotFound(template)
         
+        mtime = os.path.getmtime(path)
         with open(path, 'r', encoding='utf-8') as f:
             source = f.read()
         
-        return source, path, lambda: True
+        if self._static_pattern is not None:
+            source = self._static_pattern.sub(
+                lambda match: str(escape(self.static_context[match.group(1)])),
+                source
+            )
+        
+        def uptodate():
+            try:
+                return os.path.getmtime(path) == mtime
+            except OSError:
+                return False
+        
+        return source, path, uptodate
+    
+    def list_templates(self):
+        return sorted(
+            name for name in os.listdir(self.templates_dir)
+            if name.endswith('.html')
+        )
 
 # Initialize Jinja2 environment
 templates_dir = os.path.join(os.path.dirname(__file__), '..', 'templates')
-jinja_env = Environment(loader=TemplateLoader(templates_dir))
+jinja_env = Environment(
+    loader=TemplateLoader(templates_dir, static_context={'company_name': COMPANY_NAME}),
+    autoescape=select_autoescape(['html']),
+    bytecode_cache=FileSystemBytecodeCache(settings.EMAIL_TEMPLATE_CACHE_DIR or None),
+    # En producción las plantillas no cambian: evitar el stat de cada render
+    auto_reload=settings.ENVIRONMENT != "production"
+)
+
+
+def warm_up_templates() -> int:
+    """
+    Compile every email template so the first emails don't pay for it
+    
+    Returns:
+        int: Number of templates compiled
+    """
+    templates = jinja_env.list_templates()
+    for template_name in templates:
+        jinja_env.get_template(template_name)
+    logger.info(f"Compiled {len(templates)} email templates")
+    return len(templates)
 
 class EmailService:
     def __init__(self):
@@ -46,6 +148,16 @@ class EmailService:
         self.from_email = settings.SMTP_FROM_EMAIL
         self.from_name = settings.SMTP_FROM_NAME
 
+        # Admin notification digest (only used when ADMIN_NOTIFICATION_MODE == "digest")
+        self.admin_notification_mode = settings.ADMIN_NOTIFICATION_MODE
+        self.digest_window_seconds = settings.ADMIN_DIGEST_WINDOW_SECONDS
+        self.digest_max_events = settings.ADMIN_DIGEST_MAX_EVENTS
+        self.digest_retry_max_seconds = settings.ADMIN_DIGEST_RETRY_MAX_SECONDS
+        self._digest_events: List[dict] = []
+        self._digest_window_start: Optional[datetime] = None
+        self._digest_task: Optional[asyncio.Task] = None
+        self._digest_failures = 0
+
     async def send_email(
         self,
         to_email: str,
@@ -62,7 +174,8 @@ class EmailService:
             subject: Email subject
             html_content: HTML content of the email
             text_content: Plain text content (optional)
-            attachments: List of attachments [{'path': str, 'filename': str}]
+            attachments: List of attachments [{'path': str, 'filename': str}] or
+                [{'part': MIMEBase}] for parts built with build_pdf_attachment
         
         Returns:
             bool: True if email was sent successfully
@@ -99,22 +212,16 @@ class EmailService:
             if attachments:
                 logger.info(f"Processing {len(attachments)} attachments")
                 for i, attachment in enumerate(attachments):
+                    # Prebuilt parts are shared between recipients, no need to re-encode them
+                    if 'part' in attachment:
+                        message.attach(attachment['part'])
+                        logger.info(f"Attachment {i+1} (prebuilt) added to email successfully")
+                        continue
                     logger.info(f"Attachment {i+1}: {attachment['path']} -> {attachment['filename']}")
-                    if os.path.exists(attachment['path']):
-                        file_size = os.path.getsize(attachment['path'])
-                        logger.info(f"Attachment {i+1} exists, size: {file_size} bytes")
-                        with open(attachment['path'], "rb") as f:
-                            # Use MIMEApplication for better PDF handling
-                            part = MIMEApplication(
-                                f.read(),
-                                _subtype='pdf',
-                                name=attachment["filename"]
-                            )
-                            part.add_header(
-                                'Content-Disposition',
-                                f'attachment; filename="{attachment["filename"]}"'
-                            )
-                            message.attach(part)
+                    if await run_in_threadpool(storage.exists, attachment['path']):
+                        message.attach(await run_in_threadpool(
+                            self.build_pdf_attachment, attachment['path'], attachment['filename']
+                        ))
                         logger.info(f"Attachment {i+1} added to email successfully")
                     else:
                         logger.error(f"Attachment file not found: {attachment['path']}")
@@ -146,6 +253,44 @@ class EmailService:
             logger.error(f"Failed to send email to {to_email}: {str(e)}")
             return False
 
+    def build_pdf_attachment(
+        self,
+        file_path: str,
+        filename: str,
+        content_hash: Optional[str] = None
+    ) -> MIMEBase:
+        """
+        Build a base64-encoded PDF attachment part
+        
+        The file is encoded in chunks and the resulting part is cached by
+        content hash, so the same PDF sent to several recipients is read and
+        encoded only once.
+        
+        Args:
+            file_path: Storage key of the PDF file
+            filename: Filename shown to the recipient
+            content_hash: SHA-256 of the file, computed if not provided
+        
+        Returns:
+            MIMEBase: Attachment part ready to attach to a message
+        """
+        content_hash = content_hash or stored_file_sha256(file_path)
+        cache_key = (content_hash, filename)
+        part = attachment_cache.get(cache_key)
+        if part is not None:
+            logger.info(f"Reusing encoded attachment {filename} ({content_hash[:12]})")
+            return part
+        
+        file_size = storage.size(file_path)
+        logger.info(f"Encoding attachment {filename}, size: {file_size} bytes")
+        part = MIMEBase('application', 'pdf', name=filename)
+        part.add_header('Content-Transfer-Encoding', 'base64')
+        part.add_header('Content-Disposition', f'attachment; filename="{filename}"')
+        part.set_payload(encode_file_base64(file_path))
+        
+        attachment_cache.set(cache_key, part)
+        return part
+
     def render_template(self, template_name: str, **kwargs) -> str:
         """
         Render a Jinja2 template with the provided context
@@ -191,8 +336,7 @@ class EmailService:
                 client_name=client_name,
                 contract_id=contract_id,
                 titulo_diseno=titulo_diseno or f"Contrato #{contract_id}",
-                signing_url=signing_url,
-                company_name="De La Rueda"
+                signing_url=signing_url
             )
             
             subject = f"Contrato de Diseño para Firmar - {titulo_diseno or f'#{contract_id}'}"
@@ -226,7 +370,8 @@ class EmailService:
         client_name: str,
         contract_id: int,
         signed_pdf_path: Optional[str] = None,
-        titulo_diseno: Optional[str] = None
+        titulo_diseno: Optional[str] = None,
+        signed_pdf_hash: Optional[str] = None
     ) -> bool:
         """
         Send contract signed confirmation email with PDF attachment
@@ -237,6 +382,7 @@ class EmailService:
             contract_id: Contract ID
             signed_pdf_path: Path to signed PDF file
             titulo_diseno: Design title (optional)
+            signed_pdf_hash: SHA-256 of the signed PDF, if already known
         
         Returns:
             bool: True if email was sent successfully
@@ -246,39 +392,30 @@ class EmailService:
                 'contract_signed.html',
                 client_name=client_name,
                 contract_id=contract_id,
-                titulo_diseno=titulo_diseno or f"Contrato #{contract_id}",
-                company_name="De La Rueda"
+                titulo_diseno=titulo_diseno or f"Contrato #{contract_id}"
             )
             
             subject = f"Contrato Firmado - {titulo_diseno or f'#{contract_id}'}"
             
-            attachments = []
+            attachment_part = None
             if signed_pdf_path:
-                logger.info(f"Original signed_pdf_path: {signed_pdf_path}")
-                logger.info(f"Current working directory: {os.getcwd()}")
+                logger.info(f"Checking PDF file for attachment: {signed_pdf_path}")
                 
-                # Convert to absolute path if relative
-                if not os.path.isabs(signed_pdf_path):
-                    full_path = os.path.abspath(signed_pdf_path)
-                    logger.info(f"Converted relative to absolute: {signed_pdf_path} -> {full_path}")
+                if await run_in_threadpool(storage.exists, signed_pdf_path):
+                    # Se codifica una sola vez y se comparte con la notificación al administrador
+                    attachment_part = await run_in_threadpool(
+                        self.build_pdf_attachment,
+                        signed_pdf_path,
+                        f'contrato_{contract_id}_firmado.pdf',
+                        content_hash=signed_pdf_hash
+                    )
                 else:
-                    full_path = signed_pdf_path
-                    logger.info(f"Path already absolute: {full_path}")
-                    
-                logger.info(f"Checking PDF file for attachment: {full_path}")
-                
-                if os.path.exists(full_path):
-                    file_size = os.path.getsize(full_path)
-                    logger.info(f"PDF file found, size: {file_size} bytes")
-                    attachments.append({
-                        'path': full_path,
-                        'filename': f'contrato_{contract_id}_firmado.pdf'
-                    })
-                else:
-                    logger.error(f"PDF file not found for attachment: {full_path}")
+                    logger.error(f"PDF file not found for attachment: {signed_pdf_path}")
             else:
                 logger.warning(f"No signed_pdf_path provided for contract {contract_id}")
             
+            attachments = [{'part': attachment_part}] if attachment_part else []
+            
             # Enviar confirmación al cliente
             logger.info(f"Sending email to client with {len(attachments)} attachments")
             client_success = await self.send_email(
@@ -296,7 +433,8 @@ class EmailService:
                     client_name=client_name,
                     contract_id=contract_id,
                     titulo_diseno=titulo_diseno,
-                    signed_pdf_path=signed_pdf_path
+                    signed_pdf_path=signed_pdf_path,
+                    attachment_part=attachment_part
                 )
             
             return client_success
@@ -312,7 +450,8 @@ class EmailService:
         client_name: str,
         contract_id: int,
         titulo_diseno: Optional[str] = None,
-        signed_pdf_path: Optional[str] = None
+        signed_pdf_path: Optional[str] = None,
+        attachment_part: Optional[MIMEBase] = None
     ) -> bool:
         """
         Send notification to administrator about contract actions
@@ -324,6 +463,7 @@ class EmailService:
             contract_id: Contract ID
             titulo_diseno: Design title (optional)
             signed_pdf_path: Path to signed PDF (for contract_signed action)
+            attachment_part: Already encoded signed PDF part, reused instead of signed_pdf_path
         
         Returns:
             bool: True if notification was sent successfully
@@ -341,36 +481,39 @@ class EmailService:
                 logger.warning(f"Unknown admin notification action: {action}")
                 return False
             
+            # En modo digest se acumula el evento y se envía un resumen por ventana
+            if self.admin_notification_mode == "digest":
+                await self.queue_admin_digest_event(
+                    action=action,
+                    client_email=client_email,
+                    client_name=client_name,
+                    contract_id=contract_id,
+                    titulo_diseno=titulo_diseno
+                )
+                return True
+            
             html_content = self.render_template(
                 template_name,
                 client_name=client_name,
                 client_email=client_email,
                 contract_id=contract_id,
-                titulo_diseno=titulo_diseno or f"Contrato #{contract_id}",
-                company_name="De La Rueda"
+                titulo_diseno=titulo_diseno or f"Contrato #{contract_id}"
             )
             
             # Para contratos firmados, adjuntar el PDF
             attachments = []
-            if action == "contract_signed" and signed_pdf_path:
-                # Convert to absolute path if relative
-                if not os.path.isabs(signed_pdf_path):
-                    full_path = os.path.abspath(signed_pdf_path)
-                else:
-                    full_path = signed_pdf_path
-                    
-                logger.info(f"Admin notification: Original path: {signed_pdf_path}")
-                logger.info(f"Admin notification: checking PDF file {full_path}")
+            if action == "contract_signed" and attachment_part is not None:
+                attachments.append({'part': attachment_part})
+            elif action == "contract_signed" and signed_pdf_path:
+                logger.info(f"Admin notification: checking PDF file {signed_pdf_path}")
                 
-                if os.path.exists(full_path):
-                    file_size = os.path.getsize(full_path)
-                    logger.info(f"Admin notification: PDF found, size {file_size} bytes")
+                if await run_in_threadpool(storage.exists, signed_pdf_path):
                     attachments.append({
-                        'path': full_path,
+                        'path': signed_pdf_path,
                         'filename': f'contrato_{contract_id}_firmado.pdf'
                     })
                 else:
-                    logger.error(f"PDF file not found for admin notification: {full_path}")
+                    logger.error(f"PDF file not found for admin notification: {signed_pdf_path}")
             
             logger.info(f"Sending admin notification with {len(attachments)} attachments")
             return await self.send_email(
@@ -384,5 +527,143 @@ class EmailService:
             logger.error(f"Failed to send admin notification for {action}: {str(e)}")
             return False
 
+    async def queue_admin_digest_event(
+        self,
+        action: str,
+        client_email: str,
+        client_name: str,
+        contract_id: int,
+        titulo_diseno: Optional[str] = None
+    ) -> None:
+        """
+        Buffer an admin event for the next digest email
+        
+        The first buffered event starts a timer that flushes the digest once
+        ADMIN_DIGEST_WINDOW_SECONDS have elapsed. The digest is sent early if
+        ADMIN_DIGEST_MAX_EVENTS events accumulate before that, unless a failed
+        digest is waiting for its retry: then the oldest events are dropped
+        (and logged) instead of hitting the SMTP server on every new event.
+        """
+        if not self._digest_events:
+            self._digest_window_start = datetime.utcnow()
+        
+        self._digest_events.append({
+            'action': action,
+            'client_email': client_email,
+            'client_name': client_name,
+            'contract_id': contract_id,
+            'titulo_diseno': titulo_diseno or f"Contrato #{contract_id}",
+            'occurred_at': datetime.utcnow()
+        })
+        
+        if len(self._digest_events) >= self.digest_max_events:
+            if self._digest_failures:
+                # Hay un reintento pendiente: no adelantar el envío mientras el SMTP falla
+                self._trim_digest_events()
+            else:
+                await self.flush_admin_digest()
+        elif self._digest_task is None or self._digest_task.done():
+            self._digest_task = asyncio.get_running_loop().create_task(self._digest_timer())
+
+    async def _digest_timer(self, delay: Optional[float] = None) -> None:
+        """Wait for the digest window (or retry delay) and send the buffered events"""
+        await asyncio.sleep(self.digest_window_seconds if delay is None else delay)
+        self._digest_task = None
+        await self.flush_admin_digest()
+
+    def _digest_retry_delay(self) -> float:
+        """Window length doubled after each consecutive failed digest, capped"""
+        delay = self.digest_window_seconds * 2 ** (self._digest_failures - 1)
+        return min(delay, max(self.digest_retry_max_seconds, self.digest_window_seconds))
+
+    def _trim_digest_events(self) -> None:
+        """Drop the oldest buffered events beyond ADMIN_DIGEST_MAX_EVENTS"""
+        excess = len(self._digest_events) - self.digest_max_events
+        if excess > 0:
+            logger.error(f"Admin digest buffer full, dropping {excess} oldest events")
+            self._log_lost_digest_events(self._digest_events[:excess])
+            self._digest_events = self._digest_events[excess:]
+
+    def _log_lost_digest_events(self, events: List[dict]) -> None:
+        """Leave a record of admin events that will never be emailed"""
+        for event in events:
+            logger.error(
+                f"Admin digest event not delivered: {event['action']} contract "
+                f"#{event['contract_id']} ({event['client_email']}) at "
+                f"{event['occurred_at'].isoformat()}"
+            )
+
+    async def flush_admin_digest(self, final: bool = False) -> bool:
+        """
+        Send all buffered admin events as a single digest email
+        
+        After a failure the events stay buffered and the retry waits one more
+        window per consecutive failure (up to ADMIN_DIGEST_RETRY_MAX_SECONDS).
+        
+        Args:
+            final: No retry will follow (application shutdown); events that
+                could not be sent are logged one by one instead of buffered
+        
+        Returns:
+            bool: True if the digest was sent or there was nothing to send
+        """
+        if self._digest_task is not None and self._digest_task is not asyncio.current_task():
+            self._digest_task.cancel()
+        self._digest_task = None
+        
+        if not self._digest_events:
+            return True
+        
+        events = self._digest_events
+        window_start = self._digest_window_start
+        self._digest_events = []
+        self._digest_window_start = None
+        
+        invitations = [e for e in events if e['action'] == "invitation_sent"]
+        signed = [e for e in events if e['action'] == "contract_signed"]
+        
+        try:
+            html_content = self.render_template(
+                "admin_digest.html",
+                events=events,
+                invitation_count=len(invitations),
+                signed_count=len(signed),
+                window_start=window_start.strftime("%d/%m/%Y %H:%M"),
+                window_end=datetime.utcnow().strftime("%d/%m/%Y %H:%M")
+            )
+            subject = (
+                f"[Sistema] Resumen de actividad - {len(signed)} firmados, "
+                f"{len(invitations)} invitaciones"
+            )
+            
+            logger.info(f"Sending admin digest with {len(events)} events")
+            success = await self.send_email(
+                to_email=settings.ADMIN_EMAIL,
+                subject=subject,
+                html_content=html_content
+            )
+        except Exception as e:
+            logger.error(f"Failed to build admin digest: {str(e)}")
+            success = False
+        
+        if success:
+            self._digest_failures = 0
+        elif final:
+            lost = events + self._digest_events
+            self._digest_events = []
+            logger.error(f"Admin digest could not be sent at shutdown, {len(lost)} events lost")
+            self._log_lost_digest_events(lost)
+        else:
+            # Devolver los eventos al buffer y reintentar con espera creciente
+            self._digest_failures += 1
+            self._digest_events = events + self._digest_events
+            self._digest_window_start = window_start
+            self._trim_digest_events()
+            delay = self._digest_retry_delay()
+            logger.warning(f"Admin digest failed {self._digest_failures} times, retrying in {delay:.0f}s")
+            self._digest_task = asyncio.get_running_loop().create_task(self._digest_timer(delay))
+        
+        return success
+
 # Global email service instance
 email_service = EmailService()
\ No newline at end of file
@@ -1,41 +1,747 @@
+import asyncio
 import os
+import re
 import uuid
-import shutil
-from fastapi import UploadFile
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import BinaryIO, Iterable, Iterator, List, NamedTuple, Optional
+from fastapi import HTTPException, UploadFile
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
+from .. import crud
+from ..config import settings
+from ..database import SessionLocal
 
-# Storage configuration
-UPLOADS_DIR = "storage/uploads"
-CONTRACTS_DIR = "storage/contracts"
+try:
+    import boto3
+except ImportError:  # Optional: pip install boto3 (only for STORAGE_BACKEND=s3)
+    boto3 = None
+
+logger = logging.getLogger(__name__)
+
+# Storage configuration (all under STORAGE_ROOT, the directory mounted at /storage)
+UPLOADS_DIR = os.path.join(settings.STORAGE_ROOT, "uploads")
+CONTRACTS_DIR = os.path.join(settings.STORAGE_ROOT, "contracts")
+DERIVATIVES_DIR = os.path.join(settings.STORAGE_ROOT, "derivatives")
+HASH_CHUNK_SIZE = 1024 * 1024  # Read files in 1 MB chunks when hashing
+UPLOAD_CHUNK_SIZE = 256 * 1024  # Chunk size when streaming uploads to disk
+
+# Magic numbers of the formats we expect, checked against the first bytes of the upload
+FILE_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png", "png"),
+    (b"\xff\xd8\xff", "image/jpeg", "jpg"),
+    (b"GIF87a", "image/gif", "gif"),
+    (b"GIF89a", "image/gif", "gif"),
+    (b"BM", "image/bmp", "bmp"),
+    (b"II*\x00", "image/tiff", "tif"),
+    (b"MM\x00*", "image/tiff", "tif"),
+    (b"%PDF-", "application/pdf", "pdf"),
+]
+BLOB_NAME_RE = re.compile(r"^([0-9a-f]{64})\.\w+$")
+IMAGE_CONTENT_TYPES = {"image/png", "image/jpeg", "image/gif", "image/bmp", "image/tiff", "image/webp"}
+
+
+class StoredFile(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+    content_type: str
+    original_filename: Optional[str]
+
+
+def sniff_content_type(head: bytes):
+    """
+    Detect the file type from its first bytes
+    
+    Returns:
+        tuple: (content type, extension), application/octet-stream if unknown
+    """
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp", "webp"
+    for signature, content_type, extension in FILE_SIGNATURES:
+        if head.startswith(signature):
+            return content_type, extension
+    return "application/octet-stream", "bin"
 
 
 def ensure_directories():
     """Ensure storage directories exist"""
     os.makedirs(UPLOADS_DIR, exist_ok=True)
     os.makedirs(CONTRACTS_DIR, exist_ok=True)
+    os.makedirs(DERIVATIVES_DIR, exist_ok=True)
 
 
-def save_uploaded_file(upload_file: UploadFile, directory: str = UPLOADS_DIR) -> str:
+async def save_upload(
+    upload_file: UploadFile,
+    directory: str = UPLOADS_DIR,
+    max_bytes: Optional[int] = None,
+    allowed_types: Optional[Iterable[str]] = None
+) -> StoredFile:
     """
-    Save uploaded file and return the path
+    Stream an upload to disk, hashing and sniffing its type on the way
+    
+    Chunks are read from the request and written from a worker thread, so
+    the event loop is never blocked on disk I/O. The upload is aborted as
+    soon as it exceeds max_bytes. The file extension comes from the
+    sniffed content, never from the client filename.
     
     Args:
         upload_file: The uploaded file
         directory: Directory to save file in
+        max_bytes: Maximum size, defaults to settings.UPLOAD_MAX_BYTES
+        allowed_types: Content types to accept, any if None
         
     Returns:
-        str: Path to saved file
+        StoredFile: Path, size, SHA-256 and content type of the saved file
+    
+    Raises:
+        HTTPException: 413 if the file is too large, 415 if its type is not allowed
+    """
+    if max_bytes is None:
+        max_bytes = settings.UPLOAD_MAX_BYTES
+    
+    temp_path = os.path.join(directory, f".{uuid.uuid4()}.part")
+    digest = hashlib.sha256()
+    size = 0
+    head = b""
+    buffer = await run_in_threadpool(open, temp_path, "wb")
+    try:
+        while True:
+            chunk = await upload_file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(status_code=413, detail=f"File larger than {max_bytes} bytes")
+            if len(head) < 16:
+                head += chunk[:16 - len(head)]
+            digest.update(chunk)
+            await run_in_threadpool(buffer.write, chunk)
+        await run_in_threadpool(buffer.close)
+        
+        content_type, extension = sniff_content_type(head)
+        if allowed_types is not None and content_type not in allowed_types:
+            raise HTTPException(status_code=415, detail=f"Unsupported file type: {content_type}")
+        
+        file_path = os.path.join(directory, f"{uuid.uuid4()}.{extension}")
+        os.replace(temp_path, file_path)
+    except BaseException:
+        buffer.close()
+        delete_file_if_exists(temp_path)
+        raise
+    
+    return StoredFile(
+        path=file_path,
+        size=size,
+        sha256=digest.hexdigest(),
+        content_type=content_type,
+        original_filename=upload_file.filename
+    )
+
+
+def blob_path(directory: str, sha256: str, extension: str) -> str:
+    """
+    Resolve where a stored file lives
+    
+    Files are content-addressed (identical contents share one path) and
+    sharded in two levels of hash-prefix directories, e.g.
+    storage/uploads/ab/cd/abcd....png, so no directory grows past a few
+    thousand entries. Every stored path must come from here.
+    """
+    return os.path.join(directory, sha256[:2], sha256[2:4], f"{sha256}.{extension}")
+
+
+def blob_hash_from_path(file_path: str) -> Optional[str]:
+    """SHA-256 of a content-addressed path, None for legacy (uuid / id based) paths"""
+    match = BLOB_NAME_RE.match(os.path.basename(file_path or ""))
+    return match.group(1) if match else None
+
+
+class StoredObject(NamedTuple):
+    key: str
+    size: int
+    modified: float  # Unix timestamp
+
+
+class StorageBackend(ABC):
+    """
+    Where stored files live
+    
+    Keys are the paths saved on contracts (e.g.
+    storage/contracts/ab/cd/abcd....pdf), so switching backend needs no
+    database change. Reads and writes are streamed; nothing here loads a
+    whole file into memory.
+    """
+    
+    is_local = True
+    
+    @abstractmethod
+    def put_file(self, key: str, source_path: str, content_type: Optional[str] = None) -> None:
+        """Store a local file under key; the source file is consumed"""
+    
+    @abstractmethod
+    def open(self, key: str) -> BinaryIO:
+        """Open a stored file for streaming reads"""
+    
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """Whether a file is stored under key"""
+    
+    @abstractmethod
+    def size(self, key: str) -> int:
+        """Size of a stored file in bytes"""
+    
+    @abstractmethod
+    def delete(self, key: str) -> bool:
+        """Delete a stored file; True if it was deleted or didn't exist"""
+    
+    @abstractmethod
+    def local_path(self, key: str) -> str:
+        """
+        Path of a local copy of the file, for code that needs a real file
+        (FileResponse, reportlab, X-Sendfile)
+        
+        Raises:
+            FileNotFoundError: If the file is not stored
+        """
+    
+    def presigned_url(self, key: str, expires_in: Optional[int] = None) -> Optional[str]:
+        """Short-lived URL the client can download from directly, None if unsupported"""
+        return None
+    
+    @abstractmethod
+    def iter_files(self, directory: str) -> Iterator[StoredObject]:
+        """List the files stored under a directory, lazily"""
+    
+    def iter_chunks(self, key: str, chunk_size: int = HASH_CHUNK_SIZE) -> Iterator[bytes]:
+        """Read a stored file chunk by chunk"""
+        with self.open(key) as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                yield chunk
+
+
+class LocalStorage(StorageBackend):
+    """Files on the local filesystem (a single shared volume)"""
+    
+    def put_file(self, key: str, source_path: str, content_type: Optional[str] = None) -> None:
+        # Renombrar es atómico y no reescribe datos
+        os.makedirs(os.path.dirname(key) or ".", exist_ok=True)
+        os.replace(source_path, key)
+    
+    def open(self, key: str) -> BinaryIO:
+        return open(key, "rb")
+    
+    def exists(self, key: str) -> bool:
+        return os.path.exists(key)
+    
+    def size(self, key: str) -> int:
+        return os.path.getsize(key)
+    
+    def delete(self, key: str) -> bool:
+        return delete_file_if_exists(key)
+    
+    def local_path(self, key: str) -> str:
+        if not os.path.exists(key):
+            raise FileNotFoundError(key)
+        return key
+    
+    def iter_files(self, directory: str) -> Iterator[StoredObject]:
+        for root, _, files in os.walk(directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield StoredObject(key=path, size=stat.st_size, modified=stat.st_mtime)
+
+
+class S3Storage(StorageBackend):
+    """
+    Files in an S3-compatible bucket (AWS S3, MinIO, Ceph...)
+    
+    Files larger than multipart_threshold are uploaded in multipart_chunk_size
+    parts, so memory use stays at one part whatever the file size. Files read
+    through local_path are kept in cache_dir, up to cache_max_bytes (least
+    recently used are evicted first); stored files are content-addressed and
+    never change, so cached copies never go stale. The cache size is tracked
+    in memory: the directory is only walked once, on first use.
+    
+    Args:
+        bucket: Bucket name
+        prefix: Prefix prepended to every key
+        cache_dir: Local read-through cache directory
+        cache_max_bytes: Size of the read-through cache, 0 disables it
+        multipart_threshold: Files above this size use multipart upload
+        multipart_chunk_size: Part size for multipart uploads (S3 minimum is 5 MB)
+        presigned_url_expires: Default lifetime of presigned URLs in seconds
+        client: boto3 S3 client, created from the remaining arguments if not given
     """
-    file_extension = upload_file.filename.split('.')[-1]
-    filename = f"{uuid.uuid4()}.{file_extension}"
-    file_path = os.path.join(directory, filename)
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(upload_file.file, buffer)
+    is_local = False
+    
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        cache_dir: str = "storage/cache",
+        cache_max_bytes: int = 512 * 1024 * 1024,
+        multipart_threshold: int = 16 * 1024 * 1024,
+        multipart_chunk_size: int = 8 * 1024 * 1024,
+        presigned_url_expires: int = 300,
+        client=None,
+        endpoint_url: Optional[str] = None,
+        region_name: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None
+    ):
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+        self.multipart_threshold = multipart_threshold
+        self.multipart_chunk_size = multipart_chunk_size
+        self.presigned_url_expires = presigned_url_expires
+        self._client = client
+        self._cache_lock = threading.Lock()
+        self._cache_entries: Optional[OrderedDict] = None  # Cached path -> size, least recently used first
+        self._cache_bytes = 0
+        self._client_options = {
+            'endpoint_url': endpoint_url or None,
+            'region_name': region_name or None,
+            'aws_access_key_id': access_key_id or None,
+            'aws_secret_access_key': secret_access_key or None,
+        }
+    
+    @property
+    def client(self):
+        if self._client is None:
+            if boto3 is None:
+                raise RuntimeError("STORAGE_BACKEND=s3 requires boto3 (pip install boto3)")
+            self._client = boto3.client("s3", **self._client_options)
+        return self._client
+    
+    def object_key(self, key: str) -> str:
+        key = os.path.normpath(key).replace(os.sep, "/").lstrip("/")
+        return f"{self.prefix}/{key}" if self.prefix else key
+    
+    @staticmethod
+    def _is_not_found(error: Exception) -> bool:
+        code = getattr(error, "response", {}).get("Error", {}).get("Code")
+        return code in ("404", "NoSuchKey", "NotFound")
+    
+    def put_file(self, key: str, source_path: str, content_type: Optional[str] = None) -> None:
+        object_key = self.object_key(key)
+        extra = {'ContentType': content_type} if content_type else {}
+        if os.path.getsize(source_path) > self.multipart_threshold:
+            self._multipart_upload(object_key, source_path, extra)
+        else:
+            with open(source_path, "rb") as f:
+                self.client.put_object(Bucket=self.bucket, Key=object_key, Body=f, **extra)
+        # Un archivo recién generado (p. ej. el PDF de una invitación) se suele descargar enseguida
+        self._keep_in_cache(key, source_path)
+    
+    def _multipart_upload(self, object_key: str, source_path: str, extra: dict) -> None:
+        upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=object_key, **extra)['UploadId']
+        parts = []
+        try:
+            with open(source_path, "rb") as f:
+                for number, chunk in enumerate(iter(lambda: f.read(self.multipart_chunk_size), b""), start=1):
+                    response = self.client.upload_part(
+                        Bucket=self.bucket, Key=object_key, UploadId=upload_id, PartNumber=number, Body=chunk
+                    )
+                    parts.append({'ETag': response['ETag'], 'PartNumber': number})
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=object_key, UploadId=upload_id, MultipartUpload={'Parts': parts}
+            )
+        except BaseException:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=object_key, UploadId=upload_id)
+            raise
+    
+    def open(self, key: str) -> BinaryIO:
+        cached = self._cache_path(key)
+        if os.path.exists(cached):
+            return open(cached, "rb")
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self.object_key(key))['Body']
+        except Exception as e:
+            if self._is_not_found(e):
+                raise FileNotFoundError(key) from e
+            raise
+    
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+            return True
+        except Exception as e:
+            if self._is_not_found(e):
+                return False
+            raise
+    
+    def size(self, key: str) -> int:
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))['ContentLength']
+        except Exception as e:
+            if self._is_not_found(e):
+                raise FileNotFoundError(key) from e
+            raise
+    
+    def delete(self, key: str) -> bool:
+        cached = self._cache_path(key)
+        delete_file_if_exists(cached)
+        self._forget_cached(cached)
+        try:
+            self.client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+            return True
+        except Exception as e:
+            logger.error(f"Could not delete {key} from bucket {self.bucket}: {str(e)}")
+            return False
+    
+    def local_path(self, key: str) -> str:
+        cached = self._cache_path(key)
+        if os.path.exists(cached):
+            os.utime(cached)  # Marca de uso para el desalojo LRU tras reiniciar
+            self._touch_cached(cached)
+            return cached
+        
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        temp_path = f"{cached}.{uuid.uuid4()}.part"
+        try:
+            with self.open(key) as body, open(temp_path, "wb") as f:
+                for chunk in iter(lambda: body.read(HASH_CHUNK_SIZE), b""):
+                    f.write(chunk)
+            os.replace(temp_path, cached)
+        except BaseException:
+            delete_file_if_exists(temp_path)
+            raise
+        self._add_to_cache(cached)
+        return cached
+    
+    def presigned_url(self, key: str, expires_in: Optional[int] = None) -> Optional[str]:
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={'Bucket': self.bucket, 'Key': self.object_key(key)},
+            ExpiresIn=expires_in or self.presigned_url_expires
+        )
+    
+    def iter_files(self, directory: str) -> Iterator[StoredObject]:
+        prefix = self.object_key(directory).rstrip("/") + "/"
+        strip = len(self.prefix) + 1 if self.prefix else 0
+        token = None
+        while True:
+            options = {'ContinuationToken': token} if token else {}
+            page = self.client.list_objects_v2(Bucket=self.bucket, Prefix=prefix, **options)
+            for item in page.get('Contents', []):
+                yield StoredObject(
+                    key=item['Key'][strip:],
+                    size=item['Size'],
+                    modified=item['LastModified'].timestamp()
+                )
+            if not page.get('IsTruncated'):
+                break
+            token = page['NextContinuationToken']
+    
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, *self.object_key(key).split("/"))
+    
+    def _keep_in_cache(self, key: str, source_path: str) -> None:
+        if self.cache_max_bytes <= 0:
+            delete_file_if_exists(source_path)
+            return
+        cached = self._cache_path(key)
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        os.replace(source_path, cached)
+        self._add_to_cache(cached)
+    
+    def _load_cache_index(self) -> None:
+        # Archivos que quedaron en la caché de ejecuciones anteriores, por fecha de uso
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".part"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        self._cache_entries = OrderedDict((path, size) for _, size, path in sorted(entries))
+        self._cache_bytes = sum(size for _, size, _ in entries)
+    
+    def _touch_cached(self, cached: str) -> None:
+        with self._cache_lock:
+            if self._cache_entries is not None and cached in self._cache_entries:
+                self._cache_entries.move_to_end(cached)
+    
+    def _forget_cached(self, cached: str) -> None:
+        with self._cache_lock:
+            if self._cache_entries is not None:
+                self._cache_bytes -= self._cache_entries.pop(cached, 0)
     
+    def _add_to_cache(self, cached: str) -> None:
+        """Account for a file just written to the cache and evict the least recently used"""
+        size = os.path.getsize(cached)
+        with self._cache_lock:
+            if self._cache_entries is None:
+                self._load_cache_index()
+            self._cache_bytes += size - self._cache_entries.pop(cached, 0)
+            self._cache_entries[cached] = size
+            # El archivo recién añadido se conserva: quien lo pidió lo va a leer
+            while self._cache_bytes > self.cache_max_bytes and len(self._cache_entries) > 1:
+                path, entry_size = self._cache_entries.popitem(last=False)
+                delete_file_if_exists(path)
+                self._cache_bytes -= entry_size
+
+
+def create_storage() -> StorageBackend:
+    """Build the storage backend selected by STORAGE_BACKEND"""
+    if settings.STORAGE_BACKEND == "s3":
+        return S3Storage(
+            bucket=settings.S3_BUCKET,
+            prefix=settings.S3_PREFIX,
+            cache_dir=settings.STORAGE_CACHE_DIR or os.path.join(settings.STORAGE_ROOT, "cache"),
+            cache_max_bytes=settings.STORAGE_CACHE_MAX_BYTES,
+            multipart_threshold=settings.S3_MULTIPART_THRESHOLD,
+            multipart_chunk_size=settings.S3_MULTIPART_CHUNK_SIZE,
+            presigned_url_expires=settings.SIGNED_URL_TTL_SECONDS,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region_name=settings.S3_REGION,
+            access_key_id=settings.S3_ACCESS_KEY_ID,
+            secret_access_key=settings.S3_SECRET_ACCESS_KEY
+        )
+    return LocalStorage()
+
+
+# Global storage backend instance
+storage = create_storage()
+
+
+def stored_file_sha256(file_path: str) -> str:
+    """SHA-256 of a stored file, taken from its name when it is content-addressed"""
+    sha256 = blob_hash_from_path(file_path)
+    if sha256 is not None:
+        return sha256
+    digest = hashlib.sha256()
+    for chunk in storage.iter_chunks(file_path):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def _ingest(db: Session, temp_path: str, directory: str, sha256: str, size: int,
+            content_type: str, extension: str) -> str:
+    file_path = blob_path(directory, sha256, extension)
+    
+    def ingest():
+        with crud.blob_lock(db, sha256):
+            # Mismo contenido ya almacenado: no se vuelve a subir
+            if storage.exists(file_path):
+                delete_file_if_exists(temp_path)
+            else:
+                storage.put_file(file_path, temp_path, content_type)
+            crud.acquire_blob(db, sha256, file_path, size, content_type)
+    
+    try:
+        await run_in_threadpool(ingest)
+    except BaseException:
+        delete_file_if_exists(temp_path)
+        raise
     return file_path
 
 
+async def store_upload(
+    db: Session,
+    upload_file: UploadFile,
+    directory: str = UPLOADS_DIR,
+    max_bytes: Optional[int] = None,
+    allowed_types: Optional[Iterable[str]] = None
+) -> StoredFile:
+    """
+    Save an upload in the content-addressed store and take a reference to it
+    
+    Uploading the same file again reuses the existing blob. Every call
+    must be balanced by a release_file once the referencing contract no
+    longer needs it.
+    
+    Args:
+        db: Database session
+        upload_file: The uploaded file
+        directory: Directory holding the blobs
+        max_bytes: Maximum size, defaults to settings.UPLOAD_MAX_BYTES
+        allowed_types: Content types to accept, any if None
+    
+    Returns:
+        StoredFile: Metadata of the stored blob
+    """
+    stored = await save_upload(upload_file, directory, max_bytes=max_bytes, allowed_types=allowed_types)
+    extension = os.path.splitext(stored.path)[1].lstrip(".")
+    file_path = await _ingest(db, stored.path, directory, stored.sha256, stored.size, stored.content_type, extension)
+    return stored._replace(path=file_path)
+
+
+async def store_bytes(db: Session, data: bytes, extension: str, content_type: str,
+                      directory: str = CONTRACTS_DIR) -> StoredFile:
+    """
+    Save generated content (e.g. a PDF) in the content-addressed store
+    
+    Args:
+        db: Database session
+        data: File contents
+        extension: File extension without the dot
+        content_type: MIME type of the contents
+        directory: Directory holding the blobs
+    
+    Returns:
+        StoredFile: Metadata of the stored blob
+    """
+    sha256 = hashlib.sha256(data).hexdigest()
+    temp_path = os.path.join(directory, f".{uuid.uuid4()}.part")
+    
+    def write():
+        with open(temp_path, "wb") as f:
+            f.write(data)
+    
+    await run_in_threadpool(write)
+    file_path = await _ingest(db, temp_path, directory, sha256, len(data), content_type, extension)
+    return StoredFile(path=file_path, size=len(data), sha256=sha256, content_type=content_type, original_filename=None)
+
+
+def release_reference(db: Session, file_path: Optional[str]) -> bool:
+    """
+    Drop a contract's reference to a file without touching storage
+    
+    Files from before the content-addressed store belong to a single
+    contract and can always be deleted. The caller deletes the file
+    later under crud.blob_lock, after checking the blob is still gone.
+    
+    Returns:
+        bool: True if nobody else uses the file and it can be deleted
+    """
+    if not file_path:
+        return False
+    sha256 = blob_hash_from_path(file_path)
+    if sha256 is not None:
+        with crud.blob_lock(db, sha256):
+            remaining = crud.release_blob(db, sha256)
+        if remaining:
+            return False
+    return True
+
+
+def _delete_stored_file(file_path: str) -> bool:
+    try:
+        return storage.delete(file_path)
+    except Exception as e:
+        logger.warning(f"Could not delete {file_path}: {str(e)}")
+        return False
+
+
+def release_file(db: Session, file_path: Optional[str]) -> bool:
+    """
+    Drop a contract's reference to a file, deleting it when nobody else uses it
+    
+    The last reference and the file go together under the blob lock. A
+    file that cannot be deleted is left for the storage GC.
+    
+    Args:
+        db: Database session
+        file_path: Path stored on the contract
+    
+    Returns:
+        bool: True if the file was deleted
+    """
+    if not file_path:
+        return False
+    sha256 = blob_hash_from_path(file_path)
+    if sha256 is None:
+        return _delete_stored_file(file_path)
+    with crud.blob_lock(db, sha256):
+        if crud.release_blob(db, sha256):
+            return False
+        return _delete_stored_file(file_path)
+
+
+def _delete_unreferenced(file_paths: List[str]) -> List[str]:
+    failed = []
+    db = SessionLocal()
+    try:
+        for file_path in file_paths:
+            sha256 = blob_hash_from_path(file_path)
+            try:
+                if sha256 is None:
+                    deleted = _delete_stored_file(file_path)
+                else:
+                    with crud.blob_lock(db, sha256):
+                        # Una subida idéntica puede haber vuelto a crear el blob mientras tanto
+                        if crud.get_blob(db, sha256) is not None:
+                            continue
+                        deleted = _delete_stored_file(file_path)
+            except Exception as e:
+                # También errores de la base de datos: se reintenta como un borrado fallido
+                logger.warning(f"Could not delete {file_path}: {str(e)}")
+                deleted = False
+            if not deleted:
+                failed.append(file_path)
+    finally:
+        db.close()
+    return failed
+
+
+def _release_references(file_paths: List[str]) -> List[str]:
+    db = SessionLocal()
+    try:
+        return [file_path for file_path in file_paths if release_reference(db, file_path)]
+    finally:
+        db.close()
+
+
+async def release_files_in_background(
+    file_paths: Iterable[Optional[str]],
+    max_retries: Optional[int] = None,
+    backoff_seconds: Optional[float] = None
+) -> List[str]:
+    """
+    Release files of deleted contracts, meant to run after the response
+    
+    References are dropped once; the physical deletes that fail are retried
+    with exponential backoff. Files still failing after the last attempt
+    are logged and left for the storage GC.
+    
+    Args:
+        file_paths: Paths stored on the deleted contracts
+        max_retries: Retries after the first attempt, defaults to settings.FILE_DELETE_MAX_RETRIES
+        backoff_seconds: First retry delay, doubled after each attempt
+    
+    Returns:
+        list: Paths that could not be deleted
+    """
+    if max_retries is None:
+        max_retries = settings.FILE_DELETE_MAX_RETRIES
+    if backoff_seconds is None:
+        backoff_seconds = settings.FILE_DELETE_RETRY_BACKOFF_SECONDS
+    
+    try:
+        pending = await run_in_threadpool(_release_references, [path for path in file_paths if path])
+    except Exception as e:
+        logger.error(f"Could not release file references, left for the storage GC: {str(e)}")
+        return []
+    
+    for attempt in range(max_retries + 1):
+        if not pending:
+            break
+        if attempt:
+            await asyncio.sleep(backoff_seconds * 2 ** (attempt - 1))
+        pending = await run_in_threadpool(_delete_unreferenced, pending)
+    
+    if pending:
+        logger.error(f"Could not delete {len(pending)} files after {max_retries + 1} attempts: {', '.join(pending)}")
+    return pending
+
+
 def delete_file_if_exists(file_path: str) -> bool:
     """
     Delete file if it exists
@@ -51,4 +757,21 @@ def delete_file_if_exists(file_path: str) -> bool:
             os.remove(file_path)
         return True
     except Exception:
-        return False
\ No newline at end of file
+        return False
+
+
+def compute_file_sha256(file_path: str) -> str:
+    """
+    Compute the SHA-256 of a file without loading it fully into memory
+    
+    Args:
+        file_path: Path to file to hash
+        
+    Returns:
+        str: Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
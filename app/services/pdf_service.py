@@ -1,19 +1,391 @@
+import hashlib
+import io
+import logging
 import os
-import textwrap
 import tempfile
+import time
 from datetime import datetime
+from functools import lru_cache
+from typing import Callable, List, NamedTuple, Tuple
 from reportlab.pdfgen import canvas
+from reportlab.pdfbase import pdfmetrics
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.colors import black
 from reportlab.lib.units import cm
+from reportlab.lib.utils import ImageReader
 from PIL import Image
 
+from ..cache import TTLCache
+from ..config import settings
+from ..memory import current_rss_bytes, format_bytes, peak_rss_bytes
+from .file_service import storage
+
+logger = logging.getLogger(__name__)
+
 
 # PDF Configuration
 DESIGN_IMAGE_WIDTH = 13 * cm  # Standard width for design images (reducido de 15cm a 13cm para más espacio de texto)
 DESIGN_IMAGE_MAX_HEIGHT = 13 * cm  # Maximum height for design images (reducido de 15cm a 13cm)
 LOGO_WIDTH = 3 * cm  # Company logo width (reduced for more discretion)
 LOGO_PATH = "storage/logo.png"  # Path to company logo
+PAGE_MARGIN_X = 1.5 * cm  # Márgenes laterales de la página
+PAGE_TOP_Y = letter[1] - 1.5 * cm  # Línea base del título
+TITLE_SPACING = 1.0 * cm  # Espacio después del título
+LOGO_SPACING = 0.8 * cm  # Espacio después del logo
+DESIGN_IMAGE_SPACING = 0.8 * cm  # Espacio después de la imagen del diseño
+SIGNATURE_BOX_Y = 1.5 * cm  # Posición de la caja de firma desde el borde inferior
+SIGNATURE_BOX_HEIGHT = 3 * cm
+POLICY_GAP = 0.3 * cm  # Espacio mínimo entre política y caja
+POLICY_END_Y = SIGNATURE_BOX_Y + SIGNATURE_BOX_HEIGHT + POLICY_GAP
+POLICY_BOX_WIDTH = letter[0] - 2 * PAGE_MARGIN_X
+POLICY_FONT = "Esther-Medium"  # Fuente preferida para la política
+POLICY_FALLBACK_FONT = "Helvetica"
+
+DEFAULT_POLICY_TEXT = (
+    "He leído y acepto el diseño dispuesto, así como el texto anterior.\n\n"
+    "Les rogamos comprueben el diseño gráfico, textos, direcciones, números de teléfono, palabras..."
+    " La aceptación de este diseño conlleva la impresión y puesta en marcha, y por lo tanto, la aceptación del presupuesto."
+    " Cualquier corrección o error tipográfico no descubierto con anterioridad, correrá a cargo del cliente.\n\n"
+    "Los tamaños finales y la posición pueden variar ligeramente, dependiendo de la técnica empleada, el corte y manipulado manual."
+    " El tono de la tinta se asemejará a esta muestra. Los colores pueden variar según la técnica y maquinaria empleada."
+    " Si requiere pantones específicos, comuníquelo con anterioridad. Su uso implica incremento de precio y está limitado a tiradas offset o serigrafía.\n\n"
+    "Puede realizar una modificación previa a la aceptación sin coste. Nuevas modificaciones conllevan costes añadidos."
+    " Los materiales y acabados (laminados, lacas, bordados) pueden alterar la percepción del color.\n\n"
+    "CONSENTIMIENTO: Al firmar este documento, acepto que se registre mi dirección IP y datos de conexión para fines de verificación y trazabilidad legal del contrato."
+)
+
+# Líneas ya partidas, por (hash del texto, fuente, tamaño, ancho de caja)
+layout_cache = TTLCache(max_entries=settings.PDF_LAYOUT_CACHE_SIZE)
+# Borradores ya generados, por hash de los datos de entrada
+draft_preview_cache = TTLCache(
+    max_entries=settings.DRAFT_PREVIEW_CACHE_SIZE,
+    ttl_seconds=settings.DRAFT_PREVIEW_CACHE_TTL_SECONDS
+)
+
+
+@lru_cache(maxsize=None)
+def resolve_font(font_name: str, fallback: str) -> str:
+    """Return font_name if reportlab knows it, otherwise fallback"""
+    try:
+        pdfmetrics.getFont(font_name)
+        return font_name
+    except KeyError:
+        return fallback
+
+
+def _split_long_word(word: str, font_name: str, font_size: float, max_width: float) -> List[str]:
+    # Palabras más anchas que la caja (URLs, etc.) se parten por caracteres
+    pieces = []
+    current = ""
+    for char in word:
+        if current and pdfmetrics.stringWidth(current + char, font_name, font_size) > max_width:
+            pieces.append(current)
+            current = char
+        else:
+            current += char
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def wrap_text(text: str, font_name: str, font_size: float, max_width: float, use_cache: bool = True) -> Tuple[str, ...]:
+    """
+    Break text into lines that fit max_width using real glyph widths
+
+    Whitespace (newlines included) is collapsed like textwrap.wrap did.
+    Results are kept in layout_cache, so re-rendering the same policy text
+    with the same font and box width costs a dictionary lookup.
+
+    Args:
+        text: Text to wrap
+        font_name: Registered reportlab font name
+        font_size: Font size in points
+        max_width: Width of the text box in points
+        use_cache: Set to False for one-off texts that shouldn't evict real policies
+
+    Returns:
+        tuple: The wrapped lines
+    """
+    key = (hashlib.sha256(text.encode('utf-8')).hexdigest(), font_name, font_size, round(max_width, 2))
+    lines = layout_cache.get(key) if use_cache else None
+    if lines is not None:
+        return lines
+
+    space_width = pdfmetrics.stringWidth(" ", font_name, font_size)
+    wrapped = []
+    current = ""
+    current_width = 0.0
+    for word in text.split():
+        word_width = pdfmetrics.stringWidth(word, font_name, font_size)
+        if word_width > max_width:
+            pieces = _split_long_word(word, font_name, font_size, max_width)
+            if current:
+                wrapped.append(current)
+            wrapped.extend(pieces[:-1])
+            current = pieces[-1]
+            current_width = pdfmetrics.stringWidth(current, font_name, font_size)
+        elif not current:
+            current, current_width = word, word_width
+        elif current_width + space_width + word_width <= max_width:
+            current += " " + word
+            current_width += space_width + word_width
+        else:
+            wrapped.append(current)
+            current, current_width = word, word_width
+    if current:
+        wrapped.append(current)
+
+    lines = tuple(wrapped)
+    if use_cache:
+        layout_cache.set(key, lines)
+    return lines
+
+
+class PolicyLayout(NamedTuple):
+    font_name: str
+    font_size: int
+    line_spacing: float
+    lines: List[str]  # Lines to draw, ending in "..." if truncated
+    total_lines: int  # Lines the full text needs
+    max_lines: int  # Lines that fit in the available space
+    truncated_lines: int  # Lines of the full text left out
+
+
+def layout_policy_text(legal_text: str, available_space: float, max_width: float = POLICY_BOX_WIDTH,
+                       use_cache: bool = True) -> PolicyLayout:
+    """
+    Choose font size and fit the policy text in the space above the signature box
+
+    Args:
+        legal_text: Policy text
+        available_space: Vertical space between the design image and the signature box, in points
+        max_width: Width of the text box in points
+        use_cache: Whether to use the layout cache for the wrapped lines
+
+    Returns:
+        PolicyLayout: Font, lines to draw and fitting metrics
+    """
+    # Ajustar tamaño de fuente más pequeño para mejor proporción
+    if available_space < 4 * cm:
+        font_size = 7  # Reducido de 8 a 7
+        line_spacing = 0.25 * cm  # Reducido para comprimir más
+    else:
+        font_size = 8  # Reducido de 9 a 8
+        line_spacing = 0.28 * cm  # Reducido para comprimir más
+
+    # Intentar usar fuente Esther-Medium, fallback a Helvetica
+    font_name = resolve_font(POLICY_FONT, POLICY_FALLBACK_FONT)
+    all_lines = wrap_text(legal_text, font_name, font_size, max_width, use_cache=use_cache)
+
+    # Calcular cuántas líneas caben en el espacio disponible
+    max_lines = int(available_space / line_spacing)
+    lines = list(all_lines)
+    truncated_lines = 0
+    if len(lines) > max_lines and max_lines > 0:
+        lines = lines[:max_lines-1]  # Dejar espacio para "..."
+        truncated_lines = len(all_lines) - len(lines)
+        lines.append("...")
+
+    return PolicyLayout(
+        font_name=font_name,
+        font_size=font_size,
+        line_spacing=line_spacing,
+        lines=lines,
+        total_lines=len(all_lines),
+        max_lines=max_lines,
+        truncated_lines=truncated_lines
+    )
+
+def design_image_display_size(img_width: int, img_height: int) -> Tuple[float, float]:
+    """Size the design image is drawn at: fixed width, proportional height with a limit"""
+    aspect = img_width / img_height
+    
+    # Tamaño estándar: ancho fijo, altura proporcional con límite
+    display_width = DESIGN_IMAGE_WIDTH
+    display_height = display_width / aspect
+    
+    # Aplicar límite máximo de altura
+    if display_height > DESIGN_IMAGE_MAX_HEIGHT:
+        display_height = DESIGN_IMAGE_MAX_HEIGHT
+        display_width = display_height * aspect
+    return display_width, display_height
+
+
+def signature_display_size(img_width: int, img_height: int) -> Tuple[float, float]:
+    """Size the signature is drawn at inside the signature box"""
+    sig_display_width = 8.0 * cm  # Firma ENORME y muy visible (aumentada de 5cm a 8cm)
+    return sig_display_width, sig_display_width * img_height / img_width
+
+
+class ImageTooLarge(ValueError):
+    """Raised for images over IMAGE_MAX_PIXELS (possible decompression bombs)"""
+
+
+# Pillow also refuses images over twice this limit on its own
+Image.MAX_IMAGE_PIXELS = settings.IMAGE_MAX_PIXELS
+
+
+def print_pixel_size(display_width: float, display_height: float) -> Tuple[int, int]:
+    """Pixels needed to print a box (in points) at PDF_IMAGE_DPI, capped at IMAGE_DECODE_PIXEL_BUDGET"""
+    scale = settings.PDF_IMAGE_DPI / 72
+    width, height = display_width * scale, display_height * scale
+    budget = settings.IMAGE_DECODE_PIXEL_BUDGET
+    if width * height > budget:
+        shrink = (budget / (width * height)) ** 0.5
+        width, height = width * shrink, height * shrink
+    return max(1, int(width)), max(1, int(height))
+
+
+def load_print_image(source: Image.Image, target_size: Tuple[int, int]) -> Image.Image:
+    """
+    Decode an opened image at no more than target_size, flattened to RGB on white
+    
+    JPEGs are decoded directly at a reduced scale (Pillow draft mode); other
+    formats are reduced right after decoding, before any conversion, so the
+    full-size image is never copied. Transparency is flattened on the small
+    image only.
+    
+    Raises:
+        ImageTooLarge: If the image has more than IMAGE_MAX_PIXELS pixels
+    """
+    width, height = source.size
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ImageTooLarge(f"Image of {width}x{height} pixels exceeds the limit of {settings.IMAGE_MAX_PIXELS}")
+    
+    img = source
+    if img.mode in ('P', '1'):
+        # Paleta y 1 bit solo se pueden escalar por vecino más próximo
+        img = img.convert('RGBA' if img.mode == 'P' else 'L')
+    # JPEG: decodificar directamente a 1/2, 1/4 o 1/8 sin bajar del tamaño de impresión
+    img.draft('RGB', target_size)
+    img.thumbnail(target_size, Image.LANCZOS, reducing_gap=2.0)
+    
+    if img.mode in ('RGBA', 'LA'):
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel('A'))
+        img = background
+    elif img.mode != 'RGB':
+        img = img.convert('RGB')
+    return img
+
+
+def open_print_image(image_file, display_size: Callable[[int, int], Tuple[float, float]]):
+    """
+    Open an image for drawing, decoded at the size it is printed at
+    
+    JPEGs already at or below print size are embedded as is; anything else
+    goes through load_print_image and is embedded as a JPEG.
+    
+    Args:
+        image_file: Path or file object
+        display_size: Maps pixel width and height to the drawn size in points
+    
+    Returns:
+        tuple: (ImageReader, display width, display height)
+    
+    Raises:
+        ImageTooLarge: If the image has more than IMAGE_MAX_PIXELS pixels
+    """
+    try:
+        source = Image.open(image_file)
+    except Image.DecompressionBombError as e:
+        # Pillow ya lo rechaza al abrirlo (más del doble de IMAGE_MAX_PIXELS)
+        raise ImageTooLarge(str(e)) from e
+    with source:
+        display_width, display_height = display_size(*source.size)
+        target_width, target_height = print_pixel_size(display_width, display_height)
+        if (source.format == 'JPEG' and source.mode == 'RGB'
+                and source.width <= target_width and source.height <= target_height):
+            if not isinstance(image_file, str):
+                image_file.seek(0)
+            return ImageReader(image_file), display_width, display_height
+        buffer = io.BytesIO()
+        load_print_image(source, (target_width, target_height)).save(buffer, 'JPEG', quality=95)
+    
+    buffer.seek(0)
+    return ImageReader(buffer), display_width, display_height
+
+
+@lru_cache(maxsize=4)
+def _logo_display_height(logo_path: str, mtime: float) -> float:
+    # Solo lee la cabecera del logo (no decodifica píxeles)
+    with Image.open(logo_path) as logo_img:
+        logo_width, logo_height = logo_img.size
+    return LOGO_WIDTH / (logo_width / logo_height)
+
+
+def logo_block_height() -> float:
+    """Vertical space taken by the logo and the spacing after it"""
+    try:
+        display_logo_height = _logo_display_height(LOGO_PATH, os.path.getmtime(LOGO_PATH))
+        return display_logo_height + LOGO_SPACING
+    except Exception:
+        return 0.5 * cm  # Espacio mínimo si no hay logo o hay error
+
+
+def check_policy_layout(img_width: int, img_height: int, politica_confirmacion: str = None,
+                        use_cache: bool = True) -> dict:
+    """
+    Run only the layout pass of create_professional_pdf
+    
+    The design image is sized from its dimensions alone, so no pixels are
+    decoded and no PDF is produced.
+    
+    Args:
+        img_width: Design image width in pixels
+        img_height: Design image height in pixels
+        politica_confirmacion: Policy text, the default text if empty
+        use_cache: Whether to use the layout cache for the wrapped lines
+    
+    Returns:
+        dict: Image box height, available space, font size and line counts (lengths in points)
+    """
+    _, display_height = design_image_display_size(img_width, img_height)
+    current_y = PAGE_TOP_Y - TITLE_SPACING - logo_block_height() - display_height - DESIGN_IMAGE_SPACING
+    available_space = current_y - POLICY_END_Y
+
+    layout = layout_policy_text(politica_confirmacion or DEFAULT_POLICY_TEXT, available_space, use_cache=use_cache)
+    truncated_lines = layout.truncated_lines
+    if layout.max_lines <= 0:
+        # No cabe ninguna línea: el PDF las dibuja sin recortar, encima del recuadro de firma
+        truncated_lines = layout.total_lines
+    return {
+        'image_display_height': round(display_height, 2),
+        'available_space': round(available_space, 2),
+        'font_name': layout.font_name,
+        'font_size': layout.font_size,
+        'line_spacing': round(layout.line_spacing, 2),
+        'total_lines': layout.total_lines,
+        'max_lines': max(layout.max_lines, 0),
+        'lines_fitted': layout.total_lines - truncated_lines,
+        'truncated_lines': truncated_lines,
+        'fits': truncated_lines == 0,
+    }
+
+
+def draft_preview_key(image_bytes: bytes, **fields) -> str:
+    """Hash of everything that affects a draft preview"""
+    digest = hashlib.sha256(image_bytes)
+    for name in sorted(fields):
+        digest.update(f"\0{name}\0{fields[name] or ''}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def render_pdf_bytes(design_image_bytes: bytes, **pdf_fields) -> bytes:
+    """
+    Render a contract PDF entirely in memory
+    
+    Args:
+        design_image_bytes: Encoded design image
+        **pdf_fields: Remaining create_professional_pdf arguments
+    
+    Returns:
+        bytes: The PDF document
+    """
+    output = io.BytesIO()
+    create_professional_pdf(pdf_path=output, design_image_path=io.BytesIO(design_image_bytes), **pdf_fields)
+    return output.getvalue()
+
 
 def format_date_spanish(date_str: str) -> str:
     """Convert date string to Spanish format for contract"""
@@ -43,15 +415,24 @@ def format_date_spanish(date_str: str) -> str:
 def create_professional_pdf(pdf_path: str, client_name: str, client_email: str, design_image_path: str, 
                           titulo_diseno: str = None, puesto_empresa: str = None, politica_confirmacion: str = None,
                           signature_path: str = None, signed_by: str = None, signed_at_str: str = None):
-    """Genera un PDF de aceptación de diseño personalizado en formato vertical"""
+    """
+    Genera un PDF de aceptación de diseño personalizado en formato vertical
+    
+    pdf_path y design_image_path también pueden ser objetos tipo fichero
+    (BytesIO) para generar el PDF en memoria sin escribir en disco. Las
+    rutas de imágenes son claves del almacenamiento (file_service.storage).
+    Las imágenes se decodifican al tamaño de impresión (ver open_print_image).
+    """
+    started = time.perf_counter()
+    peak_before = peak_rss_bytes()
     c = canvas.Canvas(pdf_path, pagesize=letter)
     width, height = letter
     
     # Marca de agua se dibujará al final para aparecer por encima
     
     # Márgenes optimizados para aprovechar mejor el ancho
-    margin_x = 1.5 * cm  # Reducido de 2cm a 1.5cm para más ancho de texto
-    current_y = height - 1.5 * cm  # Más espacio aprovechable
+    margin_x = PAGE_MARGIN_X  # Reducido de 2cm a 1.5cm para más ancho de texto
+    current_y = PAGE_TOP_Y  # Más espacio aprovechable
     
     # Encabezado principal
     try:
@@ -60,7 +441,7 @@ def create_professional_pdf(pdf_path: str, client_name: str, client_email: str,
         c.setFont("Helvetica-Bold", 14)
     main_title = f"PRUEBA DISEÑO {client_name.upper()}" if titulo_diseno is None else titulo_diseno.upper()
     c.drawCentredString(width / 2, current_y, main_title)
-    current_y -= 1.0 * cm  # Espacio equilibrado después del título
+    current_y -= TITLE_SPACING  # Espacio equilibrado después del título
     
     # Logo de la empresa centrado (después del título)
     try:
@@ -76,121 +457,49 @@ def create_professional_pdf(pdf_path: str, client_name: str, client_email: str,
             logo_y = current_y - display_logo_height
             
             c.drawImage(LOGO_PATH, logo_x, logo_y, width=display_logo_width, height=display_logo_height)
-            current_y = logo_y - 0.8 * cm  # Espacio después del logo
+            current_y = logo_y - LOGO_SPACING  # Espacio después del logo
         else:
             current_y -= 0.5 * cm  # Espacio mínimo si no hay logo
     except Exception:
         current_y -= 0.5 * cm  # Espacio mínimo si hay error
     
-    # Imagen del diseño con tamaño estándar
+    # Imagen del diseño con tamaño estándar, decodificada al tamaño de impresión
     try:
-        img = Image.open(design_image_path)
-        
-        # Convertir PNG con transparencia a RGB con fondo blanco
-        processed_image_path = design_image_path  # Por defecto usar la original
-        temp_file = None
-        
-        if img.mode in ('RGBA', 'LA', 'P'):
-            # Crear una imagen con fondo blanco
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            if img.mode == 'P':
-                img = img.convert('RGBA')
-            background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
-            img = background
-            
-            # Guardar imagen procesada en archivo temporal
-            temp_file = tempfile.NamedTemporaryFile(suffix='.jpg', delete=False)
-            img.save(temp_file.name, 'JPEG', quality=95)
-            processed_image_path = temp_file.name
-            temp_file.close()
-        elif img.mode != 'RGB':
-            img = img.convert('RGB')
-            # Guardar imagen convertida en archivo temporal
-            temp_file = tempfile.NamedTemporaryFile(suffix='.jpg', delete=False)
-            img.save(temp_file.name, 'JPEG', quality=95)
-            processed_image_path = temp_file.name
-            temp_file.close()
-            
-        img_width, img_height = img.size
-        aspect = img_width / img_height
-        
-        # Tamaño estándar: ancho fijo, altura proporcional con límite
-        display_width = DESIGN_IMAGE_WIDTH
-        display_height = display_width / aspect
-        
-        # Aplicar límite máximo de altura
-        if display_height > DESIGN_IMAGE_MAX_HEIGHT:
-            display_height = DESIGN_IMAGE_MAX_HEIGHT
-            display_width = display_height * aspect
+        # Con almacenamiento remoto se usa la copia de la caché local
+        if isinstance(design_image_path, str):
+            design_image_path = storage.local_path(design_image_path)
+        design_image, display_width, display_height = open_print_image(design_image_path, design_image_display_size)
         
         # Centrar imagen
         img_x = (width - display_width) / 2
         img_y = current_y - display_height
         
-        # Usar imagen procesada
-        c.drawImage(processed_image_path, img_x, img_y, width=display_width, height=display_height)
-        
-        # Limpiar archivo temporal si se creó
-        if temp_file and os.path.exists(processed_image_path) and processed_image_path != design_image_path:
-            try:
-                os.unlink(processed_image_path)
-            except:
-                pass
-        current_y = img_y - 0.8 * cm  # Espacio después de la imagen del diseño
+        c.drawImage(design_image, img_x, img_y, width=display_width, height=display_height)
+        current_y = img_y - DESIGN_IMAGE_SPACING  # Espacio después de la imagen del diseño
+    except ImageTooLarge:
+        raise
     except Exception as e:
         c.setFont("Helvetica", 10)
         c.drawString(margin_x, current_y, f"[Error al insertar imagen: {e}]")
         current_y -= 1 * cm
     
     # Definir posición de la caja de firma
-    box_height = 3 * cm  # Altura de la caja de firma (volvemos a 3cm)
-    box_y = 1.5 * cm  # Posición desde el borde inferior
+    box_height = SIGNATURE_BOX_HEIGHT  # Altura de la caja de firma (volvemos a 3cm)
+    box_y = SIGNATURE_BOX_Y  # Posición desde el borde inferior
     
     # Calcular posición de la política: empezar justo encima de la caja
-    policy_gap = 0.3 * cm  # Espacio mínimo entre política y caja
-    policy_end_y = box_y + box_height + policy_gap
+    policy_end_y = POLICY_END_Y
     
     # La política debe ocupar el espacio entre la imagen y la caja
     available_space = current_y - policy_end_y
     
     # Política de confirmación: empezar desde policy_end_y hacia arriba
     policy_start_y = policy_end_y
-    if politica_confirmacion:
-        legal_text = politica_confirmacion
-    else:
-        legal_text = (
-            "He leído y acepto el diseño dispuesto, así como el texto anterior.\n\n"
-            "Les rogamos comprueben el diseño gráfico, textos, direcciones, números de teléfono, palabras..."
-            " La aceptación de este diseño conlleva la impresión y puesta en marcha, y por lo tanto, la aceptación del presupuesto."
-            " Cualquier corrección o error tipográfico no descubierto con anterioridad, correrá a cargo del cliente.\n\n"
-            "Los tamaños finales y la posición pueden variar ligeramente, dependiendo de la técnica empleada, el corte y manipulado manual."
-            " El tono de la tinta se asemejará a esta muestra. Los colores pueden variar según la técnica y maquinaria empleada."
-            " Si requiere pantones específicos, comuníquelo con anterioridad. Su uso implica incremento de precio y está limitado a tiradas offset o serigrafía.\n\n"
-            "Puede realizar una modificación previa a la aceptación sin coste. Nuevas modificaciones conllevan costes añadidos."
-            " Los materiales y acabados (laminados, lacas, bordados) pueden alterar la percepción del color.\n\n"
-            "CONSENTIMIENTO: Al firmar este documento, acepto que se registre mi dirección IP y datos de conexión para fines de verificación y trazabilidad legal del contrato."
-        )
-    
-    # Ajustar tamaño de fuente más pequeño para mejor proporción
-    if available_space < 4 * cm:
-        font_size = 7  # Reducido de 8 a 7
-        line_spacing = 0.25 * cm  # Reducido para comprimir más
-    else:
-        font_size = 8  # Reducido de 9 a 8
-        line_spacing = 0.28 * cm  # Reducido para comprimir más
-    
-    # Intentar usar fuente Esther-Medium, fallback a Helvetica
-    try:
-        c.setFont("Esther-Medium", font_size)
-    except:
-        c.setFont("Helvetica", font_size)
-    lines = textwrap.wrap(legal_text, 120)  # Aumentado de 110 a 120 caracteres por línea
-    
-    # Calcular cuántas líneas caben en el espacio disponible
-    max_lines = int(available_space / line_spacing)
-    if len(lines) > max_lines and max_lines > 0:
-        lines = lines[:max_lines-1]  # Dejar espacio para "..."
-        lines.append("...")
+    legal_text = politica_confirmacion or DEFAULT_POLICY_TEXT
+    layout = layout_policy_text(legal_text, available_space, POLICY_BOX_WIDTH)
+    c.setFont(layout.font_name, layout.font_size)
+    lines = layout.lines
+    line_spacing = layout.line_spacing
     
     # Calcular posición de inicio para que la política termine justo encima de la caja
     total_text_height = len(lines) * line_spacing
@@ -248,18 +557,19 @@ def create_professional_pdf(pdf_path: str, client_name: str, client_email: str,
         
         # Mostrar imagen de firma en la caja (muy pequeña)
         try:
-            sig_img = Image.open(signature_path)
-            sig_width, sig_height = sig_img.size
-            sig_aspect_ratio = sig_height / sig_width
-            sig_display_width = 8.0 * cm  # Firma ENORME y muy visible (aumentada de 5cm a 8cm)
-            sig_display_height = sig_display_width * sig_aspect_ratio
+            signature_path = storage.local_path(signature_path)
+            signature_image, sig_display_width, sig_display_height = open_print_image(
+                signature_path, signature_display_size
+            )
             
             # Ajustar posición para firma ENORME en caja normal
             sig_x = margin_x + box_width - 8.5 * cm  # Más espacio para firma de 8cm
             sig_y = box_y + 0.2 * cm  # Posición baja en caja de 3cm
             
-            c.drawImage(signature_path, sig_x, sig_y, 
+            c.drawImage(signature_image, sig_x, sig_y, 
                        width=sig_display_width, height=sig_display_height)
+        except ImageTooLarge:
+            raise
         except Exception:
             pass
     
@@ -334,4 +644,12 @@ def create_professional_pdf(pdf_path: str, client_name: str, client_email: str,
         pass  # Si hay error con el logo, continuar sin marca de agua
     c.restoreState()
     
-    c.save()
\ No newline at end of file
+    c.save()
+    
+    # El pico de RSS es del proceso: solo crece si este render supera el máximo anterior
+    peak_after = peak_rss_bytes()
+    peak_growth = peak_after - peak_before if peak_after is not None and peak_before is not None else None
+    logger.info(
+        f"PDF rendered in {(time.perf_counter() - started) * 1000:.0f} ms, "
+        f"RSS {format_bytes(current_rss_bytes())}, peak RSS {format_bytes(peak_after)} (+{format_bytes(peak_growth)})"
+    )
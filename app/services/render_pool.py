@@ -0,0 +1,72 @@
+"""
+Bounded worker pool for CPU-heavy rendering (PDFs, images)
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RenderPoolBusy(Exception):
+    """Raised when the pool already has as many jobs as it accepts"""
+
+
+class RenderPool:
+    """
+    Run blocking render functions off the event loop with bounded concurrency
+
+    At most max_workers jobs run at the same time and at most max_pending
+    wait behind them; further submissions fail fast with RenderPoolBusy so
+    a burst of previews can't pile up unbounded work and memory.
+
+    Args:
+        max_workers: Render threads
+        max_pending: Jobs allowed to wait for a free thread
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._in_flight = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="render")
+        return self._executor
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Run func(*args, **kwargs) in the pool and return its result
+
+        Raises:
+            RenderPoolBusy: If max_workers + max_pending jobs are already in flight
+        """
+        if self._in_flight >= self.max_workers + self.max_pending:
+            raise RenderPoolBusy("Render pool is busy")
+
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), partial(func, *args, **kwargs))
+        finally:
+            self._in_flight -= 1
+
+    def shutdown(self) -> None:
+        """Wait for running jobs and stop the threads"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+# Global render pool instance
+render_pool = RenderPool(
+    max_workers=settings.RENDER_POOL_WORKERS,
+    max_pending=settings.RENDER_POOL_MAX_PENDING
+)
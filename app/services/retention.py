@@ -0,0 +1,153 @@
+"""
+Retention: hard-purge soft-deleted contracts and expire stale unsigned ones
+"""
+
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from .. import crud, models
+from ..config import settings
+from ..logger import log_business_event
+from .file_service import release_file
+
+logger = logging.getLogger(__name__)
+
+
+def purge_deleted_contracts(db: Session, older_than_days: int, batch_size: int = 200,
+                            sleep_seconds: float = 0.5, dry_run: bool = False) -> int:
+    """
+    Hard-delete contracts soft-deleted more than older_than_days ago
+
+    Rows are deleted batch_size at a time, each batch in its own short
+    transaction, with a pause in between so the purge never holds locks
+    for long. Their files were already released when they were
+    soft-deleted; anything left behind is the storage GC's job.
+
+    Returns:
+        int: Contracts purged (or that would be, with dry_run)
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    purged = 0
+    last_id = 0
+    while True:
+        ids = [row[0] for row in (
+            db.query(models.DBContract.id)
+            .filter(models.DBContract.deleted_at < cutoff, models.DBContract.id > last_id)
+            .order_by(models.DBContract.id)
+            .limit(batch_size)
+            .all()
+        )]
+        if not ids:
+            break
+        last_id = ids[-1]
+
+        if not dry_run:
+            db.query(models.DBContract).filter(models.DBContract.id.in_(ids)).delete(synchronize_session=False)
+            db.commit()
+        purged += len(ids)
+        logger.info(f"Retention: {purged} soft-deleted contracts purged")
+        if sleep_seconds:
+            time.sleep(sleep_seconds)
+    return purged
+
+
+def expire_unsigned_contracts(db: Session, older_than_days: int, batch_size: int = 200,
+                              sleep_seconds: float = 0.5, dry_run: bool = False) -> int:
+    """
+    Soft-delete contracts still unsigned older_than_days after creation
+
+    They go through the same path as a manual delete: deleted_at is set and
+    their files are released. purge_deleted_contracts removes the rows
+    once the deleted-contract retention has passed.
+
+    Returns:
+        int: Contracts expired (or that would be, with dry_run)
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    expired = 0
+    last_id = 0
+    while True:
+        batch = (
+            db.query(models.DBContract)
+            .filter(
+                models.DBContract.deleted_at.is_(None),
+                models.DBContract.signed_at.is_(None),
+                models.DBContract.created_at < cutoff,
+                models.DBContract.id > last_id
+            )
+            .order_by(models.DBContract.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        if not dry_run:
+            now = datetime.utcnow()
+            file_paths = []
+            for db_contract in batch:
+                db_contract.deleted_at = now
+                file_paths.extend(crud.get_contract_file_paths(db_contract))
+            db.commit()
+            for file_path in file_paths:
+                release_file(db, file_path)
+        expired += len(batch)
+        logger.info(f"Retention: {expired} unsigned contracts expired")
+        if sleep_seconds:
+            time.sleep(sleep_seconds)
+    return expired
+
+
+def run_retention(
+    db: Session,
+    deleted_retention_days: Optional[int] = None,
+    unsigned_expiry_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    sleep_seconds: Optional[float] = None,
+    dry_run: bool = False
+) -> Dict[str, int]:
+    """
+    Apply the retention policy
+
+    Args:
+        db: Database session
+        deleted_retention_days: Purge contracts soft-deleted longer ago than this, 0 disables
+        unsigned_expiry_days: Expire unsigned contracts created longer ago than this, 0 disables
+        batch_size: Contracts per transaction
+        sleep_seconds: Pause between batches
+        dry_run: Only count
+
+    Returns:
+        dict: Counts of expired and purged contracts
+    """
+    if deleted_retention_days is None:
+        deleted_retention_days = settings.RETENTION_DELETED_DAYS
+    if unsigned_expiry_days is None:
+        unsigned_expiry_days = settings.RETENTION_UNSIGNED_DAYS
+    if batch_size is None:
+        batch_size = settings.RETENTION_BATCH_SIZE
+    if sleep_seconds is None:
+        sleep_seconds = settings.RETENTION_BATCH_SLEEP_SECONDS
+
+    stats = {'expired': 0, 'purged': 0}
+    if unsigned_expiry_days > 0:
+        stats['expired'] = expire_unsigned_contracts(db, unsigned_expiry_days, batch_size, sleep_seconds, dry_run)
+    if deleted_retention_days > 0:
+        stats['purged'] = purge_deleted_contracts(db, deleted_retention_days, batch_size, sleep_seconds, dry_run)
+
+    log_business_event(
+        logger,
+        "contract_retention",
+        f"{'Would expire' if dry_run else 'Expired'} {stats['expired']} unsigned contracts, "
+        f"{'would purge' if dry_run else 'purged'} {stats['purged']} deleted contracts",
+        dry_run=dry_run,
+        deleted_retention_days=deleted_retention_days,
+        unsigned_expiry_days=unsigned_expiry_days,
+        **stats
+    )
+    return stats
@@ -0,0 +1,189 @@
+"""
+Garbage collection of stored files no contract references
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from .. import crud, models
+from ..config import settings
+from ..database import SessionLocal
+from ..logger import log_business_event
+from .file_service import UPLOADS_DIR, CONTRACTS_DIR, DERIVATIVES_DIR, StoredObject, blob_hash_from_path, storage
+
+logger = logging.getLogger(__name__)
+
+GC_DIRECTORIES = (UPLOADS_DIR, CONTRACTS_DIR, DERIVATIVES_DIR)
+
+# A file is live while a live contract points at it from one of these columns
+REFERENCE_COLUMNS = tuple(getattr(models.DBContract, field) for field in crud.CONTRACT_FILE_FIELDS)
+
+
+def _batches(items: Iterable[StoredObject], size: int) -> Iterable[List[StoredObject]]:
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def referenced_paths(db: Session, paths: List[str]) -> Set[str]:
+    """Which of these paths a live (not soft-deleted) contract still points at"""
+    rows = (
+        db.query(*REFERENCE_COLUMNS)
+        .filter(models.DBContract.deleted_at.is_(None), or_(*(column.in_(paths) for column in REFERENCE_COLUMNS)))
+        .all()
+    )
+    wanted = set(paths)
+    return {value for row in rows for value in row if value in wanted}
+
+
+def recently_used_blobs(db: Session, paths: List[str], cutoff: datetime) -> Set[str]:
+    """
+    Paths of blobs referenced again after cutoff
+
+    An upload identical to an existing blob only bumps the blob row, the
+    file keeps its old modification time, so the row is checked as well.
+    """
+    last_used = func.coalesce(models.DBBlob.updated_at, models.DBBlob.created_at)
+    rows = db.query(models.DBBlob.path).filter(models.DBBlob.path.in_(paths), last_used >= cutoff).all()
+    return {row[0] for row in rows}
+
+
+def _delete_file(key: str) -> bool:
+    try:
+        return storage.delete(key)
+    except Exception as e:
+        logger.warning(f"Could not delete {key}: {str(e)}")
+        return False
+
+
+def _delete_orphan(db: Session, item: StoredObject, cutoff: datetime) -> Optional[bool]:
+    """
+    Delete an orphaned file and its blob row, unless it was referenced again since the batch was checked
+
+    Returns:
+        bool: Whether the file was deleted, None if it is in use again and was kept
+    """
+    db_blob = db.query(models.DBBlob.sha256).filter(models.DBBlob.path == item.key).first()
+    sha256 = db_blob[0] if db_blob else blob_hash_from_path(item.key)
+    if sha256 is None:
+        # Archivo anterior al almacén por hash: nadie puede volver a referenciarlo
+        return _delete_file(item.key)
+    with crud.blob_lock(db, sha256):
+        db_blob = crud.get_blob(db, sha256)
+        if db_blob is not None and db_blob.path == item.key:
+            last_used = db_blob.updated_at or db_blob.created_at
+            if (last_used and last_used >= cutoff) or referenced_paths(db, [item.key]):
+                return None
+            db.delete(db_blob)
+        return _delete_file(item.key)
+
+
+def collect_garbage(
+    db: Session,
+    grace_seconds: Optional[int] = None,
+    batch_size: int = 500,
+    max_deletes_per_second: Optional[float] = None,
+    dry_run: bool = False,
+    directories: Iterable[str] = GC_DIRECTORIES
+) -> Dict[str, int]:
+    """
+    Delete stored files that no live contract references
+
+    Storage is listed lazily and checked against the database batch_size
+    files at a time, so memory stays flat whatever the number of files.
+    Files younger than the grace period are kept: they may belong to a
+    request still in progress (an upload whose contract is not committed
+    yet). Orphaned blob rows are removed along with their file, under
+    crud.blob_lock and after checking the row again, so an identical
+    upload arriving after the batch was checked keeps its file.
+
+    Args:
+        db: Database session
+        grace_seconds: Minimum age of a file before it can be deleted
+        batch_size: Files checked per database round trip
+        max_deletes_per_second: Throttle for deletes, None for no limit
+        dry_run: Only report what would be deleted
+        directories: Storage directories to scan
+
+    Returns:
+        dict: Files scanned, kept (referenced or recent), deleted and failed, and bytes reclaimed
+    """
+    if grace_seconds is None:
+        grace_seconds = settings.STORAGE_GC_GRACE_SECONDS
+    if max_deletes_per_second is None:
+        max_deletes_per_second = settings.STORAGE_GC_MAX_DELETES_PER_SECOND
+    delay = 1.0 / max_deletes_per_second if max_deletes_per_second else 0
+    now = time.time()
+    cutoff = datetime.utcfromtimestamp(now - grace_seconds)
+
+    stats = {'scanned': 0, 'referenced': 0, 'recent': 0, 'deleted': 0, 'failed': 0, 'bytes_reclaimed': 0}
+    for directory in directories:
+        for batch in _batches(storage.iter_files(directory), batch_size):
+            stats['scanned'] += len(batch)
+            old = [item for item in batch if item.modified <= now - grace_seconds]
+            stats['recent'] += len(batch) - len(old)
+            if not old:
+                continue
+
+            paths = [item.key for item in old]
+            keep = referenced_paths(db, paths)
+            stats['referenced'] += len(keep)
+            recent = recently_used_blobs(db, paths, cutoff) - keep
+            stats['recent'] += len(recent)
+            orphans = [item for item in old if item.key not in keep and item.key not in recent]
+            if dry_run:
+                stats['deleted'] += len(orphans)
+                stats['bytes_reclaimed'] += sum(item.size for item in orphans)
+                db.rollback()
+                continue
+
+            db.commit()
+            for item in orphans:
+                deleted = _delete_orphan(db, item, cutoff)
+                if deleted is None:
+                    stats['recent'] += 1
+                elif deleted:
+                    stats['deleted'] += 1
+                    stats['bytes_reclaimed'] += item.size
+                else:
+                    stats['failed'] += 1
+                if delay:
+                    time.sleep(delay)
+
+    log_business_event(
+        logger,
+        "storage_gc",
+        f"{'Would delete' if dry_run else 'Deleted'} {stats['deleted']} orphaned files "
+        f"({stats['bytes_reclaimed']} bytes) out of {stats['scanned']} scanned",
+        dry_run=dry_run,
+        **stats
+    )
+    return stats
+
+
+def _collect_garbage_once() -> Dict[str, int]:
+    db = SessionLocal()
+    try:
+        return collect_garbage(db)
+    finally:
+        db.close()
+
+
+async def run_periodic_gc(interval_seconds: float) -> None:
+    """Run collect_garbage every interval_seconds until cancelled"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, _collect_garbage_once)
+        except Exception as e:
+            logger.error(f"Storage garbage collection failed: {str(e)}")
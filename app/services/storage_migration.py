@@ -0,0 +1,189 @@
+"""
+Move stored files into the sharded, content-addressed layout
+"""
+
+import logging
+import os
+import shutil
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from .. import crud, models
+from .file_service import (
+    UPLOADS_DIR, CONTRACTS_DIR, blob_path, blob_hash_from_path, compute_file_sha256,
+    delete_file_if_exists, sniff_content_type
+)
+
+logger = logging.getLogger(__name__)
+
+# Contract columns holding file paths: (path column, hash column, directory)
+FILE_COLUMNS = [
+    ('design_image_path', None, UPLOADS_DIR),
+    ('signature_image_path', None, UPLOADS_DIR),
+    ('unsigned_pdf_path', 'unsigned_pdf_sha256', CONTRACTS_DIR),
+    ('signed_pdf_path', 'signed_pdf_sha256', CONTRACTS_DIR),
+]
+
+
+def _place(source: str, target: str) -> None:
+    # Hard link so the old path keeps working until the DB points at the new one
+    if os.path.exists(target):
+        return
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def _file_type(path: str) -> Tuple[str, str]:
+    with open(path, "rb") as f:
+        content_type, extension = sniff_content_type(f.read(16))
+    if extension == "bin":
+        extension = os.path.splitext(path)[1].lstrip(".").lower() or "bin"
+    return content_type, extension
+
+
+def _still_referenced(db: Session, path: str) -> bool:
+    columns = [getattr(models.DBContract, column) for column, _, _ in FILE_COLUMNS]
+    return db.query(models.DBContract.id).filter(or_(*(column == path for column in columns))).first() is not None
+
+
+def migrate_contract_files(db: Session, db_contract: models.DBContract, stats: Dict[str, int],
+                           dry_run: bool = False) -> List[str]:
+    """
+    Point one contract's files at their sharded blob paths
+
+    Legacy files (uuid or id based names) are hashed and become blobs with
+    one reference. Blobs stored before sharding keep their reference count
+    and only change path. Each column is only updated if it still holds the
+    path read at the start of the batch, so files the API replaced in the
+    meantime are not overwritten (they are counted as changed). Every file
+    is placed, swapped and committed under crud.blob_lock, like the API's
+    own writes to the blob.
+
+    Returns:
+        list: Old paths that can be removed now that the changes are committed
+    """
+    old_paths = []
+    for column, hash_column, directory in FILE_COLUMNS:
+        path = getattr(db_contract, column)
+        if not path:
+            continue
+
+        sha256 = blob_hash_from_path(path)
+        if sha256 is not None and path == blob_path(directory, sha256, os.path.splitext(path)[1].lstrip(".")):
+            stats['already_sharded'] += 1
+            continue
+        if not os.path.exists(path):
+            logger.warning(f"Contract {db_contract.id}: {column} {path} not found, left as is")
+            stats['missing'] += 1
+            continue
+
+        content_type, extension = _file_type(path)
+        legacy = sha256 is None
+        if legacy:
+            sha256 = compute_file_sha256(path)
+        target = blob_path(directory, sha256, extension)
+        size = os.path.getsize(path)
+        if dry_run:
+            stats['moved'] += 1
+            stats['bytes'] += size
+            continue
+
+        # Bajo el mismo lock que la API: una liberación o el GC no pueden borrar
+        # el destino entre colocarlo y apuntar el contrato (y su blob) a él
+        with crud.blob_lock(db, sha256):
+            _place(path, target)
+            values = {column: target}
+            if hash_column and not getattr(db_contract, hash_column):
+                values[hash_column] = sha256
+            # Compare-and-set: si la API cambió el archivo (p. ej. una nueva firma) no se pisa
+            updated = (
+                db.query(models.DBContract)
+                .filter(models.DBContract.id == db_contract.id, getattr(models.DBContract, column) == path)
+                .update(values, synchronize_session=False)
+            )
+            if not updated:
+                logger.info(f"Contract {db_contract.id}: {column} changed during the migration, left as is")
+                stats['changed'] += 1
+                continue
+            stats['moved'] += 1
+            stats['bytes'] += size
+
+            db_blob = db.query(models.DBBlob).filter(models.DBBlob.sha256 == sha256).with_for_update().first()
+            if db_blob is None:
+                db_blob = models.DBBlob(sha256=sha256, path=target, size=os.path.getsize(target),
+                                        content_type=content_type, ref_count=0)
+                db.add(db_blob)
+            if legacy:
+                db_blob.ref_count += 1
+            db_blob.path = target
+            db_blob.updated_at = datetime.utcnow()
+
+        if path != target:
+            old_paths.append(path)
+    return old_paths
+
+
+def migrate_storage_layout(db: Session, batch_size: int = 100, sleep_seconds: float = 0.5,
+                           dry_run: bool = False, limit: Optional[int] = None) -> Dict[str, int]:
+    """
+    Migrate every live contract's files to the sharded layout, in batches
+
+    Safe to run while the API is serving: files are linked into place and
+    paths are swapped with a compare-and-set update under the blob lock,
+    and only after that are the old paths removed. Re-running it
+    skips what was already migrated.
+
+    Args:
+        db: Database session
+        batch_size: Contracts per transaction
+        sleep_seconds: Pause between batches to limit I/O and lock pressure
+        dry_run: Only count what would be moved
+        limit: Stop after this many contracts
+
+    Returns:
+        dict: Counts of contracts, moved, already_sharded, missing and changed files, and bytes moved
+    """
+    stats = {'contracts': 0, 'moved': 0, 'already_sharded': 0, 'missing': 0, 'changed': 0, 'bytes': 0}
+    last_id = 0
+    while limit is None or stats['contracts'] < limit:
+        size = batch_size if limit is None else min(batch_size, limit - stats['contracts'])
+        batch = (
+            db.query(models.DBContract)
+            .filter(models.DBContract.deleted_at.is_(None), models.DBContract.id > last_id)
+            .order_by(models.DBContract.id)
+            .limit(size)
+            .all()
+        )
+        if not batch:
+            break
+
+        old_paths = []
+        try:
+            for db_contract in batch:
+                old_paths.extend(migrate_contract_files(db, db_contract, stats, dry_run=dry_run))
+            if dry_run:
+                db.rollback()
+            else:
+                db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        for path in old_paths:
+            if not _still_referenced(db, path):
+                delete_file_if_exists(path)
+
+        stats['contracts'] += len(batch)
+        last_id = batch[-1].id
+        logger.info(f"Storage migration: {stats['contracts']} contracts processed, {stats['moved']} files moved")
+        if sleep_seconds:
+            time.sleep(sleep_seconds)
+
+    return stats
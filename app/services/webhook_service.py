@@ -0,0 +1,197 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy.orm import Session
+
+from .. import crud
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = "X-Webhook-Signature"
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+def sign_payload(secret: str, timestamp: int, body: bytes) -> str:
+    """
+    Compute the signature header value for a webhook request
+
+    The receiver recomputes HMAC-SHA256(secret, "<timestamp>.<body>") and
+    compares it with the v1 value; the timestamp lets it reject replays.
+    """
+    signed = f"{timestamp}.".encode() + body
+    digest = hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def contract_event_data(db_contract) -> dict:
+    """Contract fields included in webhook events"""
+    return {
+        'id': db_contract.id,
+        'client_name': db_contract.client_name,
+        'client_email': db_contract.client_email,
+        'titulo_diseno': db_contract.titulo_diseno,
+        'puesto_empresa': db_contract.puesto_empresa,
+        'created_at': db_contract.created_at.isoformat() if db_contract.created_at else None,
+        'signed_at': db_contract.signed_at.isoformat() if db_contract.signed_at else None,
+        'deleted_at': db_contract.deleted_at.isoformat() if db_contract.deleted_at else None,
+    }
+
+
+class WebhookDispatcher:
+    """
+    Deliver contract events to subscribed endpoints
+
+    Events are queued per subscription and sent together once
+    WEBHOOK_BATCH_WINDOW_SECONDS have elapsed (or WEBHOOK_BATCH_MAX_EVENTS
+    are waiting), through a single shared keep-alive httpx.AsyncClient.
+    Each request body is {"events": [...]} signed with the subscription
+    secret, and is retried with exponential backoff on network errors and
+    retryable status codes.
+    """
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.transport = transport
+        self.batch_window_seconds = settings.WEBHOOK_BATCH_WINDOW_SECONDS
+        self.batch_max_events = settings.WEBHOOK_BATCH_MAX_EVENTS
+        self.max_retries = settings.WEBHOOK_MAX_RETRIES
+        self.retry_backoff_seconds = settings.WEBHOOK_RETRY_BACKOFF_SECONDS
+        self._client: Optional[httpx.AsyncClient] = None
+        self._pending: Dict[int, dict] = {}
+        self._tasks: set = set()
+
+    def get_client(self) -> httpx.AsyncClient:
+        """Return the shared HTTP client, creating it on first use"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                transport=self.transport,
+                timeout=settings.WEBHOOK_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=settings.WEBHOOK_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.WEBHOOK_MAX_CONNECTIONS
+                ),
+                headers={'User-Agent': 'delarueda-contracts-webhooks/1.0'}
+            )
+        return self._client
+
+    async def publish(self, db: Session, event_type: str, data: dict) -> int:
+        """
+        Queue an event for every active subscription listening to it
+
+        Errors are logged and never propagated, so publishing can't break
+        the request that triggered the event.
+
+        Returns:
+            int: Number of subscriptions the event was queued for
+        """
+        try:
+            subscriptions = crud.get_active_webhook_subscriptions(db, event_type)
+        except Exception as e:
+            logger.error(f"Failed to load webhook subscriptions for {event_type}: {str(e)}")
+            return 0
+
+        if not subscriptions:
+            return 0
+
+        event = {
+            'id': uuid.uuid4().hex,
+            'type': event_type,
+            'created_at': datetime.utcnow().isoformat(),
+            'data': data,
+        }
+        for subscription in subscriptions:
+            await self.enqueue(subscription.id, subscription.url, subscription.secret, event)
+        return len(subscriptions)
+
+    async def enqueue(self, subscription_id: int, url: str, secret: str, event: dict) -> None:
+        """Add an event to the batch of a subscription"""
+        batch = self._pending.get(subscription_id)
+        if batch is None:
+            batch = {'url': url, 'secret': secret, 'events': [], 'timer': None}
+            self._pending[subscription_id] = batch
+        batch['events'].append(event)
+
+        if len(batch['events']) >= self.batch_max_events:
+            self._start_task(self.flush(subscription_id))
+        elif batch['timer'] is None:
+            batch['timer'] = self._start_task(self._flush_after_window(subscription_id))
+
+    def _start_task(self, coro) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _flush_after_window(self, subscription_id: int) -> None:
+        await asyncio.sleep(self.batch_window_seconds)
+        await self.flush(subscription_id)
+
+    async def flush(self, subscription_id: int) -> bool:
+        """Send the pending batch of a subscription now"""
+        batch = self._pending.pop(subscription_id, None)
+        if not batch or not batch['events']:
+            return True
+        timer = batch['timer']
+        if timer is not None and timer is not asyncio.current_task():
+            timer.cancel()
+        return await self.deliver(batch['url'], batch['secret'], batch['events'])
+
+    async def flush_all(self) -> None:
+        """Send every pending batch, e.g. on shutdown"""
+        await asyncio.gather(*(self.flush(subscription_id) for subscription_id in list(self._pending)))
+
+    async def deliver(self, url: str, secret: str, events: List[dict]) -> bool:
+        """
+        POST a batch of events to an endpoint, retrying transient failures
+
+        Returns:
+            bool: True if the endpoint accepted the batch with a 2xx response
+        """
+        body = json.dumps({'events': events}, separators=(',', ':')).encode()
+        client = self.get_client()
+
+        for attempt in range(self.max_retries + 1):
+            headers = {
+                'Content-Type': 'application/json',
+                SIGNATURE_HEADER: sign_payload(secret, int(time.time()), body),
+            }
+            try:
+                response = await client.post(url, content=body, headers=headers)
+                if response.is_success:
+                    logger.info(f"Delivered {len(events)} webhook events to {url}")
+                    return True
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    logger.error(f"Webhook endpoint {url} rejected {len(events)} events: HTTP {response.status_code}")
+                    return False
+                error = f"HTTP {response.status_code}"
+            except httpx.HTTPError as e:
+                error = str(e) or type(e).__name__
+
+            if attempt < self.max_retries:
+                delay = self.retry_backoff_seconds * (2 ** attempt)
+                logger.warning(f"Webhook delivery to {url} failed ({error}), retrying in {delay}s")
+                await asyncio.sleep(delay)
+
+        logger.error(f"Giving up delivering {len(events)} webhook events to {url}: {error}")
+        return False
+
+    async def close(self) -> None:
+        """Flush pending batches and close the shared HTTP client"""
+        await self.flush_all()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Global webhook dispatcher instance
+webhook_dispatcher = WebhookDispatcher()
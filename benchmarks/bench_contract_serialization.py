@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark de serialización de la lista de contratos
+
+Compara, por tamaño de página, el camino anterior de GET /contracts/
+(validar objetos ORM en schemas.PaginatedContracts, volver a validarlos
+con response_model y serializar con json) frente al actual (tuplas de
+fila a dict y orjson).
+
+Uso:
+    python benchmarks/bench_contract_serialization.py [--iterations 500]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), '..')))
+
+import orjson  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from app import schemas  # noqa: E402
+
+FIELDS = list(schemas.Contract.model_fields)
+ContractRow = namedtuple('ContractRow', FIELDS)
+POLICY = "He leído y acepto el diseño dispuesto, así como el texto anterior. " * 12
+
+
+def sample_values(i):
+    return {
+        'id': i,
+        'client_name': f'Cliente {i}',
+        'client_email': f'cliente{i}@example.com',
+        'design_image_path': f'storage/uploads/{i:08d}.png',
+        'titulo_diseno': f'Diseño {i}',
+        'puesto_empresa': 'Gerente / Empresa S.L.',
+        'politica_confirmacion': POLICY,
+        'unsigned_pdf_path': f'storage/contracts/{i}_unsigned.pdf',
+        'signed_pdf_path': f'storage/contracts/{i}_signed.pdf' if i % 2 else None,
+        'signer_ip': '203.0.113.7' if i % 2 else None,
+        'signer_user_agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X)' if i % 2 else None,
+        'created_at': datetime.utcnow(),
+    }
+
+
+PAGINATION = {'total': 1000, 'page': 1, 'page_size': 0, 'total_pages': 10, 'has_next': True, 'has_prev': False}
+paginated_adapter = TypeAdapter(schemas.PaginatedContracts)
+
+
+def previous_path(orm_objects):
+    # crud objects -> PaginatedContracts -> response_model validation -> JSON
+    model = schemas.PaginatedContracts(items=orm_objects, pagination=PAGINATION)
+    validated = paginated_adapter.validate_python(model.model_dump())
+    content = paginated_adapter.dump_python(validated, mode='json')
+    return json.dumps(content, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def current_path(rows):
+    return orjson.dumps({'items': [row._asdict() for row in rows], 'pagination': PAGINATION})
+
+
+def measure(func, data, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func(data)
+        samples.append((time.perf_counter() - start) * 1_000_000)
+    return statistics.mean(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'page size':>9} {'previous µs':>12} {'current µs':>11} {'speedup':>8}")
+    for page_size in (10, 25, 50, 100):
+        values = [sample_values(i) for i in range(page_size)]
+        orm_objects = [SimpleNamespace(**v) for v in values]
+        rows = [ContractRow(**{field: v[field] for field in FIELDS}) for v in values]
+
+        previous = measure(previous_path, orm_objects, args.iterations)
+        current = measure(current_path, rows, args.iterations)
+        print(f"{page_size:9d} {previous:12.1f} {current:11.1f} {previous / current:7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
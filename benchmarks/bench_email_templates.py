@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark de renderizado de las plantillas de email
+
+Mide el tiempo de la primera carga (compilación o bytecode cache) y el
+tiempo medio / p95 por render de cada plantilla.
+
+Uso:
+    python benchmarks/bench_email_templates.py [--iterations 2000]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.email_service import jinja_env  # noqa: E402
+
+SAMPLE_CONTEXT = {
+    'client_name': 'Cliente & Asociados <Test>',
+    'client_email': 'cliente@example.com',
+    'contract_id': 1234,
+    'titulo_diseno': 'Camisetas evento 2025',
+    'signing_url': 'https://sign.example.com/sign/1234',
+    'events': [
+        {
+            'action': 'contract_signed' if i % 2 else 'invitation_sent',
+            'client_name': f'Cliente {i}',
+            'client_email': f'cliente{i}@example.com',
+            'contract_id': i,
+            'titulo_diseno': f'Diseño {i}',
+            'occurred_at': datetime.utcnow(),
+        }
+        for i in range(50)
+    ],
+    'invitation_count': 25,
+    'signed_count': 25,
+    'window_start': '01/01/2025 10:00',
+    'window_end': '01/01/2025 10:15',
+}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'template':32} {'load ms':>9} {'mean µs':>9} {'p95 µs':>9} {'renders/s':>10}")
+    for template_name in jinja_env.list_templates():
+        start = time.perf_counter()
+        template = jinja_env.get_template(template_name)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        samples = []
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            template.render(**SAMPLE_CONTEXT)
+            samples.append((time.perf_counter() - start) * 1_000_000)
+
+        mean_us = statistics.mean(samples)
+        print(
+            f"{template_name:32} {load_ms:9.2f} {mean_us:9.1f} "
+            f"{percentile(samples, 95):9.1f} {1_000_000 / mean_us:10.0f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark de envío de emails contra un servidor SMTP local en proceso
+
+Arranca tests.smtp_server.LocalSMTPServer, apunta la configuración SMTP a
+él y mide mensajes por segundo y percentiles de latencia de
+send_contract_invitation y send_contract_signed_confirmation, con y sin
+PDF adjunto. Permite inyectar latencia y fallos en el servidor.
+
+Uso:
+    python benchmarks/bench_email_throughput.py [--calls 200] [--concurrency 10]
+        [--latency 0.05] [--failure-rate 0.1] [--attachment-kb 500]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.email_service import EmailService  # noqa: E402
+from tests.smtp_server import LocalSMTPServer, local_smtp_settings  # noqa: E402
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_scenario(name, make_call, calls, concurrency, latency, failure_rate):
+    async with LocalSMTPServer(latency=latency, failure_rate=failure_rate, seed=42) as server:
+        with local_smtp_settings(server):
+            service = EmailService()
+            semaphore = asyncio.Semaphore(concurrency)
+            latencies = []
+            failures = 0
+
+            async def one(i):
+                nonlocal failures
+                async with semaphore:
+                    start = time.perf_counter()
+                    success = await make_call(service, i)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    if not success:
+                        failures += 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(calls)))
+            elapsed = time.perf_counter() - start
+
+        print(
+            f"{name:28} {calls / elapsed:9.1f} {len(server.messages) / elapsed:9.1f} "
+            f"{statistics.median(latencies):8.1f} {percentile(latencies, 95):8.1f} "
+            f"{percentile(latencies, 99):8.1f} {failures:6d} {server.connections:6d}"
+        )
+
+
+async def main(args):
+    pdf_file = tempfile.NamedTemporaryFile(suffix='.pdf', delete=False)
+    pdf_file.write(b"%PDF-1.4\n" + os.urandom(args.attachment_kb * 1024))
+    pdf_file.close()
+
+    scenarios = [
+        ("invitation", lambda service, i: service.send_contract_invitation(
+            to_email=f"client{i}@example.com", client_name=f"Cliente {i}", contract_id=i)),
+        ("signed (no attachment)", lambda service, i: service.send_contract_signed_confirmation(
+            to_email=f"client{i}@example.com", client_name=f"Cliente {i}", contract_id=i)),
+        (f"signed ({args.attachment_kb} KB PDF)", lambda service, i: service.send_contract_signed_confirmation(
+            to_email=f"client{i}@example.com", client_name=f"Cliente {i}", contract_id=i,
+            signed_pdf_path=pdf_file.name)),
+    ]
+
+    print(
+        f"calls={args.calls} concurrency={args.concurrency} "
+        f"latency={args.latency}s failure_rate={args.failure_rate}"
+    )
+    print(f"{'scenario':28} {'calls/s':>9} {'msgs/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'failed':>6} {'conns':>6}")
+    try:
+        for name, make_call in scenarios:
+            await run_scenario(name, make_call, args.calls, args.concurrency, args.latency, args.failure_rate)
+    finally:
+        os.unlink(pdf_file.name)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.0, help="Injected server latency per message (s)")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Fraction of messages rejected with 451")
+    parser.add_argument('--attachment-kb', type=int, default=500)
+    parser.add_argument('--verbose', action='store_true', help="Keep the email service logs")
+    args = parser.parse_args()
+    if not args.verbose:
+        logging.disable(logging.ERROR)
+    asyncio.run(main(args))
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Elimina de storage/ los archivos que ya no referencia ningún contrato
+
+Recorre el almacenamiento por lotes, comprueba cada lote contra la base de
+datos y borra los archivos huérfanos más antiguos que el periodo de gracia.
+Se puede ejecutar con la API en marcha.
+
+Uso:
+    python gc_storage.py --dry-run
+    python gc_storage.py --grace-hours 48 --rate 20
+"""
+import argparse
+import logging
+import sys
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.services.storage_gc import collect_garbage
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Eliminar archivos huérfanos de storage/")
+    parser.add_argument('--grace-hours', type=float, default=settings.STORAGE_GC_GRACE_SECONDS / 3600,
+                        help='No borrar archivos más recientes que esto')
+    parser.add_argument('--batch-size', type=int, default=500, help='Archivos comprobados por consulta')
+    parser.add_argument('--rate', type=float, default=settings.STORAGE_GC_MAX_DELETES_PER_SECOND,
+                        help='Máximo de borrados por segundo (0 sin límite)')
+    parser.add_argument('--dry-run', action='store_true', help='Solo contar, sin borrar nada')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    db: Session = SessionLocal()
+    try:
+        stats = collect_garbage(
+            db,
+            grace_seconds=int(args.grace_hours * 3600),
+            batch_size=args.batch_size,
+            max_deletes_per_second=args.rate,
+            dry_run=args.dry_run
+        )
+    except Exception as e:
+        print(f"❌ Error durante la limpieza: {str(e)}")
+        return False
+    finally:
+        db.close()
+
+    action = "Se borrarían" if args.dry_run else "Borrados"
+    print(f"✅ Archivos revisados: {stats['scanned']}")
+    print(f"   - {action}: {stats['deleted']} archivos ({stats['bytes_reclaimed'] / (1024 * 1024):.1f} MB)")
+    print(f"   - En uso: {stats['referenced']}")
+    print(f"   - Recientes (periodo de gracia): {stats['recent']}")
+    if stats['failed']:
+        print(f"   - Errores al borrar: {stats['failed']}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
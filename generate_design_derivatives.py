@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Genera la miniatura y la vista previa del diseño de los contratos que no las tienen
+
+Los contratos nuevos las generan al crearse; esto rellena los anteriores
+(o todos, con --regenerate, tras cambiar tamaños o formato). Se puede
+ejecutar con la API en marcha.
+
+Uso:
+    python generate_design_derivatives.py --dry-run
+    python generate_design_derivatives.py --limit 500
+    python generate_design_derivatives.py --regenerate
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from sqlalchemy.orm import Session
+from app import models
+from app.config import settings
+from app.database import SessionLocal
+from app.services.design_derivatives import attach_design_derivatives, derivative_pool
+
+
+def pending_contract_ids(db: Session, regenerate: bool, limit: int):
+    query = db.query(models.DBContract.id).filter(
+        models.DBContract.deleted_at.is_(None),
+        models.DBContract.design_image_path.isnot(None)
+    )
+    if not regenerate:
+        query = query.filter(models.DBContract.design_thumbnail_path.is_(None))
+    query = query.order_by(models.DBContract.id)
+    if limit:
+        query = query.limit(limit)
+    return [row[0] for row in query.all()]
+
+
+async def generate(contract_ids, concurrency: int):
+    generated = 0
+    for start in range(0, len(contract_ids), concurrency):
+        batch = contract_ids[start:start + concurrency]
+        results = await asyncio.gather(*(attach_design_derivatives(contract_id) for contract_id in batch))
+        generated += sum(1 for result in results if result)
+        print(f"   {start + len(batch)}/{len(contract_ids)}")
+    return generated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generar miniaturas y vistas previas de los diseños")
+    parser.add_argument('--limit', type=int, default=0, help='Máximo de contratos a procesar (0 sin límite)')
+    parser.add_argument('--regenerate', action='store_true', help='Incluir contratos que ya las tienen')
+    parser.add_argument('--dry-run', action='store_true', help='Solo contar, sin generar nada')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(message)s")
+
+    db: Session = SessionLocal()
+    try:
+        contract_ids = pending_contract_ids(db, args.regenerate, args.limit)
+    finally:
+        db.close()
+
+    if args.dry_run:
+        print(f"✅ Contratos pendientes: {len(contract_ids)}")
+        return True
+
+    try:
+        generated = asyncio.run(generate(contract_ids, settings.DESIGN_DERIVATIVE_WORKERS))
+    except Exception as e:
+        print(f"❌ Error generando las miniaturas: {str(e)}")
+        return False
+    finally:
+        derivative_pool.shutdown()
+
+    print(f"✅ Generadas: {generated} de {len(contract_ids)} contratos")
+    if generated < len(contract_ids):
+        print(f"   - Sin generar: {len(contract_ids) - generated} (ver los errores del log)")
+    return generated == len(contract_ids)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
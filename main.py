@@ -1,10 +1,20 @@
+import asyncio
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
-from app.routers import auth, contracts, default_texts
-from app.services.file_service import ensure_directories
+from app.routers import admin, auth, contracts, default_texts, webhooks
+from app.services.file_service import ensure_directories, storage
+from app.services.download_service import redirect_to_remote_storage
+from app.services.email_service import email_service, warm_up_templates
+from app.services.webhook_service import webhook_dispatcher
+from app.services.default_text_cache import default_text_cache
+from app.services.render_pool import render_pool
+from app.services.design_derivatives import derivative_pool
+from app.services.storage_gc import run_periodic_gc
 from app.logger import get_logger
+from app.http_cache import CachedStaticFiles
+from app.middleware import CompressionMiddleware, RequestSizeLimitMiddleware
 
 # Initialize logging
 logger = get_logger(__name__)
@@ -13,7 +23,8 @@ logger = get_logger(__name__)
 app = FastAPI(
     title="Contract Signing Service",
     description="API for managing contract signatures with PDF generation",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware - dynamic configuration based on environment
@@ -62,6 +73,10 @@ def get_cors_origins():
 cors_origins = get_cors_origins()
 logger.info(f"CORS origins configured: {cors_origins}")
 
+# Refuse oversized uploads before reading them
+# (added before CORS so CORS stays the outer layer and its headers reach the 413s too)
+app.add_middleware(RequestSizeLimitMiddleware, max_body_bytes=settings.REQUEST_MAX_BODY_BYTES)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=cors_origins,
@@ -70,17 +85,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress JSON/HTML responses; PDFs and images are skipped
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+        encodings=[e.strip() for e in settings.COMPRESSION_ENCODINGS.split(",") if e.strip()],
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+        zstd_level=settings.COMPRESSION_ZSTD_LEVEL,
+    )
+
 # Ensure storage directories exist
 ensure_directories()
 logger.info("Storage directories initialized")
 
-# Mount static files
-app.mount("/storage", StaticFiles(directory="storage"), name="storage")
+# Mount static files (ETag/304, Range and Cache-Control handled by CachedStaticFiles)
+# (with FILE_SERVING_MODE other than "direct" the front proxy should serve /storage itself)
+if storage.is_local:
+    app.mount("/storage", CachedStaticFiles(directory=settings.STORAGE_ROOT), name="storage")
+else:
+    # Files live in the bucket: /storage URLs redirect to presigned URLs
+    app.add_api_route("/storage/{path:path}", redirect_to_remote_storage, methods=["GET", "HEAD"],
+                      include_in_schema=False)
 
 # Include routers
 app.include_router(auth.router)
 app.include_router(contracts.router)
 app.include_router(default_texts.router)
+app.include_router(webhooks.router)
+app.include_router(admin.router)
 logger.info("Application routers configured")
 
 # Health check endpoint
@@ -113,7 +147,23 @@ def debug_cors():
 async def startup_event():
     logger.info(f"Application starting in {settings.ENVIRONMENT} environment")
     logger.info(f"CORS origins: {settings.ALLOWED_ORIGINS}")
+    warm_up_templates()
+    default_text_cache.start_listener()
+    if settings.STORAGE_GC_INTERVAL_SECONDS > 0:
+        app.state.storage_gc_task = asyncio.get_running_loop().create_task(
+            run_periodic_gc(settings.STORAGE_GC_INTERVAL_SECONDS)
+        )
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    logger.info("Application shutting down")
\ No newline at end of file
+    logger.info("Application shutting down")
+    # Send any admin events still waiting for the digest window
+    await email_service.flush_admin_digest(final=True)
+    # Deliver queued webhook events and close the shared HTTP client
+    await webhook_dispatcher.close()
+    default_text_cache.stop_listener()
+    render_pool.shutdown()
+    derivative_pool.shutdown()
+    storage_gc_task = getattr(app.state, "storage_gc_task", None)
+    if storage_gc_task is not None:
+        storage_gc_task.cancel()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Migra los archivos de storage/ a la estructura fragmentada por hash
+
+Se puede ejecutar con la API en marcha: procesa los contratos por lotes,
+enlaza cada archivo en su nueva ruta, actualiza la base de datos y solo
+entonces elimina la ruta antigua. Volver a ejecutarlo es seguro.
+
+Uso:
+    python migrate_storage.py --dry-run
+    python migrate_storage.py --batch-size 200 --sleep 1
+"""
+import argparse
+import logging
+import sys
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.services.storage_migration import migrate_storage_layout
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrar storage/ a la estructura fragmentada por hash")
+    parser.add_argument('--batch-size', type=int, default=100, help='Contratos por transacción')
+    parser.add_argument('--sleep', type=float, default=0.5, help='Pausa en segundos entre lotes')
+    parser.add_argument('--limit', type=int, help='Procesar como máximo este número de contratos')
+    parser.add_argument('--dry-run', action='store_true', help='Solo contar, sin mover nada')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    db: Session = SessionLocal()
+    try:
+        stats = migrate_storage_layout(
+            db,
+            batch_size=args.batch_size,
+            sleep_seconds=args.sleep,
+            dry_run=args.dry_run,
+            limit=args.limit
+        )
+    except Exception as e:
+        print(f"❌ Error durante la migración: {str(e)}")
+        return False
+    finally:
+        db.close()
+
+    action = "Se moverían" if args.dry_run else "Movidos"
+    print(f"✅ Contratos procesados: {stats['contracts']}")
+    print(f"   - {action}: {stats['moved']} archivos ({stats['bytes'] / (1024 * 1024):.1f} MB)")
+    print(f"   - Ya migrados: {stats['already_sharded']}")
+    print(f"   - No encontrados: {stats['missing']}")
+    print(f"   - Cambiados por la API durante la migración: {stats['changed']}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Perfil de memoria de la creación y la firma de contratos
+
+Ejecuta create_contract y sign_contract de principio a fin con TestClient
+y tracemalloc activo, y muestra el pico y la memoria retenida de cada
+petición agrupados por módulo (Pillow, reportlab, email/MIME, SQLAlchemy...).
+Trabaja sobre una base de datos y un storage/ temporales; los correos se
+construyen completos pero no se envían.
+
+Uso:
+    python profile_memory.py
+    python profile_memory.py --iterations 10 --width 6000 --height 4000
+    python profile_memory.py --design diseno.jpg --top 20
+"""
+import argparse
+import json
+import logging
+import mimetypes
+import os
+import shutil
+import sys
+import tempfile
+from unittest import mock
+
+LOGO_PATH = "storage/logo.png"
+
+
+def make_image(path: str, size, image_format: str) -> None:
+    """Imagen sintética con detalle suficiente para no comprimirse a nada"""
+    from PIL import Image
+    red = Image.linear_gradient('L').resize(size)
+    green = Image.radial_gradient('L').resize(size)
+    blue = Image.effect_mandelbrot(size, (-2, -1.2, 1, 1.2), 64)
+    Image.merge('RGB', (red, green, blue)).save(path, image_format)
+
+
+def print_modules(columns) -> None:
+    """Tabla módulo x columna con la media de cada columna (título, mediciones, atributo)"""
+    from app.memory import format_bytes
+    print(f"   {'módulo':<20}" + "".join(f"{title:>18}" for title, _, _ in columns))
+    for module in columns[0][1][0].retained_by_module:
+        values = []
+        for _, trackers, attribute in columns:
+            sizes = [getattr(tracker, attribute).get(module, {}).get('size', 0) for tracker in trackers]
+            values.append(format_bytes(sum(sizes) // len(sizes)))
+        print(f"   {module:<20}" + "".join(f"{value:>18}" for value in values))
+
+
+def profile(args, design_path: str, signature_path: str) -> bool:
+    # La app se importa aquí, una vez apuntada la configuración al entorno temporal
+    import aiosmtplib
+    import tracemalloc
+    from fastapi.testclient import TestClient
+    from app import auth
+    from app.database import Base, engine
+    from app.memory import (
+        AllocationTracker, allocations_by_module, format_bytes, subtract_allocations, take_snapshot, top_allocations
+    )
+    from main import app
+
+    if not args.verbose:
+        logging.disable(logging.INFO)
+    Base.metadata.create_all(bind=engine)
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {auth.create_access_token({'sub': 'memory-profiler'})}"}
+    with open(design_path, "rb") as f:
+        design = (os.path.basename(design_path), f.read(), mimetypes.guess_type(design_path)[0] or "image/png")
+    with open(signature_path, "rb") as f:
+        signature = ("firma.png", f.read(), "image/png")
+
+    def create_contract() -> int:
+        response = client.post(
+            "/contracts/",
+            headers=headers,
+            data={"client_data": json.dumps({"name": "Cliente Perfil", "email": "perfil@example.com"})},
+            files={"design_image": design}
+        )
+        response.raise_for_status()
+        return response.json()["id"]
+
+    def sign_contract(contract_id: int) -> None:
+        response = client.post(
+            f"/contracts/{contract_id}/sign",
+            data={"signed_by": "Cliente Perfil", "puesto_empresa": "Dirección"},
+            files={"signature_image": signature}
+        )
+        response.raise_for_status()
+
+    async def build_message(message, **kwargs):
+        # Lo mismo que aiosmtplib antes de enviar: serializar el mensaje MIME
+        message.as_bytes()
+        return {}, "OK"
+
+    trackers = {"create": [], "sign": []}
+    sampled = {"create": [], "sign": []}
+    with mock.patch.object(aiosmtplib, "send", build_message):
+        # Importaciones diferidas, plantillas y cachés se llenan antes de medir
+        for _ in range(args.warmup):
+            sign_contract(create_contract())
+
+        tracemalloc.start(args.frames)
+        try:
+            start = allocations_by_module(take_snapshot())
+            baseline = take_snapshot() if args.top else None
+            for iteration in range(1, args.iterations + 1):
+                with AllocationTracker() as create_tracker:
+                    contract_id = create_contract()
+                with AllocationTracker() as sign_tracker:
+                    sign_contract(contract_id)
+                trackers["create"].append(create_tracker)
+                trackers["sign"].append(sign_tracker)
+                print(f"   #{iteration}: crear pico {format_bytes(create_tracker.peak_bytes)} "
+                      f"(RSS +{format_bytes(create_tracker.peak_rss_growth_bytes)}), "
+                      f"firmar pico {format_bytes(sign_tracker.peak_bytes)} "
+                      f"(RSS +{format_bytes(sign_tracker.peak_rss_growth_bytes)})")
+
+            snapshot = take_snapshot()
+            retained = subtract_allocations(allocations_by_module(snapshot), start)
+            top = top_allocations(snapshot, baseline, args.top) if args.top else []
+            del snapshot, baseline
+
+            # El muestreo del pico altera el pico total: se hace en pasadas aparte
+            for _ in range(args.peak_runs):
+                with AllocationTracker(sample_peaks=True) as create_tracker:
+                    contract_id = create_contract()
+                with AllocationTracker(sample_peaks=True) as sign_tracker:
+                    sign_contract(contract_id)
+                sampled["create"].append(create_tracker)
+                sampled["sign"].append(sign_tracker)
+        finally:
+            tracemalloc.stop()
+
+    for phase, title in (("create", "POST /contracts/"), ("sign", "POST /contracts/{id}/sign")):
+        phase_trackers = trackers[phase]
+        peak = max(tracker.peak_bytes for tracker in phase_trackers)
+        peak_rss = max(tracker.peak_rss_growth_bytes or 0 for tracker in phase_trackers)
+        print(f"\n✅ {title}: pico máximo {format_bytes(peak)} en tracemalloc, RSS pico +{format_bytes(peak_rss)}")
+        columns = [("retenido medio", phase_trackers, "retained_by_module")]
+        if sampled[phase]:
+            columns.insert(0, ("pico (muestreo)", sampled[phase], "peak_by_module"))
+        print_modules(columns)
+
+    print(f"\n✅ Retenido tras {args.iterations} creaciones y firmas:")
+    for module, totals in sorted(retained.items(), key=lambda item: item[1]['size'], reverse=True):
+        print(f"   {module:<20}{format_bytes(totals['size']):>16}{totals['count']:>12} bloques")
+    if top:
+        print("\n   Líneas que más crecieron:")
+        for site in top:
+            print(f"   {format_bytes(site['size']):>10}  {site['location']}")
+    print("\n   Los píxeles que Pillow decodifica no pasan por tracemalloc: se ven en el RSS.")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfil de memoria de crear y firmar contratos")
+    parser.add_argument('--iterations', type=int, default=5, help='Contratos creados y firmados midiendo')
+    parser.add_argument('--warmup', type=int, default=1, help='Contratos de calentamiento sin medir')
+    parser.add_argument('--design', help='Imagen de diseño a subir (por defecto, una sintética)')
+    parser.add_argument('--width', type=int, default=4000, help='Ancho de la imagen sintética')
+    parser.add_argument('--height', type=int, default=3000, help='Alto de la imagen sintética')
+    parser.add_argument('--format', choices=['png', 'jpeg'], default='png', help='Formato de la imagen sintética')
+    parser.add_argument('--peak-runs', type=int, default=1,
+                        help='Pasadas extra muestreando qué módulos forman el pico (0 ninguna)')
+    parser.add_argument('--frames', type=int, default=10, help='Marcos de pila guardados por asignación')
+    parser.add_argument('--top', type=int, default=10, help='Líneas con más memoria retenida a mostrar (0 ninguna)')
+    parser.add_argument('--verbose', action='store_true', help='Mostrar los logs de la aplicación')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="profile_memory_")
+    design_path = os.path.abspath(args.design) if args.design else os.path.join(workdir, f"diseno.{args.format}")
+    logo_path = os.path.abspath(LOGO_PATH)
+
+    # Base de datos y almacenamiento propios: no se toca nada real
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'profile.db')}"
+    os.environ["STORAGE_BACKEND"] = "local"
+    from app.config import settings  # Lee .env desde el directorio actual
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        os.makedirs("storage", exist_ok=True)
+        if os.path.exists(logo_path):
+            shutil.copy(logo_path, LOGO_PATH)
+        if not args.design:
+            make_image(design_path, (args.width, args.height), args.format.upper())
+        signature_path = os.path.join(workdir, "firma.png")
+        make_image(signature_path, (600, 200), "PNG")
+
+        print(f"✅ Perfil de memoria ({settings.ENVIRONMENT}): {args.iterations} contratos, "
+              f"diseño {os.path.basename(design_path)} ({os.path.getsize(design_path) / (1024 * 1024):.1f} MB)")
+        return profile(args, design_path, signature_path)
+    except Exception as e:
+        print(f"❌ Error durante el perfil: {str(e)}")
+        return False
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Aplica la política de retención de contratos
+
+Elimina definitivamente los contratos borrados hace más de N días y,
+opcionalmente, da por caducados los contratos sin firmar con más de M
+días. Trabaja por lotes pequeños con pausas para no bloquear la tabla.
+Pensado para ejecutarse periódicamente (cron).
+
+Uso:
+    python purge_contracts.py --dry-run
+    python purge_contracts.py --deleted-days 90 --unsigned-days 180
+"""
+import argparse
+import logging
+import sys
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.services.retention import run_retention
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aplicar la retención de contratos")
+    parser.add_argument('--deleted-days', type=int, default=settings.RETENTION_DELETED_DAYS,
+                        help='Purgar contratos borrados hace más de estos días (0 desactiva)')
+    parser.add_argument('--unsigned-days', type=int, default=settings.RETENTION_UNSIGNED_DAYS,
+                        help='Caducar contratos sin firmar con más de estos días (0 desactiva)')
+    parser.add_argument('--batch-size', type=int, default=settings.RETENTION_BATCH_SIZE, help='Contratos por transacción')
+    parser.add_argument('--sleep', type=float, default=settings.RETENTION_BATCH_SLEEP_SECONDS,
+                        help='Pausa en segundos entre lotes')
+    parser.add_argument('--dry-run', action='store_true', help='Solo contar, sin borrar nada')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    db: Session = SessionLocal()
+    try:
+        stats = run_retention(
+            db,
+            deleted_retention_days=args.deleted_days,
+            unsigned_expiry_days=args.unsigned_days,
+            batch_size=args.batch_size,
+            sleep_seconds=args.sleep,
+            dry_run=args.dry_run
+        )
+    except Exception as e:
+        print(f"❌ Error aplicando la retención: {str(e)}")
+        return False
+    finally:
+        db.close()
+
+    prefix = "Se caducarían" if args.dry_run else "Caducados"
+    print(f"✅ {prefix}: {stats['expired']} contratos sin firmar")
+    prefix = "Se purgarían" if args.dry_run else "Purgados"
+    print(f"✅ {prefix}: {stats['purged']} contratos borrados")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,179 @@
+"""
+In-process SMTP stand-in for tests and benchmarks
+
+Implements just enough of RFC 5321 (EHLO/HELO, AUTH PLAIN/LOGIN, MAIL,
+RCPT, DATA, RSET, NOOP, QUIT) for aiosmtplib to deliver messages to it,
+with optional latency and failure injection. Received messages are kept
+in memory so tests can inspect them.
+"""
+
+import asyncio
+import base64
+import random
+from contextlib import contextmanager
+from email import message_from_bytes
+from typing import List, Optional
+
+from app.config import settings
+
+
+class ReceivedMessage:
+    """A message accepted by the local SMTP server"""
+
+    def __init__(self, mail_from: str, rcpt_tos: List[str], data: bytes):
+        self.mail_from = mail_from
+        self.rcpt_tos = rcpt_tos
+        self.data = data
+
+    @property
+    def message(self):
+        return message_from_bytes(self.data)
+
+
+class LocalSMTPServer:
+    """
+    Minimal asyncio SMTP server running in the caller's event loop
+
+    Args:
+        host: Interface to bind
+        port: Port to bind, 0 picks a free one
+        latency: Seconds to wait before answering each DATA command
+        failure_rate: Probability (0-1) of rejecting a message with a 451
+        seed: Seed for the failure injection RNG
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.messages: List[ReceivedMessage] = []
+        self.rejected = 0
+        self.connections = 0
+        self._random = random.Random(seed)
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> "LocalSMTPServer":
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "LocalSMTPServer":
+        return await self.start()
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+
+        async def reply(line: str) -> None:
+            writer.write(line.encode() + b"\r\n")
+            await writer.drain()
+
+        mail_from = None
+        rcpt_tos: List[str] = []
+        try:
+            await reply("220 localhost ESMTP test server")
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                line = raw.decode("utf-8", "replace").rstrip("\r\n")
+                command, _, argument = line.partition(" ")
+                command = command.upper()
+
+                if command == "EHLO":
+                    writer.write(b"250-localhost\r\n250-8BITMIME\r\n250-AUTH PLAIN LOGIN\r\n")
+                    await reply("250 SMTPUTF8")
+                elif command == "HELO":
+                    await reply("250 localhost")
+                elif command == "AUTH":
+                    mechanism, _, initial = argument.partition(" ")
+                    if mechanism.upper() == "LOGIN":
+                        await reply("334 " + base64.b64encode(b"Username:").decode())
+                        await reader.readline()
+                        await reply("334 " + base64.b64encode(b"Password:").decode())
+                        await reader.readline()
+                    elif not initial:
+                        await reply("334 ")
+                        await reader.readline()
+                    await reply("235 2.7.0 Authentication successful")
+                elif command == "MAIL":
+                    mail_from = argument.partition(":")[2].strip().split(" ")[0].strip("<>")
+                    rcpt_tos = []
+                    await reply("250 OK")
+                elif command == "RCPT":
+                    rcpt_tos.append(argument.partition(":")[2].strip().split(" ")[0].strip("<>"))
+                    await reply("250 OK")
+                elif command == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    lines = []
+                    while True:
+                        data_line = await reader.readline()
+                        if data_line in (b".\r\n", b".\n", b""):
+                            break
+                        if data_line.startswith(b".."):
+                            data_line = data_line[1:]
+                        lines.append(data_line)
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+                    if self.failure_rate and self._random.random() < self.failure_rate:
+                        self.rejected += 1
+                        await reply("451 4.3.0 Injected failure")
+                    else:
+                        self.messages.append(ReceivedMessage(mail_from, rcpt_tos, b"".join(lines)))
+                        await reply("250 OK: queued")
+                    mail_from, rcpt_tos = None, []
+                elif command == "RSET":
+                    mail_from, rcpt_tos = None, []
+                    await reply("250 OK")
+                elif command == "NOOP":
+                    await reply("250 OK")
+                elif command == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("502 Command not implemented")
+        except (ConnectionResetError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+@contextmanager
+def local_smtp_settings(server: LocalSMTPServer):
+    """
+    Point the SMTP settings at a LocalSMTPServer for the duration of the block
+
+    EmailService reads the settings in __init__, so create the service inside
+    the block.
+    """
+    overrides = {
+        'SMTP_SERVER': server.host,
+        'SMTP_PORT': server.port,
+        'SMTP_USE_SSL': False,
+        'SMTP_USE_TLS': False,
+        'ADMIN_NOTIFICATION_MODE': 'immediate',
+    }
+    original = {name: getattr(settings, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    try:
+        yield settings
+    finally:
+        for name, value in original.items():
+            setattr(settings, name, value)
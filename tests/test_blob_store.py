@@ -0,0 +1,174 @@
+import asyncio
+import io
+import os
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.datastructures import UploadFile
+
+from app import crud, models
+from app.database import Base
+from app.services.file_service import blob_hash_from_path, release_file, store_bytes, store_upload
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x01" * 500
+
+
+def make_session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'blobs.db'}")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)()
+
+
+def test_identical_uploads_share_one_blob(tmp_path):
+    db = make_session(tmp_path)
+    directory = tmp_path / "uploads"
+    directory.mkdir()
+
+    first = asyncio.run(store_upload(db, UploadFile(io.BytesIO(PNG), filename="a.png"), directory=str(directory)))
+    second = asyncio.run(store_upload(db, UploadFile(io.BytesIO(PNG), filename="b.png"), directory=str(directory)))
+
+    assert first.path == second.path
+    assert blob_hash_from_path(first.path) == first.sha256
+    assert [p.name for p in directory.rglob("*") if p.is_file()] == [os.path.basename(first.path)]
+    assert crud.get_blob(db, first.sha256).ref_count == 2
+
+    assert release_file(db, first.path) is False
+    assert os.path.exists(first.path)
+    assert release_file(db, second.path) is True
+    assert not os.path.exists(first.path)
+    assert crud.get_blob(db, first.sha256) is None
+    db.close()
+
+
+def test_identical_upload_waits_for_the_release_deleting_its_file(tmp_path, monkeypatch):
+    from app.services import file_service
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'blobs.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    directory = tmp_path / "uploads"
+    directory.mkdir()
+    db = Session()
+    stored = asyncio.run(store_upload(db, UploadFile(io.BytesIO(PNG), filename="a.png"), directory=str(directory)))
+
+    reupload = {}
+
+    def upload_again():
+        other = Session()
+        reupload['stored'] = asyncio.run(
+            store_upload(other, UploadFile(io.BytesIO(PNG), filename="b.png"), directory=str(directory))
+        )
+        other.close()
+
+    real_delete = file_service.storage.delete
+    uploader = threading.Thread(target=upload_again)
+
+    def delete_while_uploading(path):
+        # The identical upload starts between the last reference going away and the delete
+        uploader.start()
+        time.sleep(0.2)
+        assert 'stored' not in reupload
+        return real_delete(path)
+
+    monkeypatch.setattr(file_service.storage, "delete", delete_while_uploading)
+    assert release_file(db, stored.path) is True
+    uploader.join(10)
+
+    assert reupload['stored'].path == stored.path
+    assert os.path.exists(stored.path)
+    assert crud.get_blob(db, stored.sha256).ref_count == 1
+    db.close()
+
+
+def test_store_bytes_and_legacy_paths(tmp_path):
+    db = make_session(tmp_path)
+    stored = asyncio.run(store_bytes(db, b"%PDF-1.4 test", "pdf", "application/pdf", str(tmp_path)))
+    assert stored.path.endswith(f"{stored.sha256}.pdf")
+    assert crud.get_blob(db, stored.sha256).content_type == "application/pdf"
+
+    # Files written before the blob store belong to one contract and are deleted directly
+    legacy = tmp_path / "12_unsigned.pdf"
+    legacy.write_bytes(b"%PDF-1.4 old")
+    assert blob_hash_from_path(str(legacy)) is None
+    assert release_file(db, str(legacy)) is True
+    assert not legacy.exists()
+    db.close()
+
+
+def test_background_release_retries_failed_deletes(tmp_path, monkeypatch):
+    from app.services import file_service
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'blobs.db'}")
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(file_service, "SessionLocal", sessionmaker(bind=engine))
+    db = file_service.SessionLocal()
+    directory = tmp_path / "contracts"
+    directory.mkdir()
+    stored = asyncio.run(store_bytes(db, b"%PDF-1.4 retry", "pdf", "application/pdf", directory=str(directory)))
+    db.close()
+
+    attempts = []
+    real_delete = file_service.storage.delete
+
+    def flaky_delete(path):
+        attempts.append(path)
+        return len(attempts) > 1 and real_delete(path)
+
+    monkeypatch.setattr(file_service.storage, "delete", flaky_delete)
+    failed = asyncio.run(file_service.release_files_in_background([stored.path, None], backoff_seconds=0))
+
+    assert failed == []
+    assert attempts == [stored.path, stored.path]
+    assert not os.path.exists(stored.path)
+    db = file_service.SessionLocal()
+    assert crud.get_blob(db, stored.sha256) is None
+    db.close()
+
+
+def test_background_release_retries_database_errors(tmp_path, monkeypatch):
+    from sqlalchemy.exc import OperationalError
+
+    from app.services import file_service
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'blobs.db'}")
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(file_service, "SessionLocal", sessionmaker(bind=engine))
+    db = file_service.SessionLocal()
+    stored = asyncio.run(store_bytes(db, b"%PDF-1.4 db error", "pdf", "application/pdf", directory=str(tmp_path)))
+    db.close()
+
+    lookups = []
+    real_get_blob = crud.get_blob
+
+    def flaky_get_blob(db, sha256):
+        lookups.append(sha256)
+        if len(lookups) == 1:
+            raise OperationalError("SELECT", {}, Exception("database is locked"))
+        return real_get_blob(db, sha256)
+
+    monkeypatch.setattr(crud, "get_blob", flaky_get_blob)
+    assert asyncio.run(file_service.release_files_in_background([stored.path], backoff_seconds=0)) == []
+    assert len(lookups) == 2
+    assert not os.path.exists(stored.path)
+
+
+def test_delete_contracts_returns_only_rows_it_deleted(tmp_path):
+    db = make_session(tmp_path)
+    db.add_all([
+        models.DBContract(client_name="a", design_image_path="storage/uploads/a.png"),
+        models.DBContract(client_name="b", signed_pdf_path="storage/contracts/b.pdf"),
+    ])
+    db.commit()
+
+    rows = crud.delete_contracts(db, [1, 2, 3])
+    assert sorted(row.id for row in rows) == [1, 2]
+    assert all(row.deleted_at is not None for row in rows)
+    assert sorted(path for row in rows for path in crud.get_contract_file_paths(row)) == \
+        ["storage/contracts/b.pdf", "storage/uploads/a.png"]
+    assert crud.get_contract(db, 1) is None
+
+    # Already deleted: nothing is reported, so nothing is released twice
+    assert crud.delete_contracts(db, [1, 2]) == []
+    db.close()
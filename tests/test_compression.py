@@ -0,0 +1,76 @@
+import gzip
+
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.middleware import CompressionMiddleware, choose_encoding
+
+
+def make_client():
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.add_middleware(CompressionMiddleware, minimum_size=500, encodings=["gzip"])
+
+    @app.get("/contracts")
+    def contracts():
+        return [{"id": i, "politica_confirmacion": "Texto legal " * 20} for i in range(20)]
+
+    @app.get("/small")
+    def small():
+        return {"status": "ok"}
+
+    @app.get("/pdf")
+    def pdf():
+        return Response(b"%PDF-1.4\n" + b"0" * 5000, media_type="application/pdf")
+
+    @app.get("/stream")
+    def stream():
+        def chunks():
+            for _ in range(10):
+                yield b"linea de texto repetida\n" * 50
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    return TestClient(app)
+
+
+def test_json_is_gzipped():
+    client = make_client()
+    response = client.get("/contracts", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) < 2000
+    assert response.json()[0]["id"] == 0
+
+
+def test_small_responses_and_pdfs_are_not_compressed():
+    client = make_client()
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.json() == {"status": "ok"}
+
+    response = client.get("/pdf", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.content.startswith(b"%PDF")
+
+
+def test_no_compression_without_accept_encoding():
+    client = make_client()
+    response = client.get("/contracts", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+
+
+def test_streaming_response_is_compressed_in_chunks():
+    client = make_client()
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        raw = b"".join(response.iter_raw())
+    assert gzip.decompress(raw) == b"linea de texto repetida\n" * 500
+
+
+def test_choose_encoding_respects_preference_and_q_values():
+    assert choose_encoding("gzip, br", ["zstd", "br", "gzip"]) == "br"
+    assert choose_encoding("br;q=0, gzip;q=0.5", ["br", "gzip"]) == "gzip"
+    assert choose_encoding("*", ["gzip"]) == "gzip"
+    assert choose_encoding("identity", ["gzip"]) is None
@@ -0,0 +1,206 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, schemas
+from app.database import Base, get_db
+from app.routers import contracts, default_texts
+from app.services.default_text_cache import DefaultTextCache, default_text_cache
+
+
+def make_session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'texts.db'}")
+    Base.metadata.create_all(bind=engine)
+    default_text_cache.clear()
+    return sessionmaker(bind=engine)
+
+
+def test_cache_is_invalidated_by_writes(tmp_path):
+    Session = make_session(tmp_path)
+    db = Session()
+
+    assert default_text_cache.get(db, "politica") is None
+    crud.create_default_text(db, schemas.DefaultTextCreate(key="politica", content="v1"))
+    first = default_text_cache.get(db, "politica")
+    assert first.content == "v1"
+
+    crud.update_default_text(db, "politica", schemas.DefaultTextUpdate(content="v2"))
+    second = default_text_cache.get(db, "politica")
+    assert second.content == "v2"
+    assert second.etag != first.etag
+
+    crud.delete_default_text(db, "politica")
+    assert default_text_cache.get(db, "politica") is None
+    db.close()
+
+
+def test_unknown_keys_do_not_evict_cached_texts(tmp_path):
+    Session = make_session(tmp_path)
+    db = Session()
+    crud.create_default_text(db, schemas.DefaultTextCreate(key="politica", content="v1"))
+    cache = DefaultTextCache(max_entries=4, ttl_seconds=300, max_missing_entries=2)
+    assert cache.get(db, "politica").content == "v1"
+
+    for i in range(10):
+        assert cache.get(db, f"random-{i}") is None
+    db.query = None  # Any further query would fail
+    assert cache.get(db, "politica").content == "v1"
+    assert cache.get(db, "random-9") is None
+    db.close()
+
+
+def test_batch_of_unknown_keys_does_not_evict_cached_texts(tmp_path):
+    Session = make_session(tmp_path)
+    db = Session()
+    crud.create_default_text(db, schemas.DefaultTextCreate(key="politica", content="v1"))
+    cache = DefaultTextCache(max_entries=4, ttl_seconds=300, max_missing_entries=2)
+    assert cache.get_many(db, ["politica", "otro"])["politica"].content == "v1"
+
+    assert set(cache.get_many(db, [f"random-{i}" for i in range(10)]).values()) == {None}
+    db.query = None  # Any further query would fail
+    assert cache.get_many(db, ["politica", "random-9"]) == {"politica": cache.get(db, "politica"), "random-9": None}
+    db.close()
+
+
+def test_endpoint_returns_304_for_matching_etag(tmp_path):
+    Session = make_session(tmp_path)
+    db = Session()
+    crud.create_default_text(db, schemas.DefaultTextCreate(key="titulo", content="Contrato"))
+    db.close()
+
+    app = FastAPI()
+    app.include_router(default_texts.router)
+
+    def override_get_db():
+        session = Session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    client = TestClient(app)
+
+    response = client.get("/default-texts/titulo")
+    assert response.status_code == 200
+    assert response.json()["content"] == "Contrato"
+    etag = response.headers["etag"]
+
+    response = client.get("/default-texts/titulo", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    assert client.get("/default-texts/missing").status_code == 404
+
+
+def test_batch_endpoint_uses_one_query_and_combined_etag(tmp_path):
+    Session = make_session(tmp_path)
+    db = Session()
+    crud.create_default_text(db, schemas.DefaultTextCreate(key="politica", content="Politica"))
+    crud.create_default_text(db, schemas.DefaultTextCreate(key="titulo", content="Titulo"))
+    db.close()
+
+    app = FastAPI()
+    app.include_router(default_texts.router)
+    queries = []
+
+    def override_get_db():
+        session = Session()
+        original_query = session.query
+        session.query = lambda *args, **kwargs: queries.append(args) or original_query(*args, **kwargs)
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    client = TestClient(app)
+
+    response = client.get("/default-texts/batch", params={"keys": "titulo,politica,otro"})
+    assert response.status_code == 200
+    body = response.json()
+    assert [item["key"] for item in body["items"]] == ["titulo", "politica"]
+    assert body["missing"] == ["otro"]
+    assert len(queries) == 1
+    etag = response.headers["etag"]
+
+    response = client.get("/default-texts/batch", params={"keys": "titulo,politica,otro"}, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert len(queries) == 1
+
+    db = Session()
+    crud.update_default_text(db, "titulo", schemas.DefaultTextUpdate(content="Nuevo titulo"))
+    db.close()
+    response = client.get("/default-texts/batch", params={"keys": "titulo,politica,otro"}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_contracts_reference_policy_revisions(tmp_path):
+    Session = make_session(tmp_path)
+    db = Session()
+    crud.create_default_text(db, schemas.DefaultTextCreate(key="politica", content="Politica v1"))
+
+    client_data = {"name": "Cliente", "email": "cliente@example.com"}
+    referenced = crud.create_contract(db, schemas.ContractCreate(client_data=client_data, politica_confirmacion="Politica v1"), "img.png")
+    custom = crud.create_contract(db, schemas.ContractCreate(client_data=client_data, politica_confirmacion="Texto propio"), "img.png")
+
+    assert referenced.politica_confirmacion is None
+    assert referenced.politica_revision_id is not None
+    assert crud.get_contract_policy_text(referenced) == "Politica v1"
+    assert custom.politica_revision_id is None
+    assert crud.get_contract_policy_text(custom) == "Texto propio"
+
+    # Responses carry the text either way, and an update without one keeps the policy
+    assert schemas.Contract.model_validate(referenced).politica_confirmacion == "Politica v1"
+    # List rows leave the text out and keep the revision id
+    rows = {row.id: row._asdict() for row in crud.get_contract_rows(db)}
+    assert "politica_confirmacion" not in rows[referenced.id]
+    assert rows[referenced.id]["politica_revision_id"] == referenced.politica_revision_id
+    assert rows[custom.id]["politica_revision_id"] is None
+    for politica in (None, ""):
+        crud.update_contract(db, referenced.id, schemas.ContractUpdate(client_name="Otro", politica_confirmacion=politica))
+        assert referenced.politica_revision_id is not None
+
+    # Editing the default text adds a revision; existing contracts keep the old one
+    crud.update_default_text(db, "politica", schemas.DefaultTextUpdate(content="Politica v2"))
+    db.refresh(referenced)
+    assert crud.get_contract_policy_text(referenced) == "Politica v1"
+    revisions = crud.get_default_text_revisions(db, crud.get_default_text(db, "politica").id)
+    assert [revision.revision for revision in revisions] == [2, 1]
+
+    # Deleting the default text keeps the revision the contract points at
+    crud.delete_default_text(db, "politica")
+    db.refresh(referenced)
+    assert crud.get_contract_policy_text(referenced) == "Politica v1"
+    db.close()
+
+
+def test_contract_list_leaves_policy_text_to_the_detail_endpoint(tmp_path):
+    Session = make_session(tmp_path)
+    db = Session()
+    client_data = {"name": "Cliente", "email": "cliente@example.com"}
+    contract = crud.create_contract(db, schemas.ContractCreate(client_data=client_data, politica_confirmacion="Texto propio"), "img.png")
+    contract_id = contract.id
+    db.close()
+
+    app = FastAPI()
+    app.include_router(contracts.router)
+
+    def override_get_db():
+        session = Session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    client = TestClient(app)
+
+    item = client.get("/contracts/").json()["items"][0]
+    assert item["id"] == contract_id
+    assert "politica_confirmacion" not in item
+    response = client.get(f"/contracts/{contract_id}")
+    assert response.json()["politica_confirmacion"] == "Texto propio"
+    assert client.get("/contracts/999").status_code == 404
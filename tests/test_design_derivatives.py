@@ -0,0 +1,167 @@
+import asyncio
+import io
+import os
+
+from PIL import Image, features
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.database import Base
+from app.services import design_derivatives
+from app.services.design_derivatives import attach_design_derivatives, render_design_derivatives
+from app.services.file_service import store_bytes
+from app.services.render_pool import RenderPoolBusy
+from app.services.storage_gc import collect_garbage
+
+
+def make_png(size=(3000, 2000)):
+    buffer = io.BytesIO()
+    Image.linear_gradient("L").resize(size).convert("RGBA").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_render_design_derivatives_sizes_and_format():
+    rendered = render_design_derivatives(io.BytesIO(make_png()))
+
+    with Image.open(io.BytesIO(rendered["thumbnail"])) as thumbnail:
+        # Pillow without WebP support falls back to JPEG
+        assert thumbnail.format == ("WEBP" if features.check("webp") else "JPEG")
+        assert thumbnail.size == (320, 213)
+    with Image.open(io.BytesIO(rendered["preview"])) as preview:
+        assert preview.size == (1280, 853)
+    assert len(rendered["thumbnail"]) < len(rendered["preview"])
+
+
+def test_attach_design_derivatives_and_release_on_delete(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("storage/uploads")
+    os.makedirs("storage/derivatives")
+    engine = create_engine(f"sqlite:///{tmp_path / 'derivatives.db'}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(design_derivatives, "SessionLocal", Session)
+
+    db = Session()
+    design = asyncio.run(store_bytes(db, make_png(), "png", "image/png", "storage/uploads"))
+    db_contract = models.DBContract(client_name="Cliente", client_email="c@example.com",
+                                    design_image_path=design.path)
+    db.add(db_contract)
+    db.commit()
+
+    assert asyncio.run(attach_design_derivatives(db_contract.id)) is True
+    # Regenerating produces the same blobs and keeps a single reference to each
+    assert asyncio.run(attach_design_derivatives(db_contract.id)) is True
+    db.refresh(db_contract)
+    thumbnail, preview = db_contract.design_thumbnail_path, db_contract.design_preview_path
+    assert thumbnail.startswith("storage/derivatives/")
+    assert thumbnail.endswith(".webp" if features.check("webp") else ".jpg")
+    assert os.path.exists(thumbnail) and os.path.exists(preview)
+    assert crud.get_blob(db, os.path.basename(thumbnail).split(".")[0]).ref_count == 1
+
+    row = crud.get_contract_rows(db)[0]._asdict()
+    assert row["design_thumbnail_path"] == thumbnail
+    assert row["design_preview_path"] == preview
+
+    # Referenced derivatives survive the GC; once the contract is gone they are collected
+    assert collect_garbage(db, grace_seconds=0, max_deletes_per_second=0)["deleted"] == 0
+    crud.delete_contract(db, db_contract.id)
+    stats = collect_garbage(db, grace_seconds=0, max_deletes_per_second=0)
+    assert stats["deleted"] == 3
+    assert not os.path.exists(thumbnail)
+    assert asyncio.run(attach_design_derivatives(db_contract.id)) is False
+    db.close()
+
+
+def test_busy_derivative_pool_is_retried(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("storage/uploads")
+    os.makedirs("storage/derivatives")
+    engine = create_engine(f"sqlite:///{tmp_path / 'derivatives.db'}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(design_derivatives, "SessionLocal", Session)
+
+    db = Session()
+    design = asyncio.run(store_bytes(db, make_png((800, 600)), "png", "image/png", "storage/uploads"))
+    db_contract = models.DBContract(client_name="Cliente", client_email="c@example.com",
+                                    design_image_path=design.path)
+    db.add(db_contract)
+    db.commit()
+
+    attempts = []
+    real_store = design_derivatives.store_design_derivatives
+
+    async def busy_twice(db, design_image_path):
+        attempts.append(design_image_path)
+        if len(attempts) <= 2:
+            raise RenderPoolBusy("Render pool is busy")
+        return await real_store(db, design_image_path)
+
+    monkeypatch.setattr(design_derivatives, "store_design_derivatives", busy_twice)
+    assert asyncio.run(attach_design_derivatives(db_contract.id, max_retries=1, backoff_seconds=0)) is False
+    assert asyncio.run(attach_design_derivatives(db_contract.id, max_retries=3, backoff_seconds=0)) is True
+    assert len(attempts) == 3
+    db.refresh(db_contract)
+    assert db_contract.design_thumbnail_path is not None
+    db.close()
+
+
+def make_contract_with_design(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("storage/uploads")
+    os.makedirs("storage/derivatives")
+    engine = create_engine(f"sqlite:///{tmp_path / 'derivatives.db'}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(design_derivatives, "SessionLocal", Session)
+
+    db = Session()
+    design = asyncio.run(store_bytes(db, make_png((800, 600)), "png", "image/png", "storage/uploads"))
+    db_contract = models.DBContract(client_name="Cliente", client_email="c@example.com",
+                                    design_image_path=design.path)
+    db.add(db_contract)
+    db.commit()
+    return Session, db, db_contract
+
+
+def test_contract_deleted_during_render_keeps_no_derivatives(tmp_path, monkeypatch):
+    Session, db, db_contract = make_contract_with_design(tmp_path, monkeypatch)
+    real_store = design_derivatives.store_design_derivatives
+    stored = {}
+
+    async def store_then_delete(session, design_image_path):
+        stored.update(await real_store(session, design_image_path))
+        other = Session()
+        crud.delete_contract(other, db_contract.id)
+        other.close()
+        return stored
+
+    monkeypatch.setattr(design_derivatives, "store_design_derivatives", store_then_delete)
+    assert asyncio.run(attach_design_derivatives(db_contract.id)) is False
+
+    db.expire_all()
+    assert db.get(models.DBContract, db_contract.id).design_thumbnail_path is None
+    for stored_file in stored.values():
+        assert crud.get_blob(db, stored_file.sha256) is None
+        assert not os.path.exists(stored_file.path)
+    db.close()
+
+
+def test_failed_derivative_store_releases_the_stored_ones(tmp_path, monkeypatch):
+    Session, db, db_contract = make_contract_with_design(tmp_path, monkeypatch)
+    stored = []
+
+    async def fail_second(session, data, extension, content_type, directory):
+        if stored:
+            raise OSError("disk full")
+        stored.append(await store_bytes(session, data, extension, content_type, directory))
+        return stored[-1]
+
+    monkeypatch.setattr(design_derivatives, "store_bytes", fail_second)
+    assert asyncio.run(attach_design_derivatives(db_contract.id)) is False
+
+    assert len(stored) == 1
+    assert crud.get_blob(db, stored[0].sha256) is None
+    assert not os.path.exists(stored[0].path)
+    db.close()
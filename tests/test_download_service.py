@@ -0,0 +1,68 @@
+import os
+import subprocess
+import sys
+from urllib.parse import parse_qs, urlsplit
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.services import download_service
+
+
+def make_client(tmp_path, monkeypatch, mode):
+    monkeypatch.setattr(settings, "STORAGE_ROOT", str(tmp_path))
+    monkeypatch.setattr(settings, "FILE_SERVING_MODE", mode)
+    monkeypatch.setattr(settings, "SIGNED_URL_BASE", "https://files.example.com/storage/")
+    pdf_path = tmp_path / "contracts" / "1_signed.pdf"
+    pdf_path.parent.mkdir()
+    pdf_path.write_bytes(b"%PDF-1.4\n")
+
+    app = FastAPI()
+
+    @app.get("/pdf")
+    async def pdf(request: Request):
+        return download_service.serve_file(request, str(pdf_path), "abc123")
+
+    return TestClient(app, follow_redirects=False)
+
+
+def test_x_accel_redirect_mode_delegates_body_to_proxy(tmp_path, monkeypatch):
+    client = make_client(tmp_path, monkeypatch, "x-accel-redirect")
+
+    response = client.get("/pdf")
+    assert response.status_code == 200
+    assert response.headers["x-accel-redirect"] == "/protected-storage/contracts/1_signed.pdf"
+    assert response.headers["etag"] == '"abc123"'
+    assert response.content == b""
+
+    assert client.get("/pdf", headers={"If-None-Match": '"abc123"'}).status_code == 304
+
+
+def test_signed_url_mode_redirects_to_verifiable_url(tmp_path, monkeypatch):
+    client = make_client(tmp_path, monkeypatch, "signed-url")
+
+    response = client.get("/pdf")
+    assert response.status_code == 307
+    url = urlsplit(response.headers["location"])
+    assert url.path == "/storage/contracts/1_signed.pdf"
+    query = {key: values[0] for key, values in parse_qs(url.query).items()}
+    issued_at, lifetime = int(query["ts"]), int(query["e"])
+
+    assert download_service.verify_signed_url(url.path, query["st"], issued_at, lifetime, now=issued_at)
+    assert not download_service.verify_signed_url(url.path, query["st"], issued_at, lifetime, now=issued_at + lifetime + 1)
+    assert not download_service.verify_signed_url("/storage/contracts/2_signed.pdf", query["st"], issued_at, lifetime, now=issued_at)
+
+
+def test_storage_directories_follow_storage_root(tmp_path):
+    """A non-default STORAGE_ROOT moves every storage directory under it"""
+    script = (
+        "import os\n"
+        "from app.services.file_service import UPLOADS_DIR, CONTRACTS_DIR, DERIVATIVES_DIR\n"
+        "from app.services.download_service import storage_relative_path\n"
+        "for directory in (UPLOADS_DIR, CONTRACTS_DIR, DERIVATIVES_DIR):\n"
+        "    print(storage_relative_path(os.path.join(directory, 'a.pdf')))\n"
+    )
+    env = dict(os.environ, STORAGE_ROOT=str(tmp_path / "files"))
+    result = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.split() == ["uploads/a.pdf", "contracts/a.pdf", "derivatives/a.pdf"]
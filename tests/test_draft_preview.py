@@ -0,0 +1,50 @@
+import asyncio
+import io
+import threading
+
+import pytest
+from PIL import Image
+
+from app.services.pdf_service import draft_preview_key, render_pdf_bytes
+from app.services.render_pool import RenderPool, RenderPoolBusy
+
+
+def make_png(mode="RGBA"):
+    buffer = io.BytesIO()
+    Image.new(mode, (400, 300), "red").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_render_pdf_bytes_in_memory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pdf = render_pdf_bytes(make_png(), client_name="Cliente", client_email="c@example.com",
+                           politica_confirmacion="Texto de prueba")
+    assert pdf.startswith(b"%PDF")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_draft_preview_key_depends_on_every_input():
+    image = make_png("RGB")
+    key = draft_preview_key(image, client_name="A", titulo_diseno=None)
+    assert key == draft_preview_key(image, titulo_diseno=None, client_name="A")
+    assert key != draft_preview_key(image, client_name="B", titulo_diseno=None)
+    assert key != draft_preview_key(make_png(), client_name="A", titulo_diseno=None)
+
+
+def test_render_pool_rejects_jobs_beyond_its_bound():
+    pool = RenderPool(max_workers=1, max_pending=1)
+    release = threading.Event()
+
+    async def scenario():
+        first = asyncio.create_task(pool.run(release.wait))
+        second = asyncio.create_task(pool.run(release.wait))
+        await asyncio.sleep(0.05)
+        with pytest.raises(RenderPoolBusy):
+            await pool.run(release.wait)
+        release.set()
+        return await asyncio.gather(first, second)
+
+    try:
+        assert asyncio.run(scenario()) == [True, True]
+    finally:
+        pool.shutdown()
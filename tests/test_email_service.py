@@ -0,0 +1,205 @@
+import asyncio
+from app.config import settings
+from app.services.email_service import EmailService
+
+
+def make_digest_service(sent, window_seconds=900, max_events=200):
+    service = EmailService()
+    service.admin_notification_mode = "digest"
+    service.digest_window_seconds = window_seconds
+    service.digest_max_events = max_events
+
+    async def fake_send_email(to_email, subject, html_content, text_content=None, attachments=None):
+        sent.append({"to": to_email, "subject": subject, "html": html_content})
+        return True
+
+    service.send_email = fake_send_email
+    return service
+
+
+def test_admin_digest_buffers_events_until_flush():
+    """Digest mode should send a single summary email for several events"""
+    sent = []
+    service = make_digest_service(sent)
+
+    async def run():
+        for contract_id in (1, 2):
+            await service.send_admin_notification(
+                action="invitation_sent",
+                client_email="client@example.com",
+                client_name="Client",
+                contract_id=contract_id
+            )
+        await service.send_admin_notification(
+            action="contract_signed",
+            client_email="client@example.com",
+            client_name="Client",
+            contract_id=1
+        )
+        assert sent == []
+        await service.flush_admin_digest()
+
+    asyncio.run(run())
+    assert len(sent) == 1
+    assert "1 firmados, 2 invitaciones" in sent[0]["subject"]
+    assert "#2" in sent[0]["html"]
+
+
+def test_admin_digest_flushes_when_window_closes():
+    """The digest timer should send buffered events after the window"""
+    sent = []
+    service = make_digest_service(sent, window_seconds=0.01)
+
+    async def run():
+        await service.send_admin_notification(
+            action="invitation_sent",
+            client_email="client@example.com",
+            client_name="Client",
+            contract_id=7
+        )
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    assert len(sent) == 1
+
+
+def test_admin_digest_flushes_early_when_buffer_full():
+    """Reaching ADMIN_DIGEST_MAX_EVENTS should send the digest immediately"""
+    sent = []
+    service = make_digest_service(sent, max_events=2)
+
+    async def run():
+        for contract_id in (1, 2):
+            await service.send_admin_notification(
+                action="contract_signed",
+                client_email="client@example.com",
+                client_name="Client",
+                contract_id=contract_id
+            )
+
+    asyncio.run(run())
+    assert len(sent) == 1
+
+
+def test_pdf_attachment_is_encoded_once_and_shared(tmp_path):
+    """The same PDF should produce one cached, correctly encoded part"""
+    import base64
+    pdf_path = tmp_path / "contract.pdf"
+    content = b"%PDF-1.4\n" + bytes(range(256)) * 1000
+    pdf_path.write_bytes(content)
+
+    service = EmailService()
+    part = service.build_pdf_attachment(str(pdf_path), "contrato_1_firmado.pdf")
+    again = service.build_pdf_attachment(str(pdf_path), "contrato_1_firmado.pdf")
+
+    assert part is again
+    assert part["Content-Transfer-Encoding"] == "base64"
+    assert base64.b64decode(part.get_payload()) == content
+
+
+def test_attachment_encoding_matches_encodebytes_for_uneven_chunks(tmp_path, monkeypatch):
+    """Chunks that are not whole base64 lines must not add padding mid-file"""
+    import base64
+    from app.services import email_service as email_module
+    pdf_path = tmp_path / "contract.pdf"
+    content = b"%PDF-1.4\n" + bytes(range(256)) * 401
+    pdf_path.write_bytes(content)
+
+    def uneven_chunks(key, chunk_size):
+        data = pdf_path.read_bytes()
+        for start in range(0, len(data), 1000):
+            yield data[start:start + 1000]
+
+    monkeypatch.setattr(email_module.storage, "iter_chunks", uneven_chunks)
+    encoded = email_module.encode_file_base64(str(pdf_path))
+    assert encoded == base64.encodebytes(content).decode("ascii")
+    assert email_module.base64_encoded_size(len(content)) == len(encoded)
+
+
+def test_templates_inline_branding_and_autoescape():
+    """company_name is compiled in and client data is HTML-escaped"""
+    html = EmailService().render_template(
+        "admin_invitation_sent.html",
+        client_name="<script>",
+        client_email="client@example.com",
+        contract_id=1,
+        titulo_diseno="Diseño"
+    )
+    assert "De La Rueda" in html
+    assert "&lt;script&gt;" in html
+
+
+def test_invitation_is_delivered_through_local_smtp_server():
+    """Client invitation and admin notification reach the SMTP stand-in"""
+    from tests.smtp_server import LocalSMTPServer, local_smtp_settings
+
+    async def run():
+        async with LocalSMTPServer() as server:
+            with local_smtp_settings(server):
+                success = await EmailService().send_contract_invitation(
+                    to_email="client@example.com",
+                    client_name="Client",
+                    contract_id=3
+                )
+            return success, server
+
+    success, server = asyncio.run(run())
+    assert success
+    assert [m.rcpt_tos for m in server.messages] == [["client@example.com"], [settings.ADMIN_EMAIL]]
+    assert "Contrato" in server.messages[0].message["Subject"]
+
+
+def test_signed_confirmation_attaches_pdf_and_reports_failures(tmp_path):
+    """Attachments survive the round trip and injected failures surface as False"""
+    from tests.smtp_server import LocalSMTPServer, local_smtp_settings
+    pdf_path = tmp_path / "7_signed.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4\n" + b"x" * 5000)
+
+    async def run(failure_rate):
+        async with LocalSMTPServer(failure_rate=failure_rate) as server:
+            with local_smtp_settings(server):
+                success = await EmailService().send_contract_signed_confirmation(
+                    to_email="client@example.com",
+                    client_name="Client",
+                    contract_id=7,
+                    signed_pdf_path=str(pdf_path)
+                )
+            return success, server
+
+    success, server = asyncio.run(run(0.0))
+    assert success
+    attachment = server.messages[0].message.get_payload()[1]
+    assert attachment.get_payload(decode=True) == pdf_path.read_bytes()
+
+    success, server = asyncio.run(run(1.0))
+    assert not success
+    assert server.messages == []
+
+
+def test_admin_digest_backs_off_while_smtp_is_down(caplog):
+    """A failing digest is retried later, not on every new event, and logged at shutdown"""
+    attempts = []
+    service = make_digest_service(attempts, max_events=3)
+
+    async def failing_send_email(to_email, subject, html_content, text_content=None, attachments=None):
+        attempts.append(subject)
+        return False
+
+    service.send_email = failing_send_email
+
+    async def run():
+        for contract_id in range(1, 11):
+            await service.send_admin_notification(
+                action="contract_signed",
+                client_email="client@example.com",
+                client_name="Client",
+                contract_id=contract_id
+            )
+        assert len(attempts) == 1
+        assert len(service._digest_events) == 3
+        assert await service.flush_admin_digest(final=True) is False
+
+    asyncio.run(run())
+    assert len(attempts) == 2
+    assert service._digest_events == []
+    assert "Admin digest event not delivered: contract_signed contract #10" in caplog.text
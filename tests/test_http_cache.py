@@ -0,0 +1,58 @@
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.http_cache import CachedStaticFiles, conditional_file_response, IMMUTABLE, PRIVATE_REVALIDATE
+from app.services.file_service import compute_file_sha256
+
+
+def make_client(tmp_path):
+    pdf_path = tmp_path / "contracts" / "1_unsigned.pdf"
+    pdf_path.parent.mkdir()
+    pdf_path.write_bytes(b"%PDF-1.4\n" + b"0123456789" * 100)
+    (tmp_path / "uploads").mkdir()
+    (tmp_path / "uploads" / "design.png").write_bytes(b"\x89PNG\r\n\x1a\n")
+    content_hash = compute_file_sha256(str(pdf_path))
+
+    app = FastAPI()
+    app.mount("/storage", CachedStaticFiles(directory=str(tmp_path)), name="storage")
+
+    @app.get("/pdf")
+    async def pdf(request: Request):
+        return conditional_file_response(request, str(pdf_path), content_hash)
+
+    return TestClient(app), content_hash
+
+
+def test_pdf_response_has_strong_etag_and_revalidates(tmp_path):
+    client, content_hash = make_client(tmp_path)
+
+    response = client.get("/pdf")
+    assert response.status_code == 200
+    assert response.headers["etag"] == f'"{content_hash}"'
+    assert response.headers["cache-control"] == PRIVATE_REVALIDATE
+    assert "last-modified" in response.headers
+
+    response = client.get("/pdf", headers={"If-None-Match": f'"{content_hash}"'})
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+def test_pdf_response_serves_ranges(tmp_path):
+    client, content_hash = make_client(tmp_path)
+
+    response = client.get("/pdf", headers={"Range": "bytes=0-8"})
+    assert response.status_code == 206
+    assert response.content == b"%PDF-1.4\n"
+
+    response = client.get("/pdf", headers={"Range": "bytes=0-8", "If-Range": '"stale"'})
+    assert response.status_code == 200
+
+
+def test_static_files_cache_control(tmp_path):
+    client, _ = make_client(tmp_path)
+
+    assert client.get("/storage/uploads/design.png").headers["cache-control"] == IMMUTABLE
+    response = client.get("/storage/contracts/1_unsigned.pdf")
+    assert response.headers["cache-control"] == PRIVATE_REVALIDATE
+    response = client.get("/storage/contracts/1_unsigned.pdf", headers={"If-None-Match": response.headers["etag"]})
+    assert response.status_code == 304
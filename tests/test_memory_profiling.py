@@ -0,0 +1,92 @@
+import time
+import tracemalloc
+from email.mime.application import MIMEApplication
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import auth, models
+from app.config import settings
+from app.database import Base, get_db
+from app.memory import AllocationTracker, memory_profiler
+from app.routers import admin
+
+
+def test_allocation_tracker_groups_by_module():
+    tracemalloc.start(10)
+    try:
+        with AllocationTracker() as tracker:
+            pixels = Image.new("RGB", (500, 500), "red").tobytes()
+            message = MIMEApplication(b"%PDF" * 100000).as_bytes()
+            transient = bytearray(2 * 1024 * 1024)
+            del transient
+        with AllocationTracker(sample_peaks=True, interval=0.001) as sampled:
+            transient = [Image.new("L", (1000, 1000)).tobytes() for _ in range(20)]
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline and sampled.peak_by_module.get("Pillow", {}).get("size", 0) < 19e6:
+                time.sleep(0.01)
+            del transient
+    finally:
+        tracemalloc.stop()
+
+    assert tracker.retained_by_module["Pillow"]["size"] >= len(pixels)
+    assert tracker.retained_by_module["email/MIME"]["size"] >= len(message)
+    assert tracker.retained_by_module["reportlab"]["size"] == 0
+    assert tracker.peak_bytes >= len(pixels) + len(message) + 2 * 1024 * 1024
+    assert tracker.retained_bytes < tracker.peak_bytes
+    assert tracker.peak_by_module == {}
+
+    assert sampled.peak_by_module["Pillow"]["size"] >= 19 * 1000 * 1000
+    assert sampled.retained_by_module["Pillow"]["size"] < 1000 * 1000
+
+
+def test_memory_profiling_toggle_is_admin_only(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'users.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add(models.DBUser(username="jefe", email=settings.ADMIN_EMAIL.upper(), hashed_password="x"))
+        db.add(models.DBUser(username="empleado", email="otro@example.com", hashed_password="x"))
+        db.commit()
+
+    def session():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(admin.router)
+    app.dependency_overrides[get_db] = session
+    client = TestClient(app)
+
+    def headers(username):
+        return {"Authorization": f"Bearer {auth.create_access_token({'sub': username})}"}
+
+    assert client.post("/admin/memory-profiling", json={"enabled": True}, headers=headers("empleado")).status_code == 403
+    assert client.get("/admin/memory-profiling").status_code == 401
+    assert not tracemalloc.is_tracing()
+
+    try:
+        response = client.post("/admin/memory-profiling", json={"enabled": True, "frames": 5}, headers=headers("jefe"))
+        assert response.status_code == 200
+        assert response.json()["tracing"] is True
+        assert response.json()["frames"] == 5
+
+        kept = [bytes(1000) for _ in range(1000)]
+        report = client.get("/admin/memory-profiling?limit=3", headers=headers("jefe")).json()
+        assert len(report["top_allocations"]) <= 3
+        assert report["top_allocations"][0]["size"] >= 1000 * 1000
+        assert {row["module"] for row in report["retained_by_module"]} >= {"Pillow", "email/MIME", "SQLAlchemy", "other"}
+        del kept
+
+        response = client.post("/admin/memory-profiling", json={"enabled": False}, headers=headers("jefe"))
+        assert response.json()["tracing"] is True  # Last report, taken before stopping
+    finally:
+        memory_profiler.stop()
+    assert not tracemalloc.is_tracing()
+    assert client.get("/admin/memory-profiling", headers=headers("jefe")).json()["tracing"] is False
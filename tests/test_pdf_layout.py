@@ -0,0 +1,81 @@
+from PIL import Image
+from reportlab.lib.units import cm
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from app.services import pdf_service
+from app.services.pdf_service import DEFAULT_POLICY_TEXT, layout_policy_text, wrap_text
+
+
+def test_wrap_text_fits_box_width():
+    lines = wrap_text(DEFAULT_POLICY_TEXT, "Helvetica", 8, 300)
+    assert all(stringWidth(line, "Helvetica", 8) <= 300 for line in lines)
+    assert " ".join(lines).split() == DEFAULT_POLICY_TEXT.split()
+
+
+def test_wrap_text_splits_words_wider_than_box():
+    lines = wrap_text("corto " + "x" * 200, "Helvetica", 8, 100)
+    assert lines[0] == "corto"
+    assert "".join(lines[1:]) == "x" * 200
+    assert all(stringWidth(line, "Helvetica", 8) <= 100 for line in lines)
+
+
+def test_wrap_text_reuses_cached_layout():
+    pdf_service.layout_cache.clear()
+    first = wrap_text("Texto de politica " * 40, "Helvetica", 8, 400)
+    assert len(pdf_service.layout_cache) == 1
+    assert wrap_text("Texto de politica " * 40, "Helvetica", 8, 400) is first
+    wrap_text("Texto de politica " * 40, "Helvetica", 7, 400)
+    assert len(pdf_service.layout_cache) == 2
+
+
+def test_layout_truncates_text_that_does_not_fit():
+    layout = layout_policy_text("palabra " * 2000, 3 * cm, 500)
+    assert layout.font_name == "Helvetica"  # Esther-Medium is not registered
+    assert layout.font_size == 7
+    assert len(layout.lines) == layout.max_lines
+    assert layout.lines[-1] == "..."
+    assert layout.truncated_lines == layout.total_lines - (layout.max_lines - 1)
+
+    layout = layout_policy_text("Texto breve", 10 * cm, 500)
+    assert layout.font_size == 8
+    assert layout.lines == ["Texto breve"]
+    assert layout.truncated_lines == 0
+
+
+def test_check_policy_layout_matches_rendered_layout(tmp_path, monkeypatch):
+    image_path = tmp_path / "design.png"
+    Image.new("RGB", (1000, 500), "white").save(image_path)
+    monkeypatch.setattr(pdf_service, "LOGO_PATH", str(tmp_path / "missing-logo.png"))
+
+    rendered = []
+    original = pdf_service.layout_policy_text
+
+    def spy(legal_text, available_space, *args, **kwargs):
+        rendered.append(round(available_space, 2))
+        return original(legal_text, available_space, *args, **kwargs)
+
+    monkeypatch.setattr(pdf_service, "layout_policy_text", spy)
+    policy = "palabra " * 3000
+    pdf_service.create_professional_pdf(str(tmp_path / "out.pdf"), "Cliente", "c@example.com", str(image_path),
+                                        politica_confirmacion=policy)
+
+    metrics = pdf_service.check_policy_layout(1000, 500, policy, use_cache=False)
+    assert metrics["available_space"] == rendered[0]
+    assert metrics["image_display_height"] == round(pdf_service.DESIGN_IMAGE_WIDTH / 2, 2)
+    assert metrics["fits"] is False
+    assert metrics["lines_fitted"] + metrics["truncated_lines"] == metrics["total_lines"]
+
+    metrics = pdf_service.check_policy_layout(1000, 500, "Texto breve")
+    assert metrics["fits"] is True
+    assert metrics["truncated_lines"] == 0
+
+
+def test_check_policy_layout_reports_no_fit_when_no_line_fits(monkeypatch):
+    # A tall design (with a higher image limit) leaves no room at all above the signature box
+    monkeypatch.setattr(pdf_service, "DESIGN_IMAGE_MAX_HEIGHT", 20 * cm)
+    metrics = pdf_service.check_policy_layout(100, 10000, "Texto breve", use_cache=False)
+    assert metrics["available_space"] <= 0
+    assert metrics["max_lines"] == 0
+    assert metrics["fits"] is False
+    assert metrics["lines_fitted"] == 0
+    assert metrics["truncated_lines"] == metrics["total_lines"] == 1
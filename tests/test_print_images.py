@@ -0,0 +1,60 @@
+import io
+
+import pytest
+from PIL import Image
+
+from app.config import settings
+from app.services import pdf_service
+from app.services.pdf_service import ImageTooLarge, load_print_image, open_print_image, print_pixel_size
+
+
+def encoded(image, fmt, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **options)
+    buffer.seek(0)
+    return buffer
+
+
+def test_jpeg_is_decoded_near_print_size():
+    source = Image.open(encoded(Image.new("RGB", (4000, 3000), "red"), "JPEG"))
+    img = load_print_image(source, (1000, 750))
+    assert img.size == (1000, 750)
+    assert img.mode == "RGB"
+
+
+def test_transparency_is_flattened_on_white():
+    rgba = Image.new("RGBA", (400, 200), (255, 0, 0, 0))
+    img = load_print_image(Image.open(encoded(rgba, "PNG")), (100, 50))
+    assert img.size == (100, 50)
+    assert img.getpixel((10, 10)) == (255, 255, 255)
+
+
+def test_pixel_budget_and_bomb_limit(monkeypatch):
+    monkeypatch.setattr(settings, "PDF_IMAGE_DPI", 72)
+    monkeypatch.setattr(settings, "IMAGE_DECODE_PIXEL_BUDGET", 10_000)
+    width, height = print_pixel_size(400, 100)
+    assert width * height <= 10_000 and width == 4 * height
+
+    monkeypatch.setattr(settings, "IMAGE_MAX_PIXELS", 1000)
+    with pytest.raises(ImageTooLarge):
+        open_print_image(encoded(Image.new("RGB", (100, 100)), "PNG"), pdf_service.design_image_display_size)
+
+
+def test_images_pillow_refuses_to_open_are_too_large(monkeypatch):
+    # Over twice the limit Pillow raises DecompressionBombError before we can look at the size
+    monkeypatch.setattr(settings, "IMAGE_MAX_PIXELS", 1000)
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+    bomb = encoded(Image.new("RGB", (100, 100)), "PNG")
+    with pytest.raises(ImageTooLarge):
+        open_print_image(bomb, pdf_service.design_image_display_size)
+
+    bomb.seek(0)
+    with pytest.raises(ImageTooLarge):
+        pdf_service.create_professional_pdf(io.BytesIO(), "Cliente", "c@example.com", bomb)
+
+
+def test_small_jpeg_is_embedded_as_is():
+    data = encoded(Image.new("RGB", (300, 200), "blue"), "JPEG", quality=80)
+    reader, display_width, display_height = open_print_image(data, pdf_service.design_image_display_size)
+    assert display_width == pdf_service.DESIGN_IMAGE_WIDTH
+    assert reader.fp is data
@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import Base
+from app.services.retention import run_retention
+
+
+def test_retention_expires_and_purges_in_batches(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'retention.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    now = datetime.utcnow()
+    legacy_pdf = tmp_path / "1_unsigned.pdf"
+    legacy_pdf.write_bytes(b"%PDF")
+
+    db.add_all([
+        models.DBContract(client_name="purge-1", deleted_at=now - timedelta(days=100)),
+        models.DBContract(client_name="purge-2", deleted_at=now - timedelta(days=91)),
+        models.DBContract(client_name="recently-deleted", deleted_at=now - timedelta(days=10)),
+        models.DBContract(client_name="stale-unsigned", created_at=now - timedelta(days=200),
+                          unsigned_pdf_path=str(legacy_pdf)),
+        models.DBContract(client_name="old-signed", created_at=now - timedelta(days=200), signed_at=now),
+        models.DBContract(client_name="fresh-unsigned", created_at=now - timedelta(days=5)),
+    ])
+    db.commit()
+
+    dry = run_retention(db, deleted_retention_days=90, unsigned_expiry_days=180, batch_size=1,
+                        sleep_seconds=0, dry_run=True)
+    assert dry == {'expired': 1, 'purged': 2}
+    assert db.query(models.DBContract).count() == 6
+
+    stats = run_retention(db, deleted_retention_days=90, unsigned_expiry_days=180, batch_size=1, sleep_seconds=0)
+    assert stats == {'expired': 1, 'purged': 2}
+
+    names = {c.client_name: c for c in db.query(models.DBContract).all()}
+    assert set(names) == {"recently-deleted", "stale-unsigned", "old-signed", "fresh-unsigned"}
+    assert names["stale-unsigned"].deleted_at is not None
+    assert names["old-signed"].deleted_at is None
+    assert not legacy_pdf.exists()
+    db.close()
@@ -0,0 +1,178 @@
+import asyncio
+import io
+import os
+from datetime import datetime, timezone
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud
+from app.database import Base
+from app.services import download_service, file_service
+from app.services.download_service import redirect_to_remote_storage
+from app.services.email_service import EmailService
+from app.services.file_service import S3Storage, release_file, store_bytes
+
+PDF = b"%PDF-1.4\n" + b"x" * 3000
+
+
+class NotFound(Exception):
+    response = {"Error": {"Code": "404"}}
+
+
+class FakeS3Client:
+    """In-memory stand-in for an S3-compatible server (MinIO)"""
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+        self.calls = []
+
+    def put_object(self, Bucket, Key, Body, **extra):
+        self.calls.append("put_object")
+        self.objects[(Bucket, Key)] = Body.read()
+
+    def create_multipart_upload(self, Bucket, Key, **extra):
+        self.calls.append("create_multipart_upload")
+        upload_id = f"upload-{len(self.uploads)}"
+        self.uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.uploads[UploadId][PartNumber] = Body
+        return {"ETag": f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)
+        self.objects[(Bucket, Key)] = b"".join(parts[part["PartNumber"]] for part in MultipartUpload["Parts"])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId, None)
+
+    def get_object(self, Bucket, Key):
+        self.calls.append("get_object")
+        if (Bucket, Key) not in self.objects:
+            raise NotFound()
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise NotFound()
+        return {"ContentLength": len(self.objects[(Bucket, Key)])}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+    def list_objects_v2(self, Bucket, Prefix, ContinuationToken=None, MaxKeys=2):
+        keys = sorted(key for bucket, key in self.objects if bucket == Bucket and key.startswith(Prefix))
+        start = int(ContinuationToken or 0)
+        page = {"Contents": [
+            {"Key": key, "Size": len(self.objects[(Bucket, key)]), "LastModified": datetime(2026, 1, 1, tzinfo=timezone.utc)}
+            for key in keys[start:start + MaxKeys]
+        ], "IsTruncated": start + MaxKeys < len(keys)}
+        if page["IsTruncated"]:
+            page["NextContinuationToken"] = str(start + MaxKeys)
+        return page
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://minio.local/{Params['Bucket']}/{Params['Key']}?expires={ExpiresIn}"
+
+
+def make_storage(tmp_path, **options):
+    options.setdefault("cache_dir", str(tmp_path / "cache"))
+    return S3Storage("contracts", prefix="prod", client=FakeS3Client(), **options)
+
+
+def test_large_files_use_multipart_upload(tmp_path):
+    storage = make_storage(tmp_path, multipart_threshold=1000, multipart_chunk_size=1000, cache_max_bytes=0)
+    source = tmp_path / "big.part"
+    source.write_bytes(PDF)
+
+    storage.put_file("storage/contracts/ab/cd/big.pdf", str(source), "application/pdf")
+
+    assert storage.client.calls == ["create_multipart_upload"]
+    assert storage.client.objects[("contracts", "prod/storage/contracts/ab/cd/big.pdf")] == PDF
+    assert not source.exists()
+    assert storage.size("storage/contracts/ab/cd/big.pdf") == len(PDF)
+    assert storage.presigned_url("storage/contracts/ab/cd/big.pdf", 60) == \
+        "https://minio.local/contracts/prod/storage/contracts/ab/cd/big.pdf?expires=60"
+
+
+def test_read_through_cache_downloads_once_and_evicts(tmp_path):
+    storage = make_storage(tmp_path, cache_max_bytes=len(PDF) + 10)
+    storage.client.objects[("contracts", "prod/a.pdf")] = PDF
+    storage.client.objects[("contracts", "prod/b.pdf")] = PDF
+
+    first = storage.local_path("a.pdf")
+    again = storage.local_path("a.pdf")
+    with open(first, "rb") as f:
+        assert f.read() == PDF
+    assert first == again
+    assert storage.client.calls.count("get_object") == 1
+
+    os.utime(first, (1, 1))
+    storage.local_path("b.pdf")
+    assert not os.path.exists(first)
+    assert storage._cache_bytes == len(PDF)
+
+    assert not storage.exists("missing.pdf")
+    try:
+        storage.local_path("missing.pdf")
+        assert False, "expected FileNotFoundError"
+    except FileNotFoundError:
+        pass
+
+
+def test_blob_store_and_email_attachment_use_backend(tmp_path, monkeypatch):
+    storage = make_storage(tmp_path)
+    monkeypatch.setattr(file_service, "storage", storage)
+    monkeypatch.setattr("app.services.email_service.storage", storage)
+    engine = create_engine(f"sqlite:///{tmp_path / 'blobs.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    staging = tmp_path / "contracts"
+    staging.mkdir()
+
+    stored = asyncio.run(store_bytes(db, PDF, "pdf", "application/pdf", directory=str(staging)))
+    assert storage.exists(stored.path)
+    assert [p for p in staging.rglob("*") if p.is_file()] == []
+
+    # Served from the cache filled by the upload, no download needed
+    part = EmailService().build_pdf_attachment(stored.path, "contrato_1_firmado.pdf")
+    assert part.get_payload(decode=True) == PDF
+    assert "get_object" not in storage.client.calls
+
+    assert release_file(db, stored.path) is True
+    assert not storage.exists(stored.path)
+    assert crud.get_blob(db, stored.sha256) is None
+    db.close()
+
+
+def test_listing_pages_through_bucket(tmp_path):
+    storage = make_storage(tmp_path)
+    for name in ("a", "b", "c"):
+        storage.client.objects[("contracts", f"prod/storage/uploads/{name}.png")] = b"png"
+    storage.client.objects[("contracts", "prod/storage/contracts/x.pdf")] = PDF
+
+    listed = list(storage.iter_files("storage/uploads"))
+    assert [item.key for item in listed] == [f"storage/uploads/{name}.png" for name in ("a", "b", "c")]
+    assert listed[0].size == 3
+
+
+def test_storage_urls_redirect_to_presigned_urls(tmp_path, monkeypatch):
+    monkeypatch.setattr(download_service, "storage", make_storage(tmp_path))
+    app = FastAPI()
+    app.add_api_route("/storage/{path:path}", redirect_to_remote_storage, methods=["GET", "HEAD"])
+
+    response = TestClient(app).get("/storage/uploads/ab/cd/design.png", follow_redirects=False)
+    assert response.status_code == 307
+    assert response.headers["location"].startswith("https://minio.local/contracts/prod/storage/uploads/ab/cd/design.png?")
+    assert response.headers["cache-control"] == "private, no-store"
+
+    try:
+        redirect_to_remote_storage("../secrets.env")
+        assert False, "expected a 404"
+    except HTTPException as e:
+        assert e.status_code == 404
@@ -0,0 +1,138 @@
+import asyncio
+import hashlib
+import io
+import os
+import time
+from datetime import datetime
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import auth, crud, models
+from app.config import settings
+from app.database import Base, get_db
+from app.routers import contracts
+from app.services import storage_gc
+from app.services.file_service import blob_path, store_bytes
+from app.services.storage_gc import collect_garbage
+
+OLD = time.time() - 3 * 24 * 3600
+
+
+def write(path, data, modified=OLD):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    os.utime(path, (modified, modified))
+
+
+def test_gc_deletes_only_old_unreferenced_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    engine = create_engine(f"sqlite:///{tmp_path / 'gc.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    write("storage/uploads/aa/bb/live.png", b"live")
+    write("storage/contracts/aa/bb/live.pdf", b"live pdf")
+    write("storage/uploads/failed-render.png", b"x" * 100)
+    write("storage/uploads/cc/dd/deleted-contract.png", b"y" * 10)
+    write("storage/uploads/new-upload.png", b"in flight", modified=time.time())
+    # Old file, but an identical upload just took a reference to its blob
+    write("storage/uploads/ee/ff/reused.png", b"reused")
+    crud.acquire_blob(db, "e" * 64, "storage/uploads/ee/ff/reused.png", 6, "image/png")
+    # Leaked blob reference from a request that failed after storing the file
+    write("storage/uploads/11/22/leaked.png", b"z" * 5)
+    db.add(models.DBBlob(sha256="1" * 64, path="storage/uploads/11/22/leaked.png", size=5, ref_count=1,
+                         updated_at=datetime(2020, 1, 1)))
+
+    db.add_all([
+        models.DBContract(client_name="a", design_image_path="storage/uploads/aa/bb/live.png",
+                          unsigned_pdf_path="storage/contracts/aa/bb/live.pdf"),
+        models.DBContract(client_name="b", design_image_path="storage/uploads/cc/dd/deleted-contract.png",
+                          deleted_at=datetime.utcnow()),
+    ])
+    db.commit()
+
+    dry = collect_garbage(db, grace_seconds=3600, batch_size=2, max_deletes_per_second=0, dry_run=True)
+    assert dry['deleted'] == 3
+    assert os.path.exists("storage/uploads/failed-render.png")
+
+    stats = collect_garbage(db, grace_seconds=3600, batch_size=2, max_deletes_per_second=0)
+    assert stats == {'scanned': 7, 'referenced': 2, 'recent': 2, 'deleted': 3, 'failed': 0, 'bytes_reclaimed': 115}
+
+    remaining = sorted(str(p.relative_to(tmp_path / "storage")) for p in (tmp_path / "storage").rglob("*") if p.is_file())
+    assert remaining == ["contracts/aa/bb/live.pdf", "uploads/aa/bb/live.png", "uploads/ee/ff/reused.png",
+                         "uploads/new-upload.png"]
+    assert crud.get_blob(db, "1" * 64) is None
+    assert crud.get_blob(db, "e" * 64) is not None
+    db.close()
+
+
+def test_gc_keeps_a_file_reused_after_its_batch_was_checked(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    engine = create_engine(f"sqlite:///{tmp_path / 'gc.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    data = b"%PDF-1.4 orphan"
+    sha256 = hashlib.sha256(data).hexdigest()
+    path = blob_path("storage/contracts", sha256, "pdf")
+    write(path, data)
+    db.add(models.DBBlob(sha256=sha256, path=path, size=len(data), ref_count=1, updated_at=datetime(2020, 1, 1)))
+    db.commit()
+
+    real_recently_used = storage_gc.recently_used_blobs
+
+    def reused_meanwhile(db, paths, cutoff):
+        recent = real_recently_used(db, paths, cutoff)
+        # An identical PDF is stored right after the GC decided the file was orphaned
+        asyncio.run(store_bytes(db, data, "pdf", "application/pdf", "storage/contracts"))
+        return recent
+
+    monkeypatch.setattr(storage_gc, "recently_used_blobs", reused_meanwhile)
+    stats = collect_garbage(db, grace_seconds=3600, max_deletes_per_second=0, directories=["storage/contracts"])
+
+    assert stats['deleted'] == 0 and stats['recent'] == 1
+    assert os.path.exists(path)
+    assert crud.get_blob(db, sha256).ref_count == 2
+    db.close()
+
+
+def test_failed_render_leaves_no_contract_or_upload_reference(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("storage/uploads")
+    os.makedirs("storage/contracts")
+    engine = create_engine(f"sqlite:///{tmp_path / 'gc.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    def session():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(contracts.router)
+    app.dependency_overrides[get_db] = session
+    monkeypatch.setattr(settings, "IMAGE_MAX_PIXELS", 1000)
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (100, 100), "red").save(buffer, "PNG")
+    response = TestClient(app).post(
+        "/contracts/",
+        data={"client_data": '{"name": "Cliente", "email": "c@example.com"}'},
+        files={"design_image": ("design.png", buffer.getvalue(), "image/png")},
+        headers={"Authorization": f"Bearer {auth.create_access_token({'sub': 'empleado'})}"}
+    )
+    assert response.status_code == 413
+
+    db = Session()
+    assert db.query(models.DBContract).count() == 0
+    assert db.query(models.DBBlob).count() == 0
+    assert [p for p in (tmp_path / "storage/uploads").rglob("*") if p.is_file()] == []
+    db.close()
@@ -0,0 +1,139 @@
+import hashlib
+import os
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.database import Base
+from app.services.file_service import blob_path
+from app.services import storage_migration
+from app.services.storage_migration import migrate_storage_layout
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x02" * 300
+PDF = b"%PDF-1.4 legacy"
+
+
+def test_migration_moves_legacy_and_flat_blobs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("storage/uploads")
+    os.makedirs("storage/contracts")
+    engine = create_engine(f"sqlite:///{tmp_path / 'migration.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    # Legacy files, one per contract
+    with open("storage/uploads/0b7f-uuid.png", "wb") as f:
+        f.write(PNG)
+    with open("storage/contracts/1_unsigned.pdf", "wb") as f:
+        f.write(PDF)
+    # A flat content-addressed blob shared by two contracts
+    shared = b"\x89PNG\r\n\x1a\n" + b"\x03" * 300
+    shared_sha = hashlib.sha256(shared).hexdigest()
+    flat_path = f"storage/uploads/{shared_sha}.png"
+    with open(flat_path, "wb") as f:
+        f.write(shared)
+    crud.acquire_blob(db, shared_sha, flat_path, len(shared), "image/png")
+    crud.acquire_blob(db, shared_sha, flat_path, len(shared), "image/png")
+
+    db.add_all([
+        models.DBContract(client_name="a", design_image_path="storage/uploads/0b7f-uuid.png",
+                          unsigned_pdf_path="storage/contracts/1_unsigned.pdf"),
+        models.DBContract(client_name="b", design_image_path=flat_path),
+        models.DBContract(client_name="c", design_image_path=flat_path, signed_pdf_path="storage/contracts/gone.pdf"),
+    ])
+    db.commit()
+
+    stats = migrate_storage_layout(db, batch_size=1, sleep_seconds=0)
+    assert stats == {'contracts': 3, 'moved': 4, 'already_sharded': 0, 'missing': 1, 'changed': 0, 'bytes': 2 * len(PNG) + len(shared) + len(PDF)}
+
+    png_sha = hashlib.sha256(PNG).hexdigest()
+    pdf_sha = hashlib.sha256(PDF).hexdigest()
+    a, b, c = db.query(models.DBContract).order_by(models.DBContract.id).all()
+    assert a.design_image_path == blob_path("storage/uploads", png_sha, "png")
+    assert a.unsigned_pdf_path == blob_path("storage/contracts", pdf_sha, "pdf")
+    assert a.unsigned_pdf_sha256 == pdf_sha
+    assert b.design_image_path == c.design_image_path == blob_path("storage/uploads", shared_sha, "png")
+    assert c.signed_pdf_path == "storage/contracts/gone.pdf"
+
+    assert crud.get_blob(db, png_sha).ref_count == 1
+    assert crud.get_blob(db, shared_sha).ref_count == 2
+    assert crud.get_blob(db, shared_sha).path == b.design_image_path
+    assert not os.path.exists("storage/uploads/0b7f-uuid.png")
+    assert not os.path.exists(flat_path)
+    assert os.path.exists(b.design_image_path)
+
+    # Running it again has nothing left to move
+    stats = migrate_storage_layout(db, batch_size=10, sleep_seconds=0)
+    assert stats['moved'] == 0 and stats['already_sharded'] == 4
+    db.close()
+
+
+def test_migration_does_not_overwrite_a_path_changed_meanwhile(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("storage/contracts")
+    engine = create_engine(f"sqlite:///{tmp_path / 'migration.db'}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    with open("storage/contracts/1_signed.pdf", "wb") as f:
+        f.write(PDF)
+    db.add(models.DBContract(client_name="a", signed_pdf_path="storage/contracts/1_signed.pdf"))
+    db.commit()
+
+    real_place = storage_migration._place
+
+    def signed_again_meanwhile(source, target):
+        real_place(source, target)
+        # The contract is signed again while the migration is hashing its old PDF
+        other = Session()
+        other.query(models.DBContract).update({"signed_pdf_path": "storage/contracts/ab/cd/new.pdf"})
+        other.commit()
+        other.close()
+
+    monkeypatch.setattr(storage_migration, "_place", signed_again_meanwhile)
+    stats = migrate_storage_layout(db, sleep_seconds=0)
+
+    assert stats['moved'] == 0 and stats['changed'] == 1
+    db.expire_all()
+    assert db.query(models.DBContract).one().signed_pdf_path == "storage/contracts/ab/cd/new.pdf"
+    assert crud.get_blob(db, hashlib.sha256(PDF).hexdigest()) is None
+    db.close()
+
+
+def test_migration_swaps_paths_under_the_blob_lock(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("storage/uploads")
+    engine = create_engine(f"sqlite:///{tmp_path / 'migration.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    with open("storage/uploads/0b7f-uuid.png", "wb") as f:
+        f.write(PNG)
+    db.add(models.DBContract(client_name="a", design_image_path="storage/uploads/0b7f-uuid.png"))
+    db.commit()
+
+    held = []
+    placed_under = []
+    real_lock, real_place = crud.blob_lock, storage_migration._place
+
+    @contextmanager
+    def recording_lock(session, sha256):
+        with real_lock(session, sha256):
+            held.append(sha256)
+            try:
+                yield
+            finally:
+                held.pop()
+
+    def recording_place(source, target):
+        placed_under.append(list(held))
+        real_place(source, target)
+
+    monkeypatch.setattr(crud, "blob_lock", recording_lock)
+    monkeypatch.setattr(storage_migration, "_place", recording_place)
+    assert migrate_storage_layout(db, sleep_seconds=0)['moved'] == 1
+
+    assert placed_under == [[hashlib.sha256(PNG).hexdigest()]]
+    assert crud.get_blob(db, hashlib.sha256(PNG).hexdigest()).ref_count == 1
+    db.close()
@@ -0,0 +1,80 @@
+import asyncio
+import hashlib
+import io
+
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+from starlette.datastructures import UploadFile
+
+from app.config import settings
+from app.middleware import RequestSizeLimitMiddleware
+from app.services.file_service import IMAGE_CONTENT_TYPES, save_upload, sniff_content_type
+from main import app as main_app
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 1000
+
+
+def test_save_upload_hashes_and_sniffs_while_writing(tmp_path):
+    upload = UploadFile(io.BytesIO(PNG), filename="design.jpg")
+    stored = asyncio.run(save_upload(upload, directory=str(tmp_path)))
+
+    assert stored.content_type == "image/png"
+    assert stored.path.endswith(".png")  # From the content, not the client filename
+    assert stored.size == len(PNG)
+    assert stored.sha256 == hashlib.sha256(PNG).hexdigest()
+    assert stored.original_filename == "design.jpg"
+    assert [p.name for p in tmp_path.iterdir()] == [stored.path.rsplit("/", 1)[-1]]
+
+
+def test_save_upload_rejects_large_and_unexpected_files(tmp_path):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(save_upload(UploadFile(io.BytesIO(PNG), filename="a.png"), directory=str(tmp_path), max_bytes=100))
+    assert error.value.status_code == 413
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(save_upload(UploadFile(io.BytesIO(b"<svg></svg>"), filename="a.png"), directory=str(tmp_path),
+                                allowed_types=IMAGE_CONTENT_TYPES))
+    assert error.value.status_code == 415
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_sniff_content_type():
+    assert sniff_content_type(b"\xff\xd8\xff\xe0") == ("image/jpeg", "jpg")
+    assert sniff_content_type(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == ("image/webp", "webp")
+    assert sniff_content_type(b"%PDF-1.4") == ("application/pdf", "pdf")
+    assert sniff_content_type(b"hello") == ("application/octet-stream", "bin")
+
+
+def test_request_size_limit_middleware():
+    app = FastAPI()
+    app.add_middleware(RequestSizeLimitMiddleware, max_body_bytes=1000)
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        return {"size": len(await request.body())}
+
+    client = TestClient(app)
+    assert client.post("/echo", content=b"x" * 500).json() == {"size": 500}
+
+    response = client.post("/echo", content=b"x" * 2000)
+    assert response.status_code == 413
+
+    def chunked():
+        for _ in range(5):
+            yield b"x" * 400
+
+    response = client.post("/echo", content=chunked())
+    assert response.status_code == 413
+
+
+def test_oversized_requests_get_cors_headers():
+    client = TestClient(main_app)
+    response = client.post(
+        "/contracts/",
+        content=b"x" * (settings.REQUEST_MAX_BODY_BYTES + 1),
+        headers={"Origin": "http://localhost:3000", "Content-Type": "application/octet-stream"}
+    )
+    assert response.status_code == 413
+    assert "access-control-allow-origin" in response.headers
@@ -0,0 +1,70 @@
+import asyncio
+import hashlib
+import hmac
+import json
+
+import httpx
+
+from app.services.webhook_service import WebhookDispatcher, SIGNATURE_HEADER
+
+
+class LocalWebhookEndpoint:
+    """httpx transport standing in for a subscriber endpoint"""
+
+    def __init__(self, statuses=None):
+        self.requests = []
+        self.statuses = list(statuses or [])
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        status = self.statuses.pop(0) if self.statuses else 200
+        return httpx.Response(status)
+
+    def make_dispatcher(self, **overrides) -> WebhookDispatcher:
+        dispatcher = WebhookDispatcher(transport=httpx.MockTransport(self.handler))
+        dispatcher.batch_window_seconds = 0.01
+        dispatcher.retry_backoff_seconds = 0
+        for name, value in overrides.items():
+            setattr(dispatcher, name, value)
+        return dispatcher
+
+
+def verify_signature(request: httpx.Request, secret: str) -> bool:
+    parts = dict(item.split("=", 1) for item in request.headers[SIGNATURE_HEADER].split(","))
+    expected = hmac.new(secret.encode(), f"{parts['t']}.".encode() + request.content, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, parts["v1"])
+
+
+def test_events_for_same_endpoint_are_batched_and_signed():
+    endpoint = LocalWebhookEndpoint()
+    dispatcher = endpoint.make_dispatcher()
+
+    async def run():
+        for contract_id in (1, 2, 3):
+            await dispatcher.enqueue(1, "https://crm.example.com/hook", "s3cret", {"type": "contract.signed", "data": {"id": contract_id}})
+        await asyncio.sleep(0.05)
+        await dispatcher.close()
+
+    asyncio.run(run())
+    assert len(endpoint.requests) == 1
+    body = json.loads(endpoint.requests[0].content)
+    assert [event["data"]["id"] for event in body["events"]] == [1, 2, 3]
+    assert verify_signature(endpoint.requests[0], "s3cret")
+
+
+def test_delivery_retries_transient_failures():
+    endpoint = LocalWebhookEndpoint(statuses=[503, 502, 200])
+    dispatcher = endpoint.make_dispatcher(max_retries=3)
+
+    delivered = asyncio.run(dispatcher.deliver("https://crm.example.com/hook", "s3cret", [{"type": "contract.created"}]))
+    assert delivered
+    assert len(endpoint.requests) == 3
+
+
+def test_delivery_does_not_retry_client_errors():
+    endpoint = LocalWebhookEndpoint(statuses=[400])
+    dispatcher = endpoint.make_dispatcher(max_retries=3)
+
+    delivered = asyncio.run(dispatcher.deliver("https://crm.example.com/hook", "s3cret", [{"type": "contract.created"}]))
+    assert not delivered
+    assert len(endpoint.requests) == 1